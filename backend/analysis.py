@@ -0,0 +1,223 @@
+"""Insight and response helpers shared by the in-memory and streaming upload paths."""
+import numpy as np
+import pandas as pd
+
+from config import CATEGORY_TOP_K, CORRELATION_MAX_INSIGHTS
+from correlation import multicollinearity_groups, upper_pairs
+
+# Absolute correlation above which a pair of columns is reported.
+STRONG_CORRELATION = 0.7
+
+
+def iqr_bounds(q1, q3):
+    """Return the (lower, upper) Tukey fences used for outlier detection."""
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def numeric_insights(col, total_rows, q1, q3, median, skewness, kurtosis,
+                     outlier_count, peak_values=None):
+    """Build the outlier, distribution and multi-modality insights for one numeric column."""
+    insights = []
+    lower_bound, upper_bound = iqr_bounds(q1, q3)
+
+    if outlier_count > 0:
+        outlier_percentage = (outlier_count / total_rows) * 100
+        insights.append({
+            "title": f"Outliers in {col}",
+            "description": f"Found {outlier_count} outliers ({outlier_percentage:.1f}% of data) in {col}. " +
+                         f"These values fall outside the typical range of {lower_bound:.2f} to {upper_bound:.2f}. " +
+                         f"In real-world terms, these might represent exceptional cases that need investigation."
+        })
+
+    distribution_desc = ""
+    if abs(skewness) < 0.5:
+        distribution_desc = "approximately normal (symmetric)"
+    elif skewness > 0:
+        distribution_desc = f"right-skewed (skewness: {skewness:.2f})"
+    else:
+        distribution_desc = f"left-skewed (skewness: {skewness:.2f})"
+
+    if kurtosis > 1:
+        distribution_desc += " with heavy tails"
+    elif kurtosis < -1:
+        distribution_desc += " with light tails"
+
+    insights.append({
+        "title": f"Distribution Pattern of {col}",
+        "description": f"The distribution is {distribution_desc}. " +
+                     f"Most values fall between {q1:.2f} and {q3:.2f}, " +
+                     f"with a median of {median:.2f}."
+    })
+
+    if peak_values is not None and len(peak_values) > 1:
+        insights.append({
+            "title": f"Multiple Peaks Detected in {col}",
+            "description": f"Found {len(peak_values)} distinct peaks in the distribution at approximately " +
+                         f"{', '.join([f'{v:.2f}' for v in peak_values])}. " +
+                         f"This suggests distinct groups or patterns in your {col} data."
+        })
+
+    return insights
+
+
+def category_counts(series):
+    """Counts of a column's non-null values, largest first; ties keep the order of first appearance.
+
+    The column is factorized once into integer codes, which are counted with
+    ``np.bincount``.
+    """
+    codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = np.argsort(-counts, kind="stable")
+    return pd.Series(counts[order], index=uniques.take(order), name="count")
+
+
+def category_distribution(value_counts, non_null, top_k=CATEGORY_TOP_K):
+    """``(distribution, other_rows)`` of a column with ``non_null`` values.
+
+    ``distribution``, its ``categorical_distributions`` entry, holds the first
+    ``top_k`` entries of ``value_counts`` (largest first); ``other_rows`` is
+    the number of rows in every other category.
+    """
+    top = value_counts.iloc[:top_k]
+    return top.to_dict(), int(non_null - top.sum())
+
+
+def categorical_insights(col, value_counts, total_count, rare=None):
+    """Build the distribution and rare-category insights for one categorical column.
+
+    ``value_counts`` is a Series of counts sorted in descending order. When it
+    only holds the most frequent values, pass ``rare`` as
+    ``(number_of_rare_categories, rows_in_rare_categories)``.
+    """
+    insights = []
+
+    top_categories = value_counts.head(3)
+    top_categories_desc = ", ".join([
+        f"'{cat}' ({(count/total_count*100):.1f}%)"
+        for cat, count in top_categories.items()
+    ])
+
+    insights.append({
+        "title": f"Category Distribution in {col}",
+        "description": f"The most common categories are: {top_categories_desc}. "
+    })
+
+    rare_threshold = 0.05  # 5%
+    if rare is None:
+        rare_categories = value_counts[value_counts/total_count < rare_threshold]
+        rare = (len(rare_categories), rare_categories.sum())
+    rare_count, rare_total = rare
+    if rare_count > 0:
+        rare_total_percentage = (rare_total/total_count*100)
+        insights.append({
+            "title": f"Rare Categories in {col}",
+            "description": f"Found {rare_count} rare categories (each <5% of data) in {col}, " +
+                         f"collectively representing {rare_total_percentage:.1f}% of all data. " +
+                         f"Consider if these rare categories need special attention or could be grouped."
+        })
+
+    return insights
+
+
+def pair_records(columns, i, j, r):
+    """``strong_correlations`` entries for the pair arrays of ``correlation.py``."""
+    return [
+        {'col1': columns[a], 'col2': columns[b], 'correlation': c}
+        for a, b, c in zip(i.tolist(), j.tolist(), r.tolist())
+    ]
+
+
+def strong_correlation_pairs(corr_matrix, columns, threshold=STRONG_CORRELATION):
+    """Return the column pairs whose absolute correlation exceeds ``threshold``."""
+    return pair_records(columns, *upper_pairs(np.asarray(corr_matrix), threshold))
+
+
+def correlation_groups(columns, strong_correlations):
+    """Groups of columns linked by strong correlations, largest first."""
+    position = {col: i for i, col in enumerate(columns)}
+    i = np.array([position[corr['col1']] for corr in strong_correlations], dtype=np.intp)
+    j = np.array([position[corr['col2']] for corr in strong_correlations], dtype=np.intp)
+    return [[columns[k] for k in group] for group in multicollinearity_groups(len(columns), i, j)]
+
+
+def correlation_insights(strong_correlations, groups=(), limit=CORRELATION_MAX_INSIGHTS):
+    """Insights for the ``limit`` strongest pairs and for every group of three or more columns."""
+    if len(strong_correlations) > limit:
+        strength = np.abs([corr['correlation'] for corr in strong_correlations])
+        keep = np.sort(np.argsort(-strength, kind="stable")[:limit])
+        strong_correlations = [strong_correlations[k] for k in keep]
+    insights = []
+    for corr in strong_correlations:
+        insights.append({
+            "title": f"Strong Correlation: {corr['col1']} & {corr['col2']}",
+            "description": f"Found a {abs(corr['correlation']):.2f} " +
+                         f"{'positive' if corr['correlation'] > 0 else 'negative'} correlation. " +
+                         f"This means changes in {corr['col1']} are strongly " +
+                         f"{'associated' if corr['correlation'] > 0 else 'inversely associated'} " +
+                         f"with changes in {corr['col2']}."
+        })
+    for group in groups:
+        if len(group) < 3:
+            continue
+        insights.append({
+            "title": f"Multicollinearity: {len(group)} related columns",
+            "description": f"{', '.join(group)} are linked by strong correlations. " +
+                         f"Consider keeping one of them or combining them before modeling."
+        })
+    return insights
+
+
+def summary_insight(numeric_count, categorical_count, strong_correlation_count,
+                    total_rows, missing_percentage):
+    key_findings = []
+    if numeric_count:
+        key_findings.append(f"Analyzed {numeric_count} numerical features")
+    if categorical_count:
+        key_findings.append(f"Analyzed {categorical_count} categorical features")
+    if strong_correlation_count:
+        key_findings.append(f"Found {strong_correlation_count} strong correlations")
+
+    return {
+        "title": "Overall Data Summary",
+        "description": f"{', '.join(key_findings)}. " +
+                      f"Dataset contains {total_rows} rows with {missing_percentage:.1f}% missing values overall."
+    }
+
+
+def build_recommendations(total_rows, missing_values, missing_percentage,
+                          duplicate_rows, has_strong_correlations):
+    recommendations = []
+    if missing_values > 0:
+        recommendations.append(
+            f"Consider handling {missing_values} missing values ({missing_percentage:.1f}% of total data)"
+        )
+
+    if duplicate_rows > 0:
+        recommendations.append(
+            f"Review {duplicate_rows} duplicate rows ({(duplicate_rows/total_rows*100):.1f}% of data)"
+        )
+
+    recommendations.append(
+        "Consider feature engineering or transformations for highly skewed numerical variables"
+    )
+    if has_strong_correlations:
+        recommendations.append(
+            "Review highly correlated features to avoid multicollinearity in modeling"
+        )
+    return recommendations
+
+
+def build_dataset_info(total_rows, total_cols, missing_values, missing_percentage,
+                       duplicate_rows, numeric_count, categorical_count, date_count):
+    return {
+        "total_rows": total_rows,
+        "total_columns": total_cols,
+        "missing_values": int(missing_values),
+        "missing_percentage": f"{missing_percentage:.2f}%",
+        "duplicate_rows": int(duplicate_rows),
+        "numeric_columns": numeric_count,
+        "categorical_columns": categorical_count,
+        "date_columns": date_count
+    }
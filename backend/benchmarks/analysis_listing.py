@@ -0,0 +1,93 @@
+"""Time /analyses/ listing pages as the analysis history grows.
+
+Run from the backend directory::
+
+    python benchmarks/analysis_listing.py --rows 10000 100000 300000
+
+Fills a temporary SQLite database with ``rows`` analyses spread over
+``--owners`` owners (with small compressed sections), then times the first
+page, a page deep into one owner's history (reached by following cursors)
+and a filename-filtered page. The first two should stay flat as ``rows``
+grows; a filename-prefix page sorts the rows matching the prefix, so it grows
+with the number of matches rather than with the table. The query plan of
+the filtered listing is printed once to show which index it uses.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Base, FileAnalysis, list_analyses, pack_section  # noqa: E402
+
+PAGE = 50
+
+
+def fill(session, rows, owners):
+    section = pack_section({f"col{i}": {"count": 1000, "mean": 0.5} for i in range(20)})
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "owner": f"owner{i % owners}", "filename": f"file{i % 1000:04d}.csv",
+            "upload_date": start + timedelta(seconds=i), "dataset_id": None,
+            "head_data": section, "describe_data": section, "dtypes_data": section, "null_counts": section,
+        })
+        if len(batch) == 10_000:
+            session.execute(insert(FileAnalysis), batch)
+            batch = []
+    if batch:
+        session.execute(insert(FileAnalysis), batch)
+    session.commit()
+
+
+def timed(func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--owners", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=100, help="pages to follow for the deep page")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'first page':>11} {'deep page':>10} {'filtered':>9}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(bind=engine)
+            session = sessionmaker(bind=engine)()
+            fill(session, rows, args.owners)
+
+            _, first = timed(lambda: list_analyses(session, "owner0", PAGE))
+            cursor = None
+            for _ in range(min(args.depth, rows // args.owners // PAGE - 1)):
+                _, cursor = list_analyses(session, "owner0", PAGE, cursor=cursor)
+            _, deep = timed(lambda: list_analyses(session, "owner0", PAGE, cursor=cursor))
+            _, filtered = timed(lambda: list_analyses(session, "owner0", PAGE, filename="file05"))
+            print(f"{rows:>8} {first:>9.2f}ms {deep:>8.2f}ms {filtered:>7.2f}ms")
+
+            if rows == args.rows[-1]:
+                query = (session.query(FileAnalysis.id).filter(
+                    FileAnalysis.owner == "owner0", FileAnalysis.filename >= "file05",
+                    FileAnalysis.filename < "file05\U0010ffff",
+                ).order_by(FileAnalysis.upload_date.desc(), FileAnalysis.id.desc()).limit(PAGE))
+                sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+                for row in session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+                    print("  plan:", row[-1])
+            session.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
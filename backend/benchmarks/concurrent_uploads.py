@@ -0,0 +1,96 @@
+"""Measure /upload-file/ throughput under concurrent uploads.
+
+Start the API first, e.g. ``ANALYSIS_WORKERS=4 uvicorn main:app``, then::
+
+    python benchmarks/concurrent_uploads.py data.csv --uploads 16 --concurrency 8
+
+Every upload sends a copy of the file with a unique trailing row, so the
+dataset cache cannot answer it. While the uploads run, /analyses/ is polled to
+show whether the event loop stays responsive. Requires ``httpx``.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def unique_copy(content, index):
+    """Append one row that makes the upload's bytes (and hash) unique."""
+    header = content.split(b"\n", 1)[0]
+    columns = header.count(b",") + 1
+    row = ",".join([f"bench{index}"] + [""] * (columns - 1)).encode()
+    if not content.endswith(b"\n"):
+        content += b"\n"
+    return content + row + b"\n"
+
+
+async def upload(client, url, name, content, semaphore, latencies, statuses):
+    async with semaphore:
+        start = time.perf_counter()
+        response = await client.post(f"{url}/upload-file/", files={"file": (name, content)})
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def probe(client, url, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(f"{url}/analyses/")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.1)
+
+
+async def run(args):
+    with open(args.path, "rb") as f:
+        content = f.read()
+    name = os.path.basename(args.path)
+    if not name.endswith(".csv"):
+        raise SystemExit("The benchmark file must be a CSV")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    upload_latencies, probe_latencies, statuses = [], [], {}
+    stop = asyncio.Event()
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        prober = asyncio.create_task(probe(client, args.url, stop, probe_latencies))
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            upload(client, args.url, name, unique_copy(content, i), semaphore, upload_latencies, statuses)
+            for i in range(args.uploads)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await prober
+
+    print(f"uploads:      {args.uploads} x {len(content) / 1e6:.1f} MB, concurrency {args.concurrency}")
+    print(f"statuses:     {statuses}")
+    print(f"elapsed:      {elapsed:.2f}s ({args.uploads / elapsed:.2f} uploads/s)")
+    print(f"upload p50:   {percentile(upload_latencies, 50):.2f}s  p99: {percentile(upload_latencies, 99):.2f}s")
+    if probe_latencies:
+        print(f"/analyses/:   {len(probe_latencies)} probes, "
+              f"mean {statistics.mean(probe_latencies) * 1000:.0f}ms, "
+              f"max {max(probe_latencies) * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV file to upload")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=600)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
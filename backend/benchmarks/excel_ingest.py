@@ -0,0 +1,96 @@
+"""Compare Excel ingestion with the old ``pd.read_excel`` + regex blank pass.
+
+Run from the backend directory::
+
+    python benchmarks/excel_ingest.py --rows 10000 50000 --columns 12
+
+Writes a synthetic workbook per row count (numbers, dates and text with empty
+and whitespace-only cells, plus a second sheet), then reports parse time and
+the peak of traced allocations for the old path, ``read_excel_frame`` on the
+whole first sheet, and ``read_excel_frame`` on two columns of the first 10% of
+rows. The old and new frames are checked for equality.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel import ExcelSelection, read_excel_frame  # noqa: E402
+
+
+def write_workbook(path, rows, columns, seed=0):
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    sheet.append([f"c{i}" for i in range(columns)])
+    words = ["alpha", "beta", "gamma", "delta", "", "  "]
+    start = datetime(2024, 1, 1)
+    numbers = rng.normal(size=(rows, columns))
+    for r in range(rows):
+        row = []
+        for c in range(columns):
+            kind = c % 4
+            if kind == 0:
+                row.append(int(numbers[r, c] * 100))
+            elif kind == 1:
+                row.append(float(numbers[r, c]) if numbers[r, c] > -2 else None)
+            elif kind == 2:
+                row.append(words[(r + c) % len(words)])
+            else:
+                row.append(start + timedelta(hours=r))
+        sheet.append(row)
+    workbook.create_sheet("Notes").append(["note"])
+    workbook.save(path)
+
+
+def old_path(path):
+    df = pd.read_excel(path)
+    return df.replace(r'^\s*$', np.nan, regex=True)
+
+
+def measure(func, *args):
+    """Time an untraced run, then take the allocation peak of a traced one."""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--columns", type=int, default=12)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'path':>10} {'time':>9} {'peak':>9}  equal")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.xlsx")
+            write_workbook(path, rows, args.columns)
+            old, old_time, old_peak = measure(old_path, path)
+            new, new_time, new_peak = measure(read_excel_frame, path, ".xlsx")
+            selection = ExcelSelection(columns=("c1", "c2"), max_rows=rows // 10)
+            _, part_time, part_peak = measure(read_excel_frame, path, ".xlsx", selection)
+            old.columns = [str(col) for col in old.columns]
+            equal = old.equals(new)
+            for name, elapsed, peak in (("read_excel", old_time, old_peak), ("lazy", new_time, new_peak),
+                                        ("selection", part_time, part_peak)):
+                print(f"{rows:>8} {name:>10} {elapsed:>8.2f}s {peak / 1e6:>7.0f}MB  {equal if name == 'lazy' else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare the batched binned KDE with per-column ``scipy.stats.gaussian_kde``.
+
+Run from the backend directory::
+
+    python benchmarks/kde_peaks.py --rows 1000000 --columns 8
+
+Both detectors run on the same synthetic mix of unimodal, multimodal, skewed
+and discrete columns. The script reports the time of each and how many
+columns got the same peaks: ``exact`` counts identical peak lists, ``close``
+allows each peak to move by one grid step and ignores reference peaks below
+0.1% of the column's maximum density. Those come from isolated tail values
+whose exact KDE depends on sub-bin positions. The scipy reference is skipped
+above ``--max-reference-rows``. Requires ``scipy``.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kde import GRID_POINTS, distribution_peaks  # noqa: E402
+
+# Reference peaks lower than this fraction of the maximum density may be missed.
+SIGNIFICANT_PEAK = 1e-3
+
+
+def synthetic_columns(rows, columns, seed=0):
+    rng = np.random.default_rng(seed)
+    generators = [
+        lambda: rng.normal(size=rows),
+        lambda: np.where(rng.random(rows) < 0.5, rng.normal(0, 1, rows), rng.normal(6, 1, rows)),
+        lambda: np.choose(rng.integers(0, 3, rows),
+                          [rng.normal(0, 1, rows), rng.normal(5, 0.5, rows), rng.normal(10, 2, rows)]),
+        lambda: rng.exponential(2, rows),
+        lambda: rng.integers(0, 5, rows).astype(float),
+        lambda: rng.lognormal(0, 1, rows),
+    ]
+    data = np.column_stack([generators[i % len(generators)]() for i in range(columns)])
+    data[rng.random(data.shape) < 0.02] = np.nan
+    return data
+
+
+def reference_peaks(values):
+    from scipy.signal import find_peaks
+    from scipy.stats import gaussian_kde
+
+    peaks = []
+    for column in values.T:
+        column = column[~np.isnan(column)]
+        x = np.linspace(column.min(), column.max(), GRID_POINTS)
+        density = gaussian_kde(column)(x)
+        found, _ = find_peaks(density)
+        peaks.append((x[found], density[found] / density.max()))
+    return peaks
+
+
+def agreement(expected, actual, values):
+    """Return ``(exact, close)`` counts of columns whose peaks agree."""
+    exact = close = 0
+    for column, (positions, heights), found in zip(values.T, expected, actual):
+        found = np.empty(0) if found is None else found
+        if len(positions) == len(found) and np.allclose(positions, found):
+            exact += 1
+        step = (np.nanmax(column) - np.nanmin(column)) / (GRID_POINTS - 1) * 1.001
+
+        def near(a, b):
+            if len(a) == 0:
+                return True
+            return len(b) > 0 and np.abs(a - b[:, None]).min(axis=0) <= step
+
+        significant = positions[heights >= SIGNIFICANT_PEAK]
+        if np.all(near(significant, found)) and np.all(near(found, positions)):
+            close += 1
+    return exact, close
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--max-reference-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'columns':>8} {'batched':>10} {'scipy':>10} {'speedup':>8} {'exact':>6} {'close':>6}")
+    for rows in args.rows:
+        values = synthetic_columns(rows, args.columns)
+        batched, batched_time = timed(distribution_peaks, values)
+        if rows > args.max_reference_rows:
+            print(f"{rows:>10} {args.columns:>8} {batched_time:>9.3f}s {'-':>10} {'-':>8} {'-':>6} {'-':>6}")
+            continue
+        expected, reference_time = timed(reference_peaks, values)
+        exact, close = agreement(expected, batched, values)
+        print(f"{rows:>10} {args.columns:>8} {batched_time:>9.3f}s {reference_time:>9.3f}s "
+              f"{reference_time / batched_time:>7.0f}x {exact:>3}/{args.columns:<2} {close:>3}/{args.columns:<2}")
+
+
+if __name__ == "__main__":
+    main()
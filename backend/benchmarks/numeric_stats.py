@@ -0,0 +1,77 @@
+"""Compare the fused numeric statistics kernel with per-column pandas calls.
+
+Run from the backend directory::
+
+    python benchmarks/numeric_stats.py --rows 1000000 --columns 20
+
+The pandas baseline is what the in-memory path used to do for every numeric
+column: ``describe()``, two ``quantile`` calls, ``median``, ``skew``,
+``kurtosis``, a boolean-mask outlier filter and ``isnull().sum()`` twice.
+Reports wall time and the peak of traced allocations for each.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import iqr_bounds  # noqa: E402
+from stats import numeric_summary  # noqa: E402
+
+
+def pandas_baseline(df):
+    cols = list(df.columns)
+    df.isnull().sum()
+    df[cols].describe().to_dict()
+    df.isnull().sum()
+    for col in cols:
+        q1 = df[col].quantile(0.25)
+        q3 = df[col].quantile(0.75)
+        lower, upper = iqr_bounds(q1, q3)
+        len(df[(df[col] < lower) | (df[col] > upper)][col])
+        df[col].median()
+        df[col].skew()
+        df[col].kurtosis()
+
+
+def fused(df):
+    summary = numeric_summary(df.to_numpy(dtype=float, na_value=np.nan, copy=True), overwrite=True)
+    summary.describe(list(df.columns))
+
+
+def measure(func, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--columns", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'columns':>8} {'pandas':>9} {'fused':>9} {'speedup':>8} "
+          f"{'pandas peak':>12} {'fused peak':>11}")
+    for rows in args.rows:
+        data = rng.standard_normal((rows, args.columns))
+        data[rng.random(data.shape) < 0.05] = np.nan
+        df = pd.DataFrame(data, columns=[f"c{i}" for i in range(args.columns)])
+        pandas_time, pandas_peak = measure(pandas_baseline, df)
+        fused_time, fused_peak = measure(fused, df)
+        print(f"{rows:>10} {args.columns:>8} {pandas_time:>8.3f}s {fused_time:>8.3f}s "
+              f"{pandas_time / fused_time:>7.1f}x {pandas_peak / 1e6:>10.0f}MB {fused_peak / 1e6:>9.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
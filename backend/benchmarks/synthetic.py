@@ -0,0 +1,118 @@
+"""Synthetic datasets for the upload benchmarks.
+
+Run from the backend directory to write a file::
+
+    python benchmarks/synthetic.py data.csv --rows 100000 --columns 20 --nulls 0.05
+
+or import ``synthetic_frame``/``write_dataset``. The column types are drawn
+from ``--mix`` (weights of numeric, categorical, date and text columns);
+categorical columns have ``--cardinality`` distinct values, text columns are
+mostly unique, ``--nulls`` of the cells are empty and ``--duplicates`` of
+the rows repeat an earlier row. The same arguments and seed always give the
+same file.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+KINDS = ("numeric", "categorical", "date", "text")
+DEFAULT_MIX = "numeric=0.5,categorical=0.3,date=0.1,text=0.1"
+
+
+def parse_mix(mix):
+    """``"numeric=0.5,date=0.5"`` -> weights per kind, normalized to sum to 1."""
+    weights = dict.fromkeys(KINDS, 0.0)
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in weights:
+            raise ValueError(f"Unknown column kind '{kind}', expected one of: {', '.join(KINDS)}")
+        weights[kind.strip()] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("The column mix needs a positive weight")
+    return {kind: weight / total for kind, weight in weights.items()}
+
+
+def column_kinds(columns, mix):
+    """Kinds of ``columns`` columns in proportion to ``mix`` (largest remainder)."""
+    weights = parse_mix(mix) if isinstance(mix, str) else mix
+    exact = np.array([weights[kind] * columns for kind in KINDS])
+    counts = np.floor(exact).astype(int)
+    counts[np.argsort(counts - exact)[:columns - counts.sum()]] += 1
+    return [kind for kind, count in zip(KINDS, counts) for _ in range(count)]
+
+
+def _column(kind, rows, cardinality, rng, index):
+    if kind == "numeric":
+        # Alternate distributions so skew, outliers and correlations show up
+        if index % 3 == 0:
+            return rng.normal(100, 15, rows).round(2)
+        if index % 3 == 1:
+            return rng.exponential(50, rows).round(2)
+        return rng.integers(0, 1000, rows)
+    if kind == "categorical":
+        labels = np.array([f"cat_{index}_{i}" for i in range(cardinality)], dtype=object)
+        # Zipf-like frequencies: a few common values and a long tail
+        weights = 1 / np.arange(1, cardinality + 1)
+        return labels[rng.choice(cardinality, rows, p=weights / weights.sum())]
+    if kind == "date":
+        start = np.datetime64("2020-01-01T00:00")
+        offsets = rng.integers(0, 4 * 365 * 24 * 60, rows).astype("timedelta64[m]")
+        return pd.Series(start + offsets).dt.strftime("%Y-%m-%d %H:%M").to_numpy(dtype=object)
+    return np.array([f"text {index} {value:x}" for value in rng.integers(0, 1 << 48, rows)], dtype=object)
+
+
+def synthetic_frame(rows, columns, mix=DEFAULT_MIX, nulls=0.0, cardinality=20, duplicates=0.0, seed=0):
+    """A DataFrame of ``rows`` x ``columns`` with the requested type mix and data quality."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for index, kind in enumerate(column_kinds(columns, mix)):
+        values = _column(kind, rows, cardinality, rng, index)
+        if nulls:
+            values = pd.Series(values).mask(rng.random(rows) < nulls).to_numpy()
+        data[f"{kind}_{index}"] = values
+    frame = pd.DataFrame(data)
+    if duplicates and rows > 1:
+        # Overwrite a fraction of the rows with copies of rows before them
+        targets = np.flatnonzero(rng.random(rows) < duplicates)
+        targets = targets[targets > 0]
+        sources = (rng.random(len(targets)) * targets).astype(np.int64)
+        for col in frame.columns:
+            values = frame[col].to_numpy(copy=True)
+            values[targets] = values[sources]
+            frame[col] = values
+    return frame
+
+
+def write_dataset(frame, path):
+    """Write ``frame`` as CSV or, for ``.xlsx``/``.xls`` paths, as an Excel workbook."""
+    if path.endswith((".xlsx", ".xls")):
+        frame.to_excel(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def add_arguments(parser):
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"column kind weights (default {DEFAULT_MIX})")
+    parser.add_argument("--nulls", type=float, default=0.05, help="fraction of empty cells")
+    parser.add_argument("--cardinality", type=int, default=20, help="distinct values per categorical column")
+    parser.add_argument("--duplicates", type=float, default=0.01, help="fraction of repeated rows")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="output .csv or .xlsx file")
+    parser.add_argument("--rows", type=int, default=100_000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    frame = synthetic_frame(args.rows, args.columns, args.mix, args.nulls, args.cardinality,
+                            args.duplicates, args.seed)
+    write_dataset(frame, args.path)
+    print(f"Wrote {args.rows} rows x {args.columns} columns to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
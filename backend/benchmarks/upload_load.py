@@ -0,0 +1,70 @@
+"""Load test of the /upload-file/ write path under N concurrent clients.
+
+Start the API first, e.g. ``uvicorn main:app``, then::
+
+    python benchmarks/upload_load.py small.csv --clients 1 8 32 --uploads 20
+
+Each of the N clients sends ``--uploads`` uploads back to back under its own
+``X-Session-Id``. By default every upload sends the same bytes, so after the
+first one the analysis comes from the dataset cache and the time is dominated
+by the request and the database write; ``--unique`` makes every upload's bytes
+unique to measure full analyses instead. Reports successful uploads per
+second, p50/p99 latency and the status codes seen (database lock errors
+surface as 500s). Requires ``httpx``.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from concurrent_uploads import percentile, unique_copy
+
+
+async def client_loop(client, url, client_id, name, content, args, latencies, statuses):
+    for i in range(args.uploads):
+        body = unique_copy(content, f"{client_id}_{i}") if args.unique else content
+        start = time.perf_counter()
+        response = await client.post(f"{url}/upload-file/", files={"file": (name, body)},
+                                     headers={"X-Session-Id": f"load{client_id}"})
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def run(args):
+    with open(args.path, "rb") as f:
+        content = f.read()
+    name = os.path.basename(args.path)
+
+    print(f"{'clients':>8} {'uploads':>8} {'ok/s':>8} {'p50':>8} {'p99':>8}  statuses")
+    limits = httpx.Limits(max_connections=max(args.clients))
+    async with httpx.AsyncClient(timeout=httpx.Timeout(args.timeout), limits=limits) as client:
+        # Warm the dataset cache so the first measured round is not an outlier
+        await client.post(f"{args.url}/upload-file/", files={"file": (name, content)})
+        for clients in args.clients:
+            latencies, statuses = [], {}
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                client_loop(client, args.url, c, name, content, args, latencies, statuses)
+                for c in range(clients)
+            ))
+            elapsed = time.perf_counter() - start
+            ok = statuses.get(200, 0)
+            print(f"{clients:>8} {len(latencies):>8} {ok / elapsed:>8.1f} "
+                  f"{percentile(latencies, 50) * 1000:>6.0f}ms {percentile(latencies, 99) * 1000:>6.0f}ms  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or Excel file to upload")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--uploads", type=int, default=20, help="uploads per client")
+    parser.add_argument("--unique", action="store_true", help="defeat the dataset cache")
+    parser.add_argument("--timeout", type=float, default=600)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
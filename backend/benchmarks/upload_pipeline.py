@@ -0,0 +1,255 @@
+"""Per-stage benchmark of /upload-file/ on synthetic datasets, run in-process.
+
+Run from the backend directory::
+
+    python benchmarks/upload_pipeline.py --rows 10000 100000 --columns 20 --format csv xlsx \\
+        --output results.json [--baseline previous.json]
+
+Each dataset comes from ``synthetic.py`` (see its options for the type mix,
+nulls, cardinality and duplicates). Uploads go through the FastAPI test
+client with ``ANALYSIS_WORKERS=0``, so the analysis runs in this process,
+against a temporary database, dataset cache and result cache that are
+emptied before every upload. The pipeline's ``progress`` callbacks mark the stages (``parse``,
+``type_inference``, ``describe``, ``insights``, ``correlation``,
+``serialization``; the streaming modes only report ``parse`` and
+``serialization``); ``request`` covers receiving and spooling the upload
+before the analysis starts and ``db_write`` runs from the end of the analysis
+to the response. For every stage the wall time, the peak RSS while it ran (sampled
+every few milliseconds) and the size of the response sections it produced
+are recorded, plus the total time and the response size.
+
+Results are written as JSON with the environment (commit, library versions,
+``COLUMN_WORKERS``) so runs of different versions or settings can be compared; ``--baseline`` prints the
+ratio of every stage time to a previous results file.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+STATE_DIR = tempfile.mkdtemp(prefix="upload-bench-")
+# Analyse in this process, against throwaway storage; set before importing the app
+os.environ["ANALYSIS_WORKERS"] = "0"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(STATE_DIR, 'bench.db')}")
+os.environ.setdefault("DATASET_CACHE_DIR", os.path.join(STATE_DIR, "datasets"))
+os.environ.setdefault("JOBS_DIR", os.path.join(STATE_DIR, "jobs"))
+os.environ.setdefault("RESULT_CACHE_DIR", os.path.join(STATE_DIR, "results"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from config import COLUMN_WORKERS  # noqa: E402
+from datasets import dataset_cache  # noqa: E402
+from results import result_cache  # noqa: E402
+from synthetic import add_arguments, synthetic_frame, write_dataset  # noqa: E402
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux), or the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class StageRecorder:
+    """``progress`` callback that times stages and samples the peak RSS of each."""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.stages = {}
+        self._current = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_bytes()
+            with self._lock:
+                if self._current is not None:
+                    stage = self.stages[self._current]
+                    stage["peak_rss_bytes"] = max(stage["peak_rss_bytes"], rss)
+
+    def start(self):
+        self._sampler.start()
+
+    def enter(self, stage):
+        now = time.perf_counter()
+        with self._lock:
+            if stage == self._current:
+                return
+            if self._current is not None:
+                self.stages[self._current]["seconds"] += now - self._started
+            self._current, self._started = stage, now
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "peak_rss_bytes": 0, "section_bytes": 0})
+            entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], rss_bytes())
+
+    def __call__(self, stage, percent, **sections):
+        self.enter(stage)
+        if sections:
+            size = len(json.dumps(sections, default=str))
+            with self._lock:
+                self.stages[stage]["section_bytes"] += size
+
+    def stop(self):
+        self.enter(None)
+        self._stop.set()
+        self._sampler.join()
+        self.stages.pop(None, None)
+        return self.stages
+
+
+def run_upload(client, name, content, params):
+    """Upload once and return ``(total_seconds, response_bytes, stages)``."""
+    recorder = StageRecorder()
+    run_analysis = main.run_analysis
+
+    def recorded(*args):
+        # Passed positionally after the upload arguments, as the job path does
+        result = run_analysis(*args, recorder)
+        recorder.enter("db_write")
+        return result
+
+    main.run_analysis = recorded
+    recorder.start()
+    try:
+        start = time.perf_counter()
+        recorder.enter("request")
+        response = client.post("/upload-file/", params=params, files={"file": (name, content)})
+        total = time.perf_counter() - start
+    finally:
+        main.run_analysis = run_analysis
+        stages = recorder.stop()
+    if response.status_code != 200:
+        raise SystemExit(f"Upload failed with {response.status_code}: {response.text[:500]}")
+    return total, len(response.content), stages
+
+
+def clear_caches():
+    for entry in os.scandir(dataset_cache.root):
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+    result_cache.clear()
+
+
+def summarize(runs):
+    """Median time, maximum peak RSS and sizes over repeated runs of one case."""
+    stage_names = list(dict.fromkeys(name for run in runs for name in run["stages"]))
+    stages = {}
+    for name in stage_names:
+        entries = [run["stages"][name] for run in runs if name in run["stages"]]
+        stages[name] = {
+            "seconds": float(np.median([entry["seconds"] for entry in entries])),
+            "peak_rss_bytes": int(max(entry["peak_rss_bytes"] for entry in entries)),
+            "section_bytes": int(entries[-1]["section_bytes"]),
+        }
+    return {
+        "total_seconds": float(np.median([run["total_seconds"] for run in runs])),
+        "response_bytes": runs[-1]["response_bytes"],
+        "stages": stages,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=HERE, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "column_workers": COLUMN_WORKERS,
+    }
+
+
+def case_key(case):
+    return f"{case['format']}/{case['mode']}/{case['rows']}x{case['columns']}"
+
+
+def print_case(case, result, baseline=None):
+    print(f"\n{case_key(case)}: {result['total_seconds']:.3f}s, response {result['response_bytes'] / 1e6:.2f} MB")
+    for name, stage in result["stages"].items():
+        line = (f"  {name:<15} {stage['seconds']:>8.3f}s  peak RSS {stage['peak_rss_bytes'] / 1e6:>8.1f} MB"
+                f"  sections {stage['section_bytes'] / 1e3:>8.1f} kB")
+        previous = (baseline or {}).get("stages", {}).get(name)
+        if previous and previous["seconds"] > 0:
+            line += f"  x{stage['seconds'] / previous['seconds']:.2f} vs baseline"
+        print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--format", nargs="+", default=["csv"], choices=["csv", "xlsx"])
+    parser.add_argument("--mode", nargs="+", default=["full"], choices=["full", "stream", "approx"],
+                        help="analysis mode; stream and approx only apply to CSV")
+    parser.add_argument("--repeat", type=int, default=3, help="uploads per case; the median is reported")
+    parser.add_argument("--output", default="upload_pipeline.json")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare with")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {case_key(case["case"]): case["result"] for case in json.load(f)["cases"]}
+
+    results = {"environment": environment(), "arguments": vars(args), "cases": []}
+    with TestClient(main.app) as client, tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            frame = synthetic_frame(rows, args.columns, args.mix, args.nulls, args.cardinality,
+                                    args.duplicates, args.seed)
+            for file_format in args.format:
+                path = os.path.join(tmp, f"bench_{rows}.{file_format}")
+                write_dataset(frame, path)
+                with open(path, "rb") as f:
+                    content = f.read()
+                for mode in args.mode:
+                    if mode != "full" and file_format != "csv":
+                        continue
+                    params = {"stream": "true"} if mode == "stream" else {"approximate": "true"} if mode == "approx" else {}
+                    runs = []
+                    for _ in range(args.repeat):
+                        # Every upload is analysed from scratch, not answered from the cache
+                        clear_caches()
+                        total, size, stages = run_upload(client, os.path.basename(path), content, params)
+                        runs.append({"total_seconds": total, "response_bytes": size, "stages": stages})
+                    case = {"format": file_format, "mode": mode, "rows": rows, "columns": args.columns,
+                            "file_bytes": len(content)}
+                    result = summarize(runs)
+                    results["cases"].append({"case": case, "result": result, "runs": runs})
+                    print_case(case, result, baseline.get(case_key(case)))
+
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2)
+    print(f"\nWrote {args.output}")
+    shutil.rmtree(STATE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
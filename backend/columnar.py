@@ -0,0 +1,180 @@
+"""Columnar transports for the ``raw_data`` section of an analysis.
+
+``raw_data`` is returned as JSON by default. Clients that read it column by
+column can ask for a binary body instead, either with the ``raw_format`` query
+parameter or through the ``Accept`` header:
+
+* ``arrow`` (``application/vnd.apache.arrow.stream``): an Arrow IPC stream of
+  the dataset. The rest of the analysis is stored as JSON under the ``analysis``
+  key of the schema metadata. Requires ``pyarrow``; without it ``arrow`` is
+  rejected when the format is negotiated, before any analysis runs.
+* ``columns`` (``application/vnd.dashboardly.columns``): one typed-array buffer
+  per column, no extra dependency. Layout::
+
+      8 bytes   magic b"DBCOLS01"
+      4 bytes   header length H (uint32, little endian)
+      H bytes   UTF-8 JSON header, space-padded so buffers start 8-byte aligned
+      ...       column buffers, each at an 8-byte aligned offset
+
+  The header is ``{"analysis": {...}, "num_rows": n, "columns": [...]}``. Each
+  column entry has ``name``, ``type`` (a NumPy dtype name such as ``float64``
+  or ``int32``, ``bool``, ``timestamp_ms`` or ``utf8``) and ``[offset, length]``
+  pairs for ``data``, ``validity`` and, for ``utf8``, ``offsets``. Offsets are
+  relative to the first byte after the header. ``timestamp_ms`` columns are
+  float64 milliseconds since the epoch with NaN for missing values, so they
+  map straight onto a ``Float64Array``. ``validity`` is an Arrow-style bitmap
+  (least significant bit first) and is only present for columns that cannot
+  carry NaN. ``utf8`` columns use int32 offsets into the data buffer.
+
+Numeric buffers are taken from the DataFrame's NumPy arrays as they are; no
+cell goes through Python-level conversion.
+
+The analysis is passed in already encoded, as ``{section: JSON bytes}`` (see
+``serialization.encode_sections``), and spliced into the body unchanged.
+"""
+import importlib.util
+import struct
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response
+
+from serialization import dumps, encode_sections, frame_columns, join_encoded
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNS_MEDIA_TYPE = "application/vnd.dashboardly.columns"
+RAW_FORMATS = {
+    "json": "application/json",
+    "arrow": ARROW_MEDIA_TYPE,
+    "columns": COLUMNS_MEDIA_TYPE,
+}
+COLUMNS_MAGIC = b"DBCOLS01"
+# pyarrow is only imported when an Arrow body is encoded
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def negotiate_raw_format(raw_format=None, accept=None):
+    """Pick the raw_data transport from the query flag, then the Accept header.
+
+    ``arrow`` is only offered when ``pyarrow`` is installed.
+    """
+    if raw_format:
+        raw_format = raw_format.lower()
+        if raw_format not in RAW_FORMATS:
+            raise ValueError(
+                f"Unsupported raw_format '{raw_format}', expected one of: {', '.join(RAW_FORMATS)}"
+            )
+        if raw_format == "arrow" and not ARROW_AVAILABLE:
+            raise ValueError("raw_format 'arrow' is not available on this server (pyarrow is not installed)")
+        return raw_format
+    if accept:
+        media_types = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+        for name, media_type in RAW_FORMATS.items():
+            if name == "arrow" and not ARROW_AVAILABLE:
+                continue
+            if name != "json" and media_type in media_types:
+                return name
+    return "json"
+
+
+def _pad(length):
+    return (-length) % 8
+
+
+def _validity_bitmap(mask):
+    return np.packbits(mask, bitorder="little")
+
+
+def _column_buffers(series):
+    """Return ``(type, data, validity, offsets)`` NumPy buffers for one column."""
+    if pd.api.types.is_bool_dtype(series) and not series.hasnans:
+        return "bool", series.to_numpy(dtype=np.uint8), None, None
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        values = series.to_numpy(dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+        values[series.isna().to_numpy()] = np.nan
+        return "timestamp_ms", values, None, None
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+        values = np.ascontiguousarray(series.to_numpy())
+        return values.dtype.name, values, None, None
+    if pd.api.types.is_numeric_dtype(series):
+        # Nullable extension dtypes (Int64, Float64, boolean) become float64 with NaN.
+        return "float64", series.to_numpy(dtype=np.float64, na_value=np.nan), None, None
+
+    valid = series.notna().to_numpy()
+    encoded = [str(value).encode("utf-8") if ok else b"" for value, ok in zip(series.to_numpy(), valid)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    validity = None if valid.all() else _validity_bitmap(valid)
+    return "utf8", data, validity, offsets
+
+
+def encode_columns(sections, frame):
+    """Encode ``frame`` in the typed-array layout described in the module docstring."""
+    buffers = []
+    position = 0
+
+    def add(array):
+        nonlocal position
+        if array is None:
+            return None
+        view = memoryview(array).cast("B")
+        entry = [position, view.nbytes]
+        buffers.append(view)
+        padding = _pad(view.nbytes)
+        if padding:
+            buffers.append(b"\0" * padding)
+        position += view.nbytes + padding
+        return entry
+
+    columns = []
+    for name in frame.columns:
+        col_type, data, validity, offsets = _column_buffers(frame[name])
+        entry = {"name": str(name), "type": col_type, "data": add(data)}
+        entry["validity"] = add(validity)
+        if offsets is not None:
+            entry["offsets"] = add(offsets)
+        columns.append(entry)
+
+    header = join_encoded({
+        "analysis": join_encoded(sections),
+        "num_rows": dumps(len(frame)),
+        "columns": dumps(columns),
+    })
+    header += b" " * _pad(len(COLUMNS_MAGIC) + 4 + len(header))
+    return b"".join([COLUMNS_MAGIC, struct.pack("<I", len(header)), header, *buffers])
+
+
+def encode_arrow(sections, frame):
+    """Encode ``frame`` as an Arrow IPC stream with the analysis in the schema metadata."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Arrow output requires the pyarrow package")
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"analysis"] = join_encoded(sections)
+    table = table.replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_analysis(sections, frame, raw_format="json"):
+    """Encode the analysis ``sections`` with ``frame`` as ``raw_data``; returns ``(body, media_type)``."""
+    if raw_format == "arrow":
+        return encode_arrow(sections, frame), ARROW_MEDIA_TYPE
+    if raw_format == "columns":
+        return encode_columns(sections, frame), COLUMNS_MEDIA_TYPE
+    body = join_encoded({**sections, "raw_data": dumps(frame_columns(frame))})
+    return body, "application/json"
+
+
+def render_analysis(analysis, frame, raw_format="json"):
+    """Build the HTTP response for an analysis whose ``raw_data`` is ``frame``."""
+    body, media_type = encode_analysis(encode_sections(analysis), frame, raw_format)
+    return Response(content=body, media_type=media_type)
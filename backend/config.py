@@ -0,0 +1,124 @@
+import os
+
+# Tunables for the upload pipeline. Every value can be overridden through an
+# environment variable of the same name.
+
+# Size of the reads used when spooling an upload to disk.
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+
+# Rows per DataFrame chunk in streaming mode.
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", 100_000))
+
+# CSV uploads larger than this are analysed in streaming mode even when the
+# client did not ask for it.
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("STREAMING_THRESHOLD_BYTES", 200 * 1024 * 1024))
+
+# Rows kept in the uniform row sample of a streamed upload. The sample backs
+# the quantiles and the raw_data returned for streamed uploads.
+STREAM_SAMPLE_ROWS = int(os.environ.get("STREAM_SAMPLE_ROWS", 50_000))
+
+# Distinct values tracked per column in streaming mode before the column is
+# treated as high-cardinality and its value counts are dropped.
+STREAM_MAX_DISTINCT = int(os.environ.get("STREAM_MAX_DISTINCT", 200_000))
+# Distinct row hashes (8 bytes each) kept for the exact duplicate count in
+# streaming mode. Past it, duplicates are estimated from a hash sample.
+STREAM_MAX_ROW_HASHES = int(os.environ.get("STREAM_MAX_ROW_HASHES", 8 * 1024 ** 2))
+
+# Non-null values per column used to propose a column type before the full
+# column is confirmed with a single vectorized conversion.
+INFERENCE_SAMPLE_ROWS = int(os.environ.get("INFERENCE_SAMPLE_ROWS", 1000))
+
+# On-disk columnar cache of parsed uploads, keyed by the SHA-256 of the file.
+# Least recently used datasets are evicted once either limit is exceeded.
+DATASET_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", "./dataset_cache")
+DATASET_CACHE_MAX_BYTES = int(os.environ.get("DATASET_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+DATASET_CACHE_MAX_ENTRIES = int(os.environ.get("DATASET_CACHE_MAX_ENTRIES", 100))
+
+# Cache of encoded /upload-file/ responses, keyed by the upload's content hash
+# and analysis options. Each API process keeps up to RESULT_CACHE_MEMORY_BYTES
+# of responses in memory; RESULT_CACHE_DIR holds up to RESULT_CACHE_DISK_BYTES
+# shared by all processes. Least recently used responses are evicted beyond
+# either limit, and responses older than RESULT_CACHE_TTL_SECONDS expire.
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "./result_cache")
+RESULT_CACHE_MEMORY_BYTES = int(os.environ.get("RESULT_CACHE_MEMORY_BYTES", 128 * 1024 ** 2))
+RESULT_CACHE_DISK_BYTES = int(os.environ.get("RESULT_CACHE_DISK_BYTES", 1024 ** 3))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", 24 * 3600))
+
+# Upper bounds on the resolution a query endpoint will return.
+MAX_HISTOGRAM_BINS = int(os.environ.get("MAX_HISTOGRAM_BINS", 512))
+MAX_DOWNSAMPLE_POINTS = int(os.environ.get("MAX_DOWNSAMPLE_POINTS", 10_000))
+MAX_AGGREGATE_GROUPS = int(os.environ.get("MAX_AGGREGATE_GROUPS", 1000))
+MAX_SAMPLE_ROWS = int(os.environ.get("MAX_SAMPLE_ROWS", 100_000))
+MAX_CORRELATION_MATRIX_COLUMNS = int(os.environ.get("MAX_CORRELATION_MATRIX_COLUMNS", 200))
+# Columns a /datasets/{id}/correlation query may correlate; each one is read
+# (and ranked, for Spearman) over every row of the dataset.
+MAX_CORRELATION_COLUMNS = int(os.environ.get("MAX_CORRELATION_COLUMNS", 1000))
+
+# Worker processes that run upload analyses off the event loop. 0 runs them
+# in the server process on a thread instead.
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Uploads allowed to wait for a free worker; further uploads get a 503.
+ANALYSIS_QUEUE_LIMIT = int(os.environ.get("ANALYSIS_QUEUE_LIMIT", 16))
+
+# Threads each analysis uses for per-column work (type inference, numeric
+# statistics, KDE, categorical counts). By default the cores are shared out
+# between the analysis workers; 1 runs the columns serially.
+COLUMN_WORKERS = int(os.environ.get("COLUMN_WORKERS", max(1, (os.cpu_count() or 1) // max(1, ANALYSIS_WORKERS))))
+# Numeric columns per task when a column matrix is split between threads.
+# Blocks are the same whatever the thread count, so results do not depend on it.
+COLUMN_BLOCK_COLS = int(os.environ.get("COLUMN_BLOCK_COLS", 32))
+
+# Database holding the analysis history. Any SQLAlchemy URL works, e.g. a
+# server database (postgresql+psycopg://...) when several API processes share
+# one store; SQLite files are opened in WAL mode.
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./csv_analysis.db")
+# Pooled connections kept open, and extra ones allowed under load.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+# Seconds a SQLite connection waits for the writer lock before failing.
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", 30))
+# Analyses inserted per transaction by the database writer task.
+DB_WRITE_BATCH = int(os.environ.get("DB_WRITE_BATCH", 64))
+
+# Owner of analyses uploaded without an X-Session-Id header.
+DEFAULT_OWNER = os.environ.get("DEFAULT_OWNER", "anonymous")
+
+# Default and maximum page size of the /analyses/ listing.
+ANALYSES_PAGE_SIZE = int(os.environ.get("ANALYSES_PAGE_SIZE", 50))
+MAX_ANALYSES_PAGE_SIZE = int(os.environ.get("MAX_ANALYSES_PAGE_SIZE", 500))
+
+# Background analysis jobs (/jobs/) keep their progress, sections and result
+# under this directory until they are older than JOB_TTL_SECONDS.
+JOBS_DIR = os.environ.get("JOBS_DIR", "./jobs")
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+
+# Seconds between status checks on a /jobs/{job_id}/events stream.
+JOB_EVENTS_INTERVAL = float(os.environ.get("JOB_EVENTS_INTERVAL", 0.5))
+
+# Approximate analysis mode (?approximate=true): sketch sizes. Memory per
+# column is fixed by these values instead of by the number of distinct values.
+# HyperLogLog registers are 2**SKETCH_HLL_PRECISION bytes per column.
+SKETCH_HLL_PRECISION = int(os.environ.get("SKETCH_HLL_PRECISION", 14))
+# Misra-Gries counters per text/date column (top categories).
+SKETCH_TOP_K = int(os.environ.get("SKETCH_TOP_K", 1000))
+# KLL accuracy parameter per numeric column (quantiles and outlier counts).
+SKETCH_QUANTILE_K = int(os.environ.get("SKETCH_QUANTILE_K", 1000))
+# Distinct row hashes kept for duplicate estimation before sampling kicks in.
+SKETCH_DUPLICATE_HASHES = int(os.environ.get("SKETCH_DUPLICATE_HASHES", 1 << 18))
+
+# Correlation analysis: numeric columns per tile of the blocked correlation
+# computation, and the number of strongest pairs that get their own insight.
+CORRELATION_BLOCK_COLS = int(os.environ.get("CORRELATION_BLOCK_COLS", 256))
+CORRELATION_MAX_INSIGHTS = int(os.environ.get("CORRELATION_MAX_INSIGHTS", 50))
+
+# Categories per column in categorical_distributions. The rows of all other
+# categories are reported in categorical_other_counts, so the payload of a
+# high-cardinality column stays bounded.
+CATEGORY_TOP_K = int(os.environ.get("CATEGORY_TOP_K", 50))
+
+# Log level (debug, info, warning, error) of the key=value logs on stderr.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "info")
+# Record allocated bytes and the tracemalloc peak of every upload stage. This
+# slows allocation-heavy code noticeably, so it is off by default.
+TRACE_MEMORY = os.environ.get("TRACE_MEMORY", "").lower() in ("1", "true", "yes")
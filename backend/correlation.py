@@ -0,0 +1,130 @@
+"""Correlation matrices, strong pairs and multicollinearity groups.
+
+The Pearson matrix is one BLAS matrix product of the standardized columns.
+With missing values every pair uses its complete rows, as
+``DataFrame.corr`` does, from four matrix products over the centered values
+and their presence mask. Tables wider than ``CORRELATION_BLOCK_COLS`` are
+processed in square tiles of that many columns, so the strong pairs of a
+wide table are found without holding the full p x p matrix and the
+temporaries of its products at once. Spearman is Pearson on average ranks.
+"""
+import numpy as np
+import pandas as pd
+
+from config import CORRELATION_BLOCK_COLS
+
+METHODS = ("pearson", "spearman")
+
+
+def rank_columns(values):
+    """Average ranks of each column of a 2D float array; NaN stays NaN.
+
+    Ranks are taken over each column's non-missing values, not per pair, so
+    with missing values Spearman can differ slightly from pandas.
+    """
+    return pd.DataFrame(values).rank(method="average").to_numpy(dtype=np.float64)
+
+
+class _Columns:
+    """Centered (and, without missing values, unit-norm) columns of a 2D array."""
+
+    def __init__(self, values, method="pearson"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown correlation method '{method}'")
+        values = np.asarray(values, dtype=np.float64)
+        if method == "spearman":
+            values = rank_columns(values)
+        self.mask = ~np.isnan(values)
+        self.complete = bool(self.mask.all())
+        # Mean of the present values, 0 for an all-NaN column; unlike
+        # np.nanmean this does not warn about empty columns
+        centered = np.where(self.mask, values, 0.0)
+        centered -= centered.sum(axis=0) / np.maximum(self.mask.sum(axis=0), 1)
+        centered[~self.mask] = 0.0
+        if self.complete:
+            norm = np.sqrt(np.einsum("ij,ij->j", centered, centered))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                # A constant column has no correlation: NaN, as in pandas
+                centered /= np.where(norm > 0, norm, np.nan)
+        self.values = centered
+
+    @property
+    def width(self):
+        return self.values.shape[1]
+
+    def block(self, rows, cols):
+        """Correlations of the columns in slice ``rows`` with those in slice ``cols``."""
+        x, y = self.values[:, rows], self.values[:, cols]
+        if self.complete:
+            corr = x.T @ y
+        else:
+            mx = self.mask[:, rows].astype(np.float64)
+            my = self.mask[:, cols].astype(np.float64)
+            n = mx.T @ my
+            sx, sy = x.T @ my, mx.T @ y
+            sxx, syy = (x * x).T @ my, mx.T @ (y * y)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cov = x.T @ y - sx * sy / n
+                corr = cov / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+                corr[n < 2] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+
+def correlation_matrix(values, method="pearson"):
+    """Full correlation matrix of the columns of a 2D float array."""
+    columns = _Columns(values, method)
+    corr = columns.block(slice(None), slice(None))
+    # The diagonal is exactly 1 wherever the column has a defined correlation
+    diagonal = np.diagonal(corr).copy()
+    np.fill_diagonal(corr, np.where(np.isnan(diagonal), np.nan, 1.0))
+    return corr
+
+
+def upper_pairs(corr, threshold):
+    """Row-major ``(i, j, r)`` arrays of the pairs ``i < j`` with ``|r| > threshold``."""
+    i, j = np.nonzero(np.triu(np.abs(corr) > threshold, k=1))
+    return i, j, corr[i, j]
+
+
+def strong_pairs(values, threshold, method="pearson", block_cols=CORRELATION_BLOCK_COLS):
+    """Like ``upper_pairs(correlation_matrix(values), threshold)``, computed tile by tile."""
+    columns = _Columns(values, method)
+    p = columns.width
+    found = []
+    for start in range(0, p, block_cols):
+        rows = slice(start, min(start + block_cols, p))
+        for other in range(start, p, block_cols):
+            cols = slice(other, min(other + block_cols, p))
+            corr = columns.block(rows, cols)
+            strong = np.abs(corr) > threshold
+            if other == start:
+                strong = np.triu(strong, k=1)
+            i, j = np.nonzero(strong)
+            found.append((i + start, j + other, corr[i, j]))
+    if not found:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0)
+    i, j, r = (np.concatenate(parts) for parts in zip(*found))
+    order = np.lexsort((j, i))
+    return i[order], j[order], r[order]
+
+
+def multicollinearity_groups(count, i, j):
+    """Connected components (of two or more columns) of the graph with edges ``(i, j)``.
+
+    Returns lists of column positions, largest group first.
+    """
+    labels = np.arange(count)
+    if len(i):
+        while True:
+            # Propagate the smallest label across every edge, then jump pointers
+            low = np.minimum(labels[i], labels[j])
+            updated = labels.copy()
+            np.minimum.at(updated, i, low)
+            np.minimum.at(updated, j, low)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+    roots, sizes = np.unique(labels, return_counts=True)
+    groups = [np.flatnonzero(labels == root).tolist() for root in roots[sizes > 1]]
+    return sorted(groups, key=lambda group: (-len(group), group[0]))
@@ -0,0 +1,334 @@
+"""On-disk columnar cache of parsed uploads, keyed by the SHA-256 of the file.
+
+Each dataset lives in ``<DATASET_CACHE_DIR>/<sha256>/``::
+
+    manifest.json           row count and one entry per column
+    c<i>.bin                raw column values (int64, float64, datetime64[ns]
+                            as int64, or int32 category codes with -1 = missing)
+    c<i>.categories.npy     category values for ``category`` columns, which are
+                            decoded back to the column's ``dtype`` (object or bool)
+    analysis-<mode>-v<N>.json   cached /upload-file/ response for an analysis mode
+    raw-rows-<mode>.npy         row positions backing ``raw_data`` when it is a sample
+    state-<mode>-v<N>.pkl       pickled streaming analysis state, for appends
+
+Columns are appended chunk by chunk while the upload is parsed and are read
+back through ``np.memmap``, so the query endpoints never hold a dataset in
+process memory. A re-upload of identical bytes is answered from
+``analysis-<mode>-v<N>.json`` without parsing the file again. ``<N>`` is
+``CACHE_SCHEMA_VERSION``, so responses and states written by code with
+another version are misses. Least recently used datasets are evicted once
+the cache exceeds ``DATASET_CACHE_MAX_BYTES`` or ``DATASET_CACHE_MAX_ENTRIES``.
+"""
+import json
+import os
+import pickle
+import re
+import shutil
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import DATASET_CACHE_DIR, DATASET_CACHE_MAX_BYTES, DATASET_CACHE_MAX_ENTRIES
+from serialization import dumps, loads
+
+MANIFEST = "manifest.json"
+# Version of the cached analysis responses and streaming states. Bump it
+# whenever the analysis response or the pickled state changes.
+CACHE_SCHEMA_VERSION = 6
+_DATASET_ID = re.compile(r"[0-9a-f]{64}")
+
+
+class StoredDataset:
+    """Read-only, memory-mapped view of a cached dataset.
+
+    Supports the subset of the DataFrame API used by the query endpoints:
+    ``columns``, ``len()``, ``frame[name]``, ``take(positions)`` and ``to_frame()``.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.num_rows = manifest["rows"]
+        self._specs = {spec["name"]: spec for spec in manifest["columns"]}
+        self.columns = pd.Index([spec["name"] for spec in manifest["columns"]])
+
+    def __len__(self):
+        return self.num_rows
+
+    def _values(self, spec):
+        dtype = {"category": np.int32, "float64": np.float64}.get(spec["kind"], np.int64)
+        if self.num_rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, spec["file"]), dtype=dtype, mode="r", shape=(self.num_rows,))
+
+    def _series(self, spec, values):
+        kind = spec["kind"]
+        if kind == "datetime":
+            series = pd.Series(values.view("datetime64[ns]"), name=spec["name"], copy=False)
+            if spec.get("tz"):
+                series = series.dt.tz_localize("UTC").dt.tz_convert(spec["tz"])
+            return series
+        if kind == "category":
+            categories = np.load(os.path.join(self.path, spec["categories"]), allow_pickle=True)
+            # Code -1 (missing) picks the NaN appended after the categories
+            decoded = np.append(categories, np.nan)[values]
+            if spec.get("dtype") == "bool":
+                decoded = decoded.astype(bool)
+            return pd.Series(decoded, name=spec["name"], copy=False)
+        return pd.Series(values, name=spec["name"], copy=False)
+
+    def __getitem__(self, name):
+        spec = self._specs[name]
+        return self._series(spec, self._values(spec))
+
+    def take(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        data = {}
+        for name, spec in self._specs.items():
+            series = self._series(spec, np.asarray(self._values(spec)[positions]))
+            data[name] = series.reset_index(drop=True)
+        return pd.DataFrame(data, columns=self.columns)
+
+    def to_frame(self):
+        return pd.DataFrame({name: self[name] for name in self.columns}, columns=self.columns)
+
+
+class DatasetWriter:
+    """Appends DataFrame chunks to a new cache entry; ``finish`` publishes it atomically.
+
+    With a ``base`` ``StoredDataset`` the entry starts as a copy of its
+    columns and categories, and the chunks are appended after its rows.
+    """
+
+    def __init__(self, cache, dataset_id, base=None):
+        self.cache = cache
+        self.dataset_id = dataset_id
+        self.tmp_path = os.path.join(cache.root, f".tmp-{dataset_id}-{uuid.uuid4().hex}")
+        os.makedirs(self.tmp_path)
+        self.rows = 0
+        self.specs = None
+        self._categories = {}
+        if base is not None:
+            self._copy_base(base)
+
+    def _copy_base(self, base):
+        self.specs = [dict(spec) for spec in base.manifest["columns"]]
+        for spec in self.specs:
+            shutil.copyfile(os.path.join(base.path, spec["file"]), os.path.join(self.tmp_path, spec["file"]))
+            if spec["kind"] == "category":
+                categories = np.load(os.path.join(base.path, spec["categories"]), allow_pickle=True)
+                self._categories[spec["name"]] = {value: code for code, value in enumerate(categories)}
+        self.rows = base.num_rows
+
+    def numeric_values(self, name):
+        """Memory-mapped values written so far of an ``int64`` or ``float64`` column."""
+        spec = next(spec for spec in self.specs if spec["name"] == name)
+        dtype = np.float64 if spec["kind"] == "float64" else np.int64
+        if self.rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.tmp_path, spec["file"]), dtype=dtype, mode="r", shape=(self.rows,))
+
+    def _column_spec(self, index, name, series):
+        spec = {"name": name, "file": f"c{index}.bin"}
+        if pd.api.types.is_datetime64_any_dtype(series):
+            spec["kind"] = "datetime"
+            tz = getattr(series.dt, "tz", None)
+            if tz is not None:
+                spec["tz"] = str(tz)
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+            spec["kind"] = "int64"
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            spec["kind"] = "float64"
+        else:
+            spec["kind"] = "category"
+            spec["categories"] = f"c{index}.categories.npy"
+            # The dtype the column is decoded to, as parsed from the upload
+            spec["dtype"] = "bool" if series.dtype == np.bool_ else "object"
+            self._categories[name] = {}
+        return spec
+
+    def _promote_to_float(self, spec):
+        path = os.path.join(self.tmp_path, spec["file"])
+        np.fromfile(path, dtype=np.int64).astype(np.float64).tofile(path)
+        spec["kind"] = "float64"
+
+    def _encode(self, spec, series):
+        kind = spec["kind"]
+        if kind == "datetime":
+            if spec.get("tz"):
+                series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+            return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        if kind == "int64":
+            if not pd.api.types.is_integer_dtype(series) or series.hasnans:
+                self._promote_to_float(spec)
+                return series.to_numpy(dtype=np.float64, na_value=np.nan)
+            return series.to_numpy(dtype=np.int64)
+        if kind == "float64":
+            return pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+        if spec.get("dtype") == "bool" and series.dtype != np.bool_:
+            # A chunk with missing or other values makes the whole column object, as in one frame
+            spec["dtype"] = "object"
+        # Dictionary-encode against the categories seen in earlier chunks.
+        mapping = self._categories[spec["name"]]
+        codes, uniques = pd.factorize(series)
+        global_codes = np.fromiter(
+            (mapping.setdefault(value, len(mapping)) for value in uniques),
+            dtype=np.int32, count=len(uniques),
+        )
+        return np.where(codes >= 0, global_codes[codes] if len(global_codes) else -1, -1).astype(np.int32)
+
+    def append(self, frame):
+        if self.specs is None:
+            self.specs = [self._column_spec(i, name, frame[name]) for i, name in enumerate(frame.columns)]
+        for spec in self.specs:
+            values = np.ascontiguousarray(self._encode(spec, frame[spec["name"]]))
+            with open(os.path.join(self.tmp_path, spec["file"]), "ab") as out:
+                values.tofile(out)
+        self.rows += len(frame)
+
+    def finish(self):
+        for spec in self.specs or []:
+            if spec["kind"] == "category":
+                categories = np.empty(len(self._categories[spec["name"]]), dtype=object)
+                categories[:] = list(self._categories[spec["name"]])
+                np.save(os.path.join(self.tmp_path, spec["categories"]), categories, allow_pickle=True)
+        manifest = {"version": 1, "rows": self.rows, "columns": self.specs or []}
+        with open(os.path.join(self.tmp_path, MANIFEST), "w") as out:
+            json.dump(manifest, out)
+        self.cache.publish(self)
+
+    def abort(self):
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class DatasetCache:
+    def __init__(self, root=DATASET_CACHE_DIR, max_bytes=DATASET_CACHE_MAX_BYTES,
+                 max_entries=DATASET_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, dataset_id):
+        if not _DATASET_ID.fullmatch(dataset_id or ""):
+            return None
+        return os.path.join(self.root, dataset_id)
+
+    def has(self, dataset_id):
+        path = self._path(dataset_id)
+        return path is not None and os.path.exists(os.path.join(path, MANIFEST))
+
+    def writer(self, dataset_id, base=None):
+        return DatasetWriter(self, dataset_id, base)
+
+    def publish(self, writer):
+        target = os.path.join(self.root, writer.dataset_id)
+        with self._lock:
+            if os.path.exists(target):
+                # Another request cached the same content first.
+                writer.abort()
+            else:
+                os.rename(writer.tmp_path, target)
+        self.evict(keep=writer.dataset_id)
+
+    def open(self, dataset_id):
+        """Return a ``StoredDataset`` for ``dataset_id``, or None when it is not cached."""
+        path = self._path(dataset_id)
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                manifest = json.load(f)
+            os.utime(os.path.join(path, MANIFEST))
+        except FileNotFoundError:
+            return None
+        return StoredDataset(path, manifest)
+
+    def save_analysis(self, dataset_id, mode, response_data, head_data, dtypes_data, raw_rows=None):
+        """Store the response of an analysis; ``raw_rows`` are the sampled row positions, if any."""
+        path = self._path(dataset_id)
+        if path is None or not os.path.isdir(path):
+            return
+        raw_rows_file = None
+        if raw_rows is not None:
+            raw_rows_file = f"raw-rows-{mode}.npy"
+            np.save(os.path.join(path, raw_rows_file), np.asarray(raw_rows, dtype=np.int64))
+        tmp = os.path.join(path, f".analysis-{mode}-{uuid.uuid4().hex}")
+        with open(tmp, "wb") as out:
+            out.write(dumps({
+                "response": response_data,
+                "head_data": head_data,
+                "dtypes_data": dtypes_data,
+                "raw_rows": raw_rows_file,
+            }))
+        os.replace(tmp, os.path.join(path, f"analysis-{mode}-v{CACHE_SCHEMA_VERSION}.json"))
+
+    def load_analysis(self, dataset_id, mode):
+        """Return ``(response_data, head_data, dtypes_data, raw_frame)`` or None on a miss."""
+        dataset = self.open(dataset_id)
+        if dataset is None:
+            return None
+        try:
+            with open(os.path.join(dataset.path, f"analysis-{mode}-v{CACHE_SCHEMA_VERSION}.json"), "rb") as f:
+                cached = loads(f.read())
+        except FileNotFoundError:
+            return None
+        if cached["raw_rows"] is None:
+            raw_frame = dataset.to_frame()
+        else:
+            raw_frame = dataset.take(np.load(os.path.join(dataset.path, cached["raw_rows"])))
+        return cached["response"], cached["head_data"], cached["dtypes_data"], raw_frame
+
+    def save_state(self, dataset_id, mode, state):
+        """Pickle the resumable state of a streaming analysis next to its dataset."""
+        path = self._path(dataset_id)
+        if path is None or not os.path.isdir(path):
+            return
+        tmp = os.path.join(path, f".state-{mode}-{uuid.uuid4().hex}")
+        with open(tmp, "wb") as out:
+            pickle.dump(state, out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(path, f"state-{mode}-v{CACHE_SCHEMA_VERSION}.pkl"))
+
+    def load_state(self, dataset_id, mode):
+        """Return the state stored by ``save_state``, or None on a miss."""
+        dataset = self.open(dataset_id)
+        if dataset is None:
+            return None
+        try:
+            with open(os.path.join(dataset.path, f"state-{mode}-v{CACHE_SCHEMA_VERSION}.pkl"), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            manifest = os.path.join(path, MANIFEST)
+            if not _DATASET_ID.fullmatch(name) or not os.path.exists(manifest):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            entries.append((os.stat(manifest).st_mtime, size, name))
+        return entries
+
+    def evict(self, keep=None):
+        """Remove least recently used datasets until both cache limits are met."""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            count = len(entries)
+            for _, size, name in entries:
+                if total <= self.max_bytes and count <= self.max_entries:
+                    break
+                if name == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                total -= size
+                count -= 1
+
+
+dataset_cache = DatasetCache()
@@ -0,0 +1,90 @@
+"""Batched writes of analysis records.
+
+Upload handlers hand their rows to ``analysis_writer.save`` and await the new
+row id. One background task drains the queue and inserts up to
+``DB_WRITE_BATCH`` queued rows per transaction on a worker thread, so
+concurrent uploads share a commit instead of queueing on SQLite's writer lock,
+and the event loop never waits on the database.
+"""
+import asyncio
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import DB_WRITE_BATCH
+from models import FileAnalysis, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    def __init__(self, session_factory=SessionLocal, batch_size=DB_WRITE_BATCH):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write every row queued so far, then stop the writer task."""
+        task, self._task = self._task, None
+        if task is not None:
+            await self._queue.put(None)
+            await task
+
+    async def save(self, **fields):
+        """Insert one ``FileAnalysis`` row and return its id once committed."""
+        if self._task is None:
+            # Not started (or shutting down): write on a thread directly
+            return (await run_in_threadpool(self._write, [fields]))[0]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((fields, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stopping = batch[-1] is None
+            batch = [item for item in batch if item is not None]
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch):
+        try:
+            ids = await run_in_threadpool(self._write, [fields for fields, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Retry one by one so a bad row fails only its own upload
+                logger.warning("Batched insert of %d analyses failed, retrying one by one: %s", len(batch), e)
+                for item in batch:
+                    await self._flush([item])
+            elif not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        for (_, future), row_id in zip(batch, ids):
+            # A future is already done when its request was cancelled
+            if not future.done():
+                future.set_result(row_id)
+
+    def _write(self, rows):
+        db = self.session_factory()
+        try:
+            records = [FileAnalysis(**fields) for fields in rows]
+            db.add_all(records)
+            db.commit()
+            return [record.id for record in records]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+analysis_writer = BatchWriter()
@@ -0,0 +1,224 @@
+"""Server-side reductions behind the /datasets/ query endpoints.
+
+Each function takes a stored dataset and returns chart-ready data whose size
+depends on the requested resolution (bins, points, groups, rows), not on the
+number of rows in the dataset.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis import correlation_groups, pair_records
+from correlation import correlation_matrix, strong_pairs, upper_pairs
+from serialization import serialize_dataframe_dict
+
+AGGREGATIONS = ("count", "sum", "mean", "median", "min", "max")
+
+
+def _column(frame, name):
+    if name not in frame.columns:
+        raise ValueError(f"Unknown column '{name}'")
+    return frame[name]
+
+
+def _axis_values(frame, name):
+    """Return a float64 array for a numeric or date column and whether it is a date.
+
+    Dates are returned as milliseconds since the epoch; missing values are NaN.
+    """
+    series = _column(frame, name)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy(dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+        values[series.isna().to_numpy()] = np.nan
+        return values, True
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan), False
+    raise ValueError(f"Column '{name}' is not numeric or a date")
+
+
+def _axis_output(values, is_date):
+    if is_date:
+        return [None if np.isnan(v) else pd.Timestamp(int(v), unit="ms").isoformat() for v in values]
+    return serialize_dataframe_dict(values.tolist())
+
+
+def histogram2d(frame, x, y, bins):
+    """Bin the complete (x, y) pairs into a ``bins`` x ``bins`` grid of counts."""
+    x_values, x_is_date = _axis_values(frame, x)
+    y_values, y_is_date = _axis_values(frame, y)
+    valid = ~(np.isnan(x_values) | np.isnan(y_values))
+    counts, x_edges, y_edges = np.histogram2d(x_values[valid], y_values[valid], bins=bins)
+    return {
+        "x": x,
+        "y": y,
+        "bins": bins,
+        "total": int(valid.sum()),
+        "x_edges": _axis_output(x_edges, x_is_date),
+        "y_edges": _axis_output(y_edges, y_is_date),
+        "counts": counts.astype(np.int64).tolist(),
+    }
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets selection on points sorted by ``x``.
+
+    Returns the indices of ``threshold`` points that keep the visual shape of
+    the series. Each bucket is scored with one vectorized triangle-area pass.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_series(frame, x, y, points):
+    """Reduce the (x, y) series to at most ``points`` points with LTTB."""
+    x_values, x_is_date = _axis_values(frame, x)
+    y_values, y_is_date = _axis_values(frame, y)
+    valid = ~(np.isnan(x_values) | np.isnan(y_values))
+    x_values, y_values = x_values[valid], y_values[valid]
+    order = np.argsort(x_values, kind="stable")
+    x_values, y_values = x_values[order], y_values[order]
+    keep = lttb_indices(x_values, y_values, points)
+    return {
+        "x": x,
+        "y": y,
+        "total": int(len(x_values)),
+        "points": int(len(keep)),
+        "x_values": _axis_output(x_values[keep], x_is_date),
+        "y_values": _axis_output(y_values[keep], y_is_date),
+    }
+
+
+def group_aggregate(frame, group_by, value=None, agg="count", limit=50):
+    """Aggregate ``value`` per ``group_by`` group, largest results first."""
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation '{agg}', expected one of: {', '.join(AGGREGATIONS)}")
+    keys = _column(frame, group_by)
+    if value is None:
+        if agg != "count":
+            raise ValueError(f"Aggregation '{agg}' requires a value column")
+        result = keys.value_counts(dropna=True)
+    else:
+        values, _ = _axis_values(frame, value)
+        grouped = pd.DataFrame({"key": keys.to_numpy(), "value": values}).groupby("key")["value"]
+        result = grouped.agg(agg).sort_values(ascending=False, kind="stable")
+
+    return {
+        "group_by": group_by,
+        "value": value,
+        "agg": agg,
+        "total_groups": int(len(result)),
+        "groups": serialize_dataframe_dict(list(result.index[:limit])),
+        "values": serialize_dataframe_dict(result.iloc[:limit].tolist()),
+    }
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def correlation_summary(frame, columns=None, method="pearson", threshold=0.7, max_matrix_columns=200,
+                        max_columns=1000):
+    """Strong pairs and multicollinearity groups of numeric columns (all by default).
+
+    The full matrix is included when there are at most ``max_matrix_columns``
+    columns; wider tables are only scanned tile by tile for strong pairs.
+    More than ``max_columns`` columns are rejected.
+    """
+    if not 0 <= threshold < 1:
+        raise ValueError("threshold must be at least 0 and below 1")
+    if columns is None:
+        columns = [name for name in frame.columns if _is_numeric(frame[name])]
+    for name in columns:
+        if not _is_numeric(_column(frame, name)):
+            raise ValueError(f"Column '{name}' is not numeric")
+    if len(columns) < 2:
+        raise ValueError("At least two numeric columns are required")
+    if len(columns) > max_columns:
+        raise ValueError(f"At most {max_columns} columns can be correlated; select them with columns")
+    values = np.column_stack([frame[name].to_numpy(dtype=np.float64, na_value=np.nan) for name in columns])
+
+    matrix = None
+    if len(columns) <= max_matrix_columns:
+        corr = correlation_matrix(values, method)
+        pairs = upper_pairs(corr, threshold)
+        matrix = serialize_dataframe_dict(corr.tolist())
+    else:
+        pairs = strong_pairs(values, threshold, method)
+    strong_correlations = pair_records(columns, *pairs)
+    return {
+        "method": method,
+        "threshold": threshold,
+        "columns": list(columns),
+        "strong_correlations": strong_correlations,
+        "multicollinearity_groups": correlation_groups(columns, strong_correlations),
+        "matrix": matrix,
+    }
+
+
+def _allocate(counts, rows):
+    """Split ``rows`` across strata proportionally (largest remainder), one row minimum."""
+    total = counts.sum()
+    exact = counts * rows / total
+    allocation = np.floor(exact).astype(np.int64)
+    if rows >= len(counts):
+        allocation = np.maximum(allocation, 1)
+    allocation = np.minimum(allocation, counts)
+    remaining = rows - allocation.sum()
+    if remaining > 0:
+        spare = counts - allocation
+        order = np.argsort(-(exact - np.floor(exact)), kind="stable")
+        for stratum in order:
+            if remaining == 0:
+                break
+            take = min(spare[stratum], remaining)
+            allocation[stratum] += take
+            remaining -= take
+    elif remaining < 0:
+        order = np.argsort(-allocation, kind="stable")
+        for stratum in order:
+            if remaining == 0:
+                break
+            take = min(allocation[stratum] - 1, -remaining)
+            allocation[stratum] -= take
+            remaining += take
+    return allocation
+
+
+def sample_indices(frame, rows, stratify_by=None, seed=0):
+    """Row positions of a uniform or stratified sample of at most ``rows`` rows, in row order."""
+    n = len(frame)
+    if rows >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    if stratify_by is None:
+        return np.sort(rng.choice(n, size=rows, replace=False))
+
+    codes, _ = pd.factorize(_column(frame, stratify_by), use_na_sentinel=False)
+    counts = np.bincount(codes)
+    allocation = _allocate(counts, rows)
+
+    # Shuffle rows within each stratum, then keep the first allocation[k] of stratum k.
+    order = np.lexsort((rng.random(n), codes))
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(n) - starts[codes[order]]
+    return np.sort(order[rank < allocation[codes[order]]])
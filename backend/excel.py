@@ -0,0 +1,207 @@
+"""Excel ingestion for /upload-file/ and /jobs/.
+
+Workbooks are read lazily, without ``pd.read_excel`` and its per-cell
+conversions. ``.xlsx`` files go through openpyxl in read-only mode, which
+streams the sheet XML row by row and stops after the last requested row.
+When ``python-calamine`` is installed it is used instead, for ``.xls`` files
+too; without it ``.xls`` falls back to ``pd.read_excel``.
+
+An ``ExcelSelection`` picks the sheet, the columns (by header name) and the
+range of data rows to read. With openpyxl, the reader stops after the last
+selected row and only builds row tuples for the selected rows and the span of
+the selected columns; the XML of the rows above the range is still parsed.
+python-calamine converts the whole sheet and the selection is then taken from
+its rows. Blank text cells become NaN with a vectorized strip of the text
+columns instead of a regex over every cell of the frame.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import python_calamine
+except ImportError:  # optional dependency
+    python_calamine = None
+
+
+@dataclass(frozen=True)
+class ExcelSelection:
+    """The part of a workbook to analyse. Rows count data rows below the header."""
+    sheet: Optional[str] = None
+    columns: Optional[Tuple[str, ...]] = None
+    skip_rows: int = 0
+    max_rows: Optional[int] = None
+
+    @property
+    def is_default(self):
+        return self == ExcelSelection()
+
+    def dataset_key(self, content_hash):
+        """Cache key of the selected data: the file's hash for the whole first sheet."""
+        if self.is_default:
+            return content_hash
+        return hashlib.sha256(f"{content_hash}:{self!r}".encode("utf-8")).hexdigest()
+
+
+def list_sheets(path, file_extension):
+    """Sheet names of a workbook, in workbook order."""
+    if python_calamine is not None:
+        return list(python_calamine.CalamineWorkbook.from_path(path).sheet_names)
+    if file_extension == '.xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    return list(pd.ExcelFile(path).sheet_names)
+
+
+def _column_names(header):
+    """``pd.read_excel`` header names: blanks become ``Unnamed: i``, repeats get ``.1``, ``.2``..."""
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or (isinstance(value, str) and not value.strip()) else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _selected_columns(header, selection):
+    """Column names of the selection and their positions in the header row.
+
+    Positions are ``None`` when every column is selected.
+    """
+    if header is None:
+        raise ValueError("Worksheet is empty")
+    names = _column_names(header)
+    if selection.columns is None:
+        return names, None
+    # Matched against stripped names, as the pipeline strips them afterwards
+    stripped = [name.strip() for name in names]
+    missing = [col for col in selection.columns if col not in stripped]
+    if missing:
+        raise ValueError(f"Columns not found: {', '.join(missing)}")
+    positions = [stripped.index(col) for col in selection.columns]
+    return [names[j] for j in positions], positions
+
+
+def _data_rows(rows, positions, selection, skipped=0):
+    """The selected data rows of an iterator over the row tuples below the header.
+
+    ``skipped`` of the ``selection.skip_rows`` leading rows were already left out
+    by the reader. Only the columns at ``positions`` of each row are kept.
+    """
+    data = []
+    for i, row in enumerate(rows, start=skipped):
+        if i < selection.skip_rows:
+            continue
+        if selection.max_rows is not None and len(data) >= selection.max_rows:
+            break
+        if positions is not None:
+            row = tuple(row[j] if j < len(row) else None for j in positions)
+        data.append(row)
+    # Formatted but empty cells below the table are not data rows
+    if selection.max_rows is None or len(data) < selection.max_rows:
+        while data and all(value is None or value == "" for value in data[-1]):
+            data.pop()
+    return data
+
+
+def _build_frame(names, data):
+    width = max([len(names)] + [len(row) for row in data])
+    if width > len(names):
+        # Cells right of the header row, as pd.read_excel names them
+        names = _column_names(names + [None] * (width - len(names)))
+    return pd.DataFrame(data, columns=names)
+
+
+def normalize_blanks(frame):
+    """Turn empty and whitespace-only strings into NaN; only text columns are scanned."""
+    for col in frame.columns[frame.dtypes == object]:
+        values = frame[col]
+        try:
+            blank = values.str.strip().eq("")
+        except AttributeError:  # no strings in the column
+            blank = pd.Series(False, index=values.index)
+        if blank.any():
+            values = values.mask(blank)
+        # A column left with only missing values is numeric, as in pd.read_excel
+        if values.isna().all():
+            values = values.astype(np.float64)
+        elif blank.any():
+            values = values.infer_objects()
+        frame[col] = values
+    return frame
+
+
+def _read_openpyxl(path, selection):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        if selection.sheet is None:
+            sheet = workbook.worksheets[0]
+        elif selection.sheet in workbook.sheetnames:
+            sheet = workbook[selection.sheet]
+        else:
+            raise ValueError(f"Worksheet '{selection.sheet}' not found")
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+        names, positions = _selected_columns(header, selection)
+        min_row = 2 + selection.skip_rows
+        max_row = None
+        if selection.max_rows is not None:
+            max_row = min_row + selection.max_rows - 1
+        min_col, max_col = 1, None
+        if positions is not None:
+            # Only the span of the selected columns is read, positions become relative to it
+            min_col, max_col = min(positions) + 1, max(positions) + 1
+            positions = [j + 1 - min_col for j in positions]
+        rows = sheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col,
+                               values_only=True)
+        data = _data_rows(rows, positions, selection, skipped=selection.skip_rows)
+    finally:
+        workbook.close()
+    return _build_frame(names, data)
+
+
+def _read_calamine(path, selection):
+    workbook = python_calamine.CalamineWorkbook.from_path(path)
+    name = selection.sheet if selection.sheet is not None else workbook.sheet_names[0]
+    if name not in workbook.sheet_names:
+        raise ValueError(f"Worksheet '{name}' not found")
+    rows = iter(workbook.get_sheet_by_name(name).to_python(skip_empty_area=False))
+    names, positions = _selected_columns(next(rows, None), selection)
+    data = _data_rows(rows, positions, selection)
+    return _build_frame(names, data)
+
+
+def _read_pandas(path, selection):
+    frame = pd.read_excel(
+        path,
+        sheet_name=selection.sheet if selection.sheet is not None else 0,
+        usecols=list(selection.columns) if selection.columns is not None else None,
+        skiprows=range(1, 1 + selection.skip_rows) if selection.skip_rows else None,
+        nrows=selection.max_rows,
+    )
+    frame.columns = [str(col) for col in frame.columns]
+    return frame
+
+
+def read_excel_frame(path, file_extension, selection=ExcelSelection()):
+    """Read the selected part of a workbook into a DataFrame with blanks as NaN."""
+    if python_calamine is not None:
+        frame = _read_calamine(path, selection)
+    elif file_extension == '.xlsx':
+        frame = _read_openpyxl(path, selection)
+    else:
+        frame = _read_pandas(path, selection)
+    return normalize_blanks(frame)
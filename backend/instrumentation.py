@@ -0,0 +1,125 @@
+"""Stage tracing and logging setup.
+
+A ``Trace`` records the stages of one upload as consecutive spans with their
+wall time, the rows and columns processed and, when ``TRACE_MEMORY`` is set,
+the bytes allocated during the span and the tracemalloc peak above the
+span's start. The analysis keeps its own trace in the worker process and
+returns the spans with its result; the API adds the spans it runs itself,
+sends them all as a ``Server-Timing`` header and records them in the
+/metrics histograms.
+
+``configure_logging`` sets up leveled key=value logging. Log calls pass
+their values as arguments (``logger.debug("columns=%s", cols)``), so a
+disabled level costs one comparison and no string formatting.
+"""
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from config import LOG_LEVEL, TRACE_MEMORY
+
+# Attributes of every LogRecord; anything else was passed with ``extra=``.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """``ts=... level=... logger=... msg="..."`` plus any ``extra`` fields."""
+
+    def format(self, record):
+        fields = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        line = " ".join(f"{key}={_quote(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _quote(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "='):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+def configure_logging(level=LOG_LEVEL):
+    """Send log records of ``level`` and above to stderr, once per process."""
+    root = logging.getLogger()
+    if any(isinstance(handler.formatter, KeyValueFormatter) for handler in root.handlers):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(KeyValueFormatter())
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+
+class Trace:
+    """Consecutive stage spans of one upload; see the module docstring."""
+
+    def __init__(self, memory=TRACE_MEMORY):
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.spans = []
+        self._current = None
+
+    def stage(self, name, **attributes):
+        """End the current span and start ``name``; naming the current span again continues it."""
+        if self._current is not None and self._current["name"] == name:
+            self._current.update(attributes)
+            return
+        self.end()
+        self._current = {"name": name, **attributes}
+        if self.memory:
+            tracemalloc.reset_peak()
+            self._allocated = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+
+    def annotate(self, **attributes):
+        """Add attributes, e.g. ``rows`` and ``cols``, to the current span."""
+        if self._current is not None:
+            self._current.update(attributes)
+
+    def end(self):
+        span, self._current = self._current, None
+        if span is None:
+            return
+        span["ms"] = (time.perf_counter() - self._started) * 1000
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            span["alloc_bytes"] = current - self._allocated
+            span["peak_bytes"] = peak - self._allocated
+        self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        self.stage(name, **attributes)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def progress(self, callback):
+        """Wrap a ``progress(stage, percent, **sections)`` callback so each stage is a span."""
+        def traced(stage, percent, **sections):
+            self.stage(stage)
+            callback(stage, percent, **sections)
+        return traced
+
+    def add_remote(self, spans, elapsed):
+        """Add the spans of work that took ``elapsed`` seconds in another process.
+
+        The time not covered by them (queueing and transfer) becomes a ``queue`` span.
+        """
+        remote_ms = sum(span["ms"] for span in spans)
+        self.spans.append({"name": "queue", "ms": max(elapsed * 1000 - remote_ms, 0.0)})
+        self.spans.extend(spans)
+
+    def server_timing(self):
+        """The spans as a ``Server-Timing`` header value."""
+        return ", ".join(f"{span['name']};dur={span['ms']:.1f}" for span in self.spans)
@@ -0,0 +1,153 @@
+"""Background analysis jobs behind the /jobs/ endpoints.
+
+A job's state lives on disk in ``<JOBS_DIR>/<job_id>/`` so the worker process
+running the analysis and the API process answering status requests share it
+without extra IPC::
+
+    status.json             state, stage, percent and the sections available
+    sections/<name>.json    response sections, written as soon as they are final
+    result                  the encoded response body of a finished job
+
+Files are replaced atomically, so readers never see a partial write. Finished
+and failed jobs last updated more than ``JOB_TTL_SECONDS`` ago are removed
+when a new job is created; queued and running jobs are kept however old.
+"""
+import os
+import re
+import shutil
+import time
+import uuid
+
+from config import JOB_TTL_SECONDS, JOBS_DIR
+from serialization import dumps, loads
+
+STATUS = "status.json"
+RESULT = "result"
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as out:
+        out.write(dumps(data))
+    os.replace(tmp, path)
+
+
+def _read_status(path):
+    with open(os.path.join(path, STATUS), "rb") as f:
+        return loads(f.read())
+
+
+class JobProgress:
+    """Picklable ``progress(stage, percent, **sections)`` callback for ``run_analysis``."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, stage, percent, **sections):
+        status = _read_status(self.path)
+        for name, data in sections.items():
+            _write_json(os.path.join(self.path, "sections", f"{name}.json"), data)
+            if name not in status["sections"]:
+                status["sections"].append(name)
+        status.update(state="running", stage=stage, percent=percent, updated=time.time())
+        _write_json(os.path.join(self.path, STATUS), status)
+
+
+class JobStore:
+    def __init__(self, root=JOBS_DIR, ttl=JOB_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id):
+        if not _JOB_ID.fullmatch(job_id or ""):
+            return None
+        return os.path.join(self.root, job_id)
+
+    def create(self, filename):
+        """Register a queued job and return its id."""
+        self.sweep()
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.root, job_id)
+        os.makedirs(os.path.join(path, "sections"))
+        now = time.time()
+        _write_json(os.path.join(path, STATUS), {
+            "job_id": job_id,
+            "filename": filename,
+            "state": "queued",
+            "stage": None,
+            "percent": 0,
+            "sections": [],
+            "dataset_id": None,
+            "media_type": None,
+            "error": None,
+            "created": now,
+            "updated": now,
+        })
+        return job_id
+
+    def progress(self, job_id):
+        return JobProgress(self._path(job_id))
+
+    def status(self, job_id):
+        """Return the status dict of ``job_id``, or None when it does not exist."""
+        path = self._path(job_id)
+        if path is None:
+            return None
+        try:
+            return _read_status(path)
+        except FileNotFoundError:
+            return None
+
+    def _update(self, job_id, **fields):
+        path = self._path(job_id)
+        status = _read_status(path)
+        status.update(updated=time.time(), **fields)
+        _write_json(os.path.join(path, STATUS), status)
+
+    def finish(self, job_id, result):
+        """Store the encoded body of a finished ``run_analysis`` result."""
+        path = self._path(job_id)
+        tmp = os.path.join(path, f".{RESULT}.tmp")
+        with open(tmp, "wb") as out:
+            out.write(result["body"])
+        os.replace(tmp, os.path.join(path, RESULT))
+        self._update(job_id, state="done", stage=None, percent=100,
+                     dataset_id=result["dataset_id"], media_type=result["media_type"])
+
+    def fail(self, job_id, status_code, detail):
+        self._update(job_id, state="failed", error={"status_code": status_code, "detail": detail})
+
+    def result_path(self, job_id):
+        return os.path.join(self._path(job_id), RESULT)
+
+    def section_path(self, job_id, section):
+        return os.path.join(self._path(job_id), "sections", f"{section}.json")
+
+    def sweep(self):
+        """Remove finished and failed jobs last updated more than ``ttl`` seconds ago.
+
+        Queued and running jobs are skipped, as a worker may still write to them.
+        """
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not _JOB_ID.fullmatch(name):
+                continue
+            try:
+                if os.stat(os.path.join(path, STATUS)).st_mtime >= cutoff:
+                    continue
+                if _read_status(path)["state"] not in ("done", "failed"):
+                    continue
+            except FileNotFoundError:
+                # No status yet: a job being created, unless its directory is old
+                try:
+                    if os.stat(path).st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+            shutil.rmtree(path, ignore_errors=True)
+
+
+job_store = JobStore()
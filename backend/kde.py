@@ -0,0 +1,121 @@
+"""Batched multimodality detection for numeric columns.
+
+The peaks reported in the "Multiple Peaks Detected" insight used to come from
+``scipy.stats.gaussian_kde`` evaluated on a 200-point grid per column, which
+costs O(rows x 200) per column. Here every column is linearly binned onto a
+fine grid, smoothed with a Gaussian kernel by FFT convolution and sampled back
+on the same 200-point grid, for all columns of a 2D array at once. The cost is
+O(rows) for the binning plus O(grid log grid) per column for the convolution.
+
+The bandwidth is Scott's rule, as in ``gaussian_kde``, so the densities (and
+their peaks) agree with the exact KDE up to the binning error, which shrinks
+with ``GRID_REFINE``.
+"""
+import warnings
+
+import numpy as np
+
+# Points of the evaluation grid between the minimum and maximum of a column.
+GRID_POINTS = 200
+
+# Fine-grid points per evaluation-grid step used for binning.
+GRID_REFINE = 8
+
+# Densities below this fraction of a column's maximum are treated as zero, so
+# FFT round-off in empty regions cannot produce spurious peaks.
+DENSITY_FLOOR = 1e-9
+
+
+def binned_kde(values, grid_points=GRID_POINTS, refine=GRID_REFINE):
+    """Evaluate a Gaussian KDE of every column of ``values`` on its own grid.
+
+    ``values`` is a 2D float array (rows x columns) where NaN marks missing
+    values. Returns ``(lo, hi, density)``: the per-column grid spans
+    ``linspace(lo[j], hi[j], grid_points)`` and ``density`` is a
+    ``(columns, grid_points)`` array, NaN for columns with fewer than two
+    distinct values. Densities are unnormalised.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n_cols = values.shape[1]
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=0)
+    with warnings.catch_warnings():
+        # All-NaN and single-value columns are expected here
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lo = np.nanmin(values, axis=0)
+        hi = np.nanmax(values, axis=0)
+        std = np.nanstd(values, axis=0, ddof=1)
+    span = hi - lo
+    usable = (count >= 2) & (span > 0) & (std > 0)
+    density = np.full((n_cols, grid_points), np.nan)
+    if not usable.any():
+        return lo, hi, density
+
+    cols = np.flatnonzero(usable)
+    fine = (grid_points - 1) * refine + 1
+
+    # Linear binning: split each value between its two neighbouring grid points
+    pos = (values[:, cols] - lo[cols]) / span[cols] * (fine - 1)
+    row_valid = valid[:, cols]
+    col_index = np.broadcast_to(np.arange(len(cols)), pos.shape)[row_valid]
+    pos = pos[row_valid]
+    left = np.minimum(np.floor(pos).astype(np.int64), fine - 2)
+    weight = pos - left
+    flat = col_index * fine + left
+    size = len(cols) * fine
+    counts = (np.bincount(flat, weights=1 - weight, minlength=size)
+              + np.bincount(flat + 1, weights=weight, minlength=size)).reshape(len(cols), fine)
+
+    # Scott's rule, as gaussian_kde: h = std * n ** (-1/5), in fine-grid steps
+    sigma = std[cols] * count[cols] ** -0.2 / span[cols] * (fine - 1)
+    reach = int(np.ceil(min(4 * sigma.max(), fine)))
+    length = 1 << int(np.ceil(np.log2(fine + reach)))
+    offsets = np.arange(length)
+    offsets = np.minimum(offsets, length - offsets)
+    kernel = np.exp(-0.5 * (offsets[None, :] / sigma[:, None]) ** 2)
+
+    smoothed = np.fft.irfft(
+        np.fft.rfft(counts, n=length, axis=1) * np.fft.rfft(kernel, axis=1),
+        n=length, axis=1,
+    )[:, :fine:refine]
+    smoothed[smoothed < DENSITY_FLOOR * smoothed.max(axis=1, keepdims=True)] = 0.0
+    density[cols] = smoothed
+    return lo, hi, density
+
+
+def peak_positions(y):
+    """Local maxima of every row of ``y``, like ``scipy.signal.find_peaks(row)``.
+
+    Returns ``(rows, indices)``. A flat top counts once, at its middle sample.
+    NaN samples count as flat, so an all-NaN row has no peaks.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    step = np.sign(np.diff(y, axis=1))
+    step[np.isnan(step)] = 0
+    rows, cols = np.nonzero(step)
+    signs = step[rows, cols]
+    # A rise followed by a fall (with only flat steps between them) is a peak
+    is_peak = (rows[:-1] == rows[1:]) & (signs[:-1] > 0) & (signs[1:] < 0)
+    left = cols[:-1][is_peak] + 1
+    right = cols[1:][is_peak]
+    return rows[:-1][is_peak], (left + right) // 2
+
+
+def distribution_peaks(values, grid_points=GRID_POINTS, refine=GRID_REFINE):
+    """Return the KDE peak positions of every column of ``values``.
+
+    One array of x positions per column, or None for a column whose density
+    cannot be estimated (fewer than two distinct non-null values).
+    """
+    lo, hi, density = binned_kde(values, grid_points, refine)
+    rows, indices = peak_positions(density)
+    peaks = []
+    for j in range(density.shape[0]):
+        if np.isnan(density[j, 0]):
+            peaks.append(None)
+            continue
+        x = np.linspace(lo[j], hi[j], grid_points)
+        peaks.append(x[indices[rows == j]])
+    return peaks
@@ -1,49 +1,45 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-from models import SessionLocal, FileAnalysis, Base, engine
+from models import ANALYSIS_SECTIONS, SessionLocal, engine, get_analysis, init_database, list_analyses
+import asyncio
 import json
+import logging
+import os
+import time
+from typing import Optional
 from datetime import datetime
-from fastapi.responses import JSONResponse
-import numpy as np
-import io
-
-def convert_to_serializable(obj):
-    if isinstance(obj, (pd.Timestamp, datetime)):
-        return obj.isoformat()
-    elif isinstance(obj, (np.int64, np.int32)):
-        return int(obj)
-    elif isinstance(obj, (np.float64, np.float32)):
-        return float(obj)
-    elif pd.isna(obj):
-        return None
-    return obj
-
-def serialize_dataframe_dict(d):
-    if isinstance(d, dict):
-        return {k: serialize_dataframe_dict(v) for k, v in d.items()}
-    elif isinstance(d, list):
-        return [serialize_dataframe_dict(v) for v in d]
-    return convert_to_serializable(d)
-
-def read_file_to_dataframe(file_content: bytes, file_extension: str) -> pd.DataFrame:
-    """Read file content into a pandas DataFrame based on file type."""
-    try:
-        if file_extension == '.csv':
-            df = pd.read_csv(io.StringIO(file_content.decode('utf-8')))
-        elif file_extension in ['.xlsx', '.xls']:
-            df = pd.read_excel(io.BytesIO(file_content))
-            # Convert any empty strings to NaN for consistent handling
-            df = df.replace(r'^\s*$', np.nan, regex=True)
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
-        
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        return df
-    except Exception as e:
-        raise ValueError(f"Error reading file: {str(e)}")
+from fastapi import Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from analysis import STRONG_CORRELATION
+from columnar import negotiate_raw_format, render_analysis
+from config import (
+    ANALYSES_PAGE_SIZE,
+    DEFAULT_OWNER,
+    JOB_EVENTS_INTERVAL,
+    MAX_ANALYSES_PAGE_SIZE,
+    MAX_AGGREGATE_GROUPS,
+    MAX_CORRELATION_COLUMNS,
+    MAX_CORRELATION_MATRIX_COLUMNS,
+    MAX_DOWNSAMPLE_POINTS,
+    MAX_HISTOGRAM_BINS,
+    MAX_SAMPLE_ROWS,
+    STREAMING_THRESHOLD_BYTES,
+)
+from datasets import dataset_cache
+from db_writer import analysis_writer
+from excel import ExcelSelection, list_sheets
+from instrumentation import Trace, configure_logging
+from downsampling import correlation_summary, downsample_series, group_aggregate, histogram2d, sample_indices
+from jobs import job_store
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Gauge, http_request_seconds, observe_spans, registry
+from pipeline import SECTIONS, AnalysisError, run_analysis
+from results import etag_matches, result_cache, result_key
+from streaming import spool_upload
+from workers import PoolBusy, analysis_pool
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -64,439 +60,514 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-try:
-    Base.metadata.create_all(bind=engine)
-    print("Database initialized successfully")
-except Exception as e:
-    print(f"Error initializing database: {str(e)}")
+registry.register(Gauge("analysis_pool_in_flight", "Analyses running or queued in the worker pool.",
+                        lambda: analysis_pool.in_flight))
+registry.register(Gauge("result_cache_memory_bytes", "Response bytes held in this process's result cache.",
+                        lambda: result_cache.memory_size))
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not path, so dataset and job ids do not add series
+    route = request.scope.get("route")
+    http_request_seconds.observe(
+        time.perf_counter() - start, method=request.method,
+        route=route.path if route is not None else "unmatched", status=response.status_code,
+    )
+    return response
+
+@app.on_event("startup")
+async def initialize_database():
+    try:
+        init_database(engine)
+        logger.info("Database initialized successfully")
+    except Exception as e:
+        logger.error("Error initializing database: %s", e)
+
+@app.on_event("startup")
+async def start_background_workers():
+    analysis_pool.start()
+    analysis_writer.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await analysis_writer.stop()
+    analysis_pool.shutdown()
+
+def owner_id(session_id):
+    """The owner an analysis is stored under: the ``X-Session-Id`` header, if sent."""
+    if session_id is None:
+        return DEFAULT_OWNER
+    if not 0 < len(session_id) <= 64:
+        raise AnalysisError(400, "X-Session-Id must be 1 to 64 characters")
+    return session_id
+
+async def record_analysis(owner, filename, result):
+    try:
+        await analysis_writer.save(owner=owner, filename=filename, upload_date=datetime.utcnow(),
+                                   dataset_id=result["dataset_id"], **result["record"])
+    except Exception as e:
+        logger.error("Error saving to database: %s", e)
+        raise AnalysisError(500, f"Error saving analysis: {str(e)}")
+
+def busy_response(e):
+    logger.warning("Server busy: %s", e)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy: {str(e)}"},
+        headers={"Retry-After": "5"}
+    )
+
+async def read_upload(file, raw_format, accept):
+    """Validate and spool an upload.
+
+    Returns ``(file_extension, raw_format, upload_path, file_size, content_hash)``;
+    raises ``AnalysisError`` for a bad request.
+    """
+    logger.info("Upload received", extra={"upload": file.filename, "content_type": file.content_type})
 
-@app.post("/upload-file/")
-async def upload_file(file: UploadFile = File(...)):
-    print(f"\n{'='*50}")
-    print(f"New file upload request received at {datetime.now()}")
-    print(f"Filename: {file.filename}")
-    print(f"Content type: {file.content_type}")
-    print(f"{'='*50}\n")
-    
     # Check file extension
     file_extension = file.filename[file.filename.rfind('.'):].lower()
     if file_extension not in ['.csv', '.xlsx', '.xls']:
-        error_msg = "File must be a CSV or Excel file (.xlsx, .xls)"
-        print(f"Error: {error_msg}")
-        return JSONResponse(
-            status_code=400,
-            content={"detail": error_msg}
-        )
+        raise AnalysisError(400, "File must be a CSV or Excel file (.xlsx, .xls)")
     
-    db = None
     try:
-        # Read the file content
-        print("Reading file contents...")
-        contents = await file.read()
-        print(f"File size: {len(contents)} bytes")
-        
-        if len(contents) == 0:
-            error_msg = "File is empty"
-            print(f"Error: {error_msg}")
-            return JSONResponse(
-                status_code=400,
-                content={"detail": error_msg}
-            )
-        
-        # Clear previous data
-        print("Connecting to database...")
-        db = SessionLocal()
-        try:
-            print("Clearing previous analyses...")
-            db.query(FileAnalysis).delete()
-            db.commit()
-            print("Cleared previous analyses from database")
-        except Exception as e:
-            error_msg = f"Database error: {str(e)}"
-            print(f"Error: {error_msg}")
-            db.rollback()
-            return JSONResponse(
-                status_code=500,
-                content={"detail": error_msg}
-            )
-        
-        # Read file into DataFrame
-        try:
-            print(f"Parsing {file_extension} file with pandas...")
-            df = read_file_to_dataframe(contents, file_extension)
-            
-            # Try to convert date-like columns to datetime
-            for col in df.columns:
-                try:
-                    if df[col].dtype == 'object':
-                        pd.to_datetime(df[col], errors='raise')
-                        df[col] = pd.to_datetime(df[col])
-                        print(f"Converted column {col} to datetime")
-                except:
-                    continue
-            
-            print("File successfully read")
-            print(f"Shape: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-        except Exception as e:
-            print(f"Error reading file: {str(e)}")
-            return JSONResponse(
-                status_code=400,
-                content={"detail": f"Error reading file: {str(e)}"}
-            )
+        raw_format = negotiate_raw_format(raw_format, accept)
+    except ValueError as e:
+        raise AnalysisError(400, str(e))
+    
+    # Spool the upload to disk in chunks instead of holding it in memory
+    upload_path, file_size, content_hash = await spool_upload(file, suffix=file_extension)
+    logger.debug("Upload spooled", extra={"upload": file.filename, "bytes": file_size})
+    
+    if file_size == 0:
+        os.remove(upload_path)
+        raise AnalysisError(400, "File is empty")
+    
+    return file_extension, raw_format, upload_path, file_size, content_hash
+
+def excel_selection(sheet, columns, skip_rows, max_rows):
+    """The ``ExcelSelection`` given by an upload's query parameters."""
+    if skip_rows < 0 or (max_rows is not None and max_rows < 1):
+        raise AnalysisError(400, "skip_rows must be at least 0 and max_rows at least 1")
+    if columns is not None:
+        columns = tuple(dict.fromkeys(col.strip() for col in columns.split(",") if col.strip())) or None
+    return ExcelSelection(sheet=sheet, columns=columns, skip_rows=skip_rows, max_rows=max_rows)
+
+async def analyze_upload(owner, filename, upload_path, file_extension, file_size, content_hash,
+                         stream, approximate, raw_format, selection, append_to, progress=None, trace=None,
+                         reserved=False):
+    """Run the analysis of a spooled upload in the worker pool and record it.
+
+    Without a ``progress`` callback the response is looked up in
+    ``result_cache`` first and stored there after an analysis; the result
+    then has an ``etag``. Jobs always run the pipeline, which reports their
+    sections as it computes them.
+
+    The analysis stages and the database write are added as spans to
+    ``trace`` (a new ``Trace`` by default) and recorded in the /metrics
+    histograms. Removes ``upload_path`` when done. Raises ``AnalysisError``
+    or ``PoolBusy``; ``reserved`` is passed on to ``analysis_pool.run``.
+    """
+    trace = trace if trace is not None else Trace()
+    try:
+        if append_to and file_extension != '.csv':
+            raise AnalysisError(400, "Only CSV uploads can be appended to a dataset")
+        streaming = file_extension == '.csv' and (stream or approximate or bool(append_to)
+                                                  or file_size > STREAMING_THRESHOLD_BYTES)
+        if file_extension == '.csv':
+            selection = ExcelSelection()
+        args = (upload_path, file_extension, content_hash, streaming,
+                streaming and approximate, raw_format, selection, append_to)
+        key = result = None
+        if progress is None:
+            key = result_key(*args[2:])
+            with trace.span("cache_lookup"):
+                result = await run_in_threadpool(result_cache.get, key)
+        else:
+            args += (progress,)
+        if result is None:
+            started = time.perf_counter()
+            result = await analysis_pool.run(run_analysis, *args, reserved=reserved)
+            trace.add_remote(result.pop("trace"), time.perf_counter() - started)
+            if key is not None:
+                with trace.span("cache_store"):
+                    result = await run_in_threadpool(result_cache.put, key, result)
 
-        # Calculate dataset info
-        print("Calculating dataset info...")
-        total_rows, total_cols = df.shape
-        
-        # Identify numeric columns (including those that can be converted to numeric)
-        numeric_cols = []
-        for col in df.columns:
-            try:
-                # Check if column is already numeric
-                if pd.api.types.is_numeric_dtype(df[col]):
-                    numeric_cols.append(col)
-                    continue
-                
-                # Try converting to numeric if possible
-                pd.to_numeric(df[col], errors='raise')
-                numeric_cols.append(col)
-            except:
-                continue
-        numeric_cols = list(set(numeric_cols))
-        
-        # Identify date columns
-        date_cols = []
-        for col in df.columns:
-            if col not in numeric_cols:  # Skip already identified numeric columns
-                try:
-                    if pd.api.types.is_datetime64_any_dtype(df[col]):
-                        date_cols.append(col)
-                    else:
-                        # Try converting to datetime
-                        pd.to_datetime(df[col], errors='raise')
-                        date_cols.append(col)
-                except:
-                    continue
-        date_cols = list(set(date_cols))
-        
-        # Identify categorical columns
-        remaining_cols = [col for col in df.columns if col not in numeric_cols + date_cols]
-        categorical_cols = []
-        for col in remaining_cols:
-            unique_ratio = df[col].nunique() / len(df)
-            if unique_ratio < 0.5:  # If less than 50% unique values, consider it categorical
-                categorical_cols.append(col)
-        
-        # Calculate missing values accurately
-        null_counts = df.isnull().sum()
-        missing_values = null_counts.sum()
-        missing_percentage = (missing_values / (total_rows * total_cols)) * 100
-        
-        # Calculate duplicate rows
-        duplicate_mask = df.duplicated()
-        duplicate_rows = duplicate_mask.sum()
-        
-        print("\nAnalysis Summary:")
-        print(f"Total Rows: {total_rows}")
-        print(f"Total Columns: {total_cols}")
-        print(f"Missing Values: {missing_values}")
-        print(f"Duplicate Rows: {duplicate_rows}")
-        print(f"Numeric Columns ({len(numeric_cols)}): {numeric_cols}")
-        print(f"Categorical Columns ({len(categorical_cols)}): {categorical_cols}")
-        print(f"Date Columns ({len(date_cols)}): {date_cols}")
-        
-        # Perform EDA calculations
-        try:
-            print("\nPerforming EDA calculations...")
-            # Convert head data to serializable format
-            head_data = serialize_dataframe_dict(df.head().to_dict(orient='records'))
-            
-            # Handle numeric columns
-            numeric_describe = {}
-            if numeric_cols:
-                numeric_df = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
-                numeric_describe = numeric_df.describe(include=[np.number]).to_dict()
-            
-            # Handle categorical columns
-            categorical_describe = {}
-            for col in categorical_cols:
-                value_counts = df[col].value_counts(dropna=True)
-                categorical_describe[col] = {
-                    'count': int(df[col].count()),
-                    'unique': int(df[col].nunique()),
-                    'top': str(value_counts.index[0]) if not value_counts.empty else None,
-                    'freq': int(value_counts.iloc[0]) if not value_counts.empty else 0,
-                    'null_count': int(df[col].isnull().sum())
-                }
-            
-            # Handle date columns
-            date_describe = {}
-            for col in date_cols:
-                try:
-                    date_series = pd.to_datetime(df[col], errors='coerce')
-                    date_describe[col] = {
-                        'min': date_series.min().isoformat() if pd.notnull(date_series.min()) else None,
-                        'max': date_series.max().isoformat() if pd.notnull(date_series.max()) else None,
-                        'unique': int(date_series.nunique()),
-                        'null_count': int(date_series.isnull().sum())
-                    }
-                except:
-                    continue
-            
-            # Combine descriptions and convert to serializable format
-            describe_data = serialize_dataframe_dict({**numeric_describe, **categorical_describe})
-            describe_data.update(date_describe)
-            
-            dtypes_data = df.dtypes.astype(str).to_dict()
-            null_counts = serialize_dataframe_dict(df.isnull().sum().to_dict())
-            
-            print("EDA calculations completed")
-            
-        except Exception as e:
-            print(f"Error in EDA calculations: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": f"Error in data analysis: {str(e)}"}
-            )
-        
         # Save to database
-        try:
-            print("Saving to database...")
-            file_analysis = FileAnalysis(
-                filename=file.filename,
-                upload_date=datetime.utcnow(),
-                head_data=head_data,
-                describe_data=describe_data,
-                dtypes_data=dtypes_data,
-                null_counts=null_counts
-            )
-            
-            db.add(file_analysis)
-            db.commit()
-            db.refresh(file_analysis)
-            print("Saved to database successfully")
-            
-            # Prepare response
-            print("Generating insights...")
-            
-            # Generate insights
-            insights = []
-            recommendations = []
-            
-            # Numerical Column Analysis
-            if len(numeric_cols) > 0:
-                for col in numeric_cols:
-                    col_insights = {}
-                    
-                    # Range and Outliers Analysis
-                    q1 = df[col].quantile(0.25)
-                    q3 = df[col].quantile(0.75)
-                    iqr = q3 - q1
-                    lower_bound = q1 - 1.5 * iqr
-                    upper_bound = q3 + 1.5 * iqr
-                    outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)][col]
-                    
-                    if len(outliers) > 0:
-                        outlier_percentage = (len(outliers) / len(df)) * 100
-                        insights.append({
-                            "title": f"Outliers in {col}",
-                            "description": f"Found {len(outliers)} outliers ({outlier_percentage:.1f}% of data) in {col}. " +
-                                         f"These values fall outside the typical range of {lower_bound:.2f} to {upper_bound:.2f}. " +
-                                         f"In real-world terms, these might represent exceptional cases that need investigation."
-                        })
-                    
-                    # Distribution Shape Analysis
-                    skewness = df[col].skew()
-                    kurtosis = df[col].kurtosis()
-                    
-                    distribution_desc = ""
-                    if abs(skewness) < 0.5:
-                        distribution_desc = "approximately normal (symmetric)"
-                    elif skewness > 0:
-                        distribution_desc = f"right-skewed (skewness: {skewness:.2f})"
-                    else:
-                        distribution_desc = f"left-skewed (skewness: {skewness:.2f})"
-                        
-                    if kurtosis > 1:
-                        distribution_desc += " with heavy tails"
-                    elif kurtosis < -1:
-                        distribution_desc += " with light tails"
-                        
-                    insights.append({
-                        "title": f"Distribution Pattern of {col}",
-                        "description": f"The distribution is {distribution_desc}. " +
-                                     f"Most values fall between {q1:.2f} and {q3:.2f}, " +
-                                     f"with a median of {df[col].median():.2f}."
-                    })
-                    
-                    # Multi-modal Check using KDE
-                    try:
-                        from scipy.stats import gaussian_kde
-                        from scipy.signal import find_peaks
-                        
-                        kde = gaussian_kde(df[col].dropna())
-                        x_range = np.linspace(df[col].min(), df[col].max(), 200)
-                        y = kde(x_range)
-                        peaks, _ = find_peaks(y)
-                        
-                        if len(peaks) > 1:
-                            peak_values = x_range[peaks]
-                            insights.append({
-                                "title": f"Multiple Peaks Detected in {col}",
-                                "description": f"Found {len(peaks)} distinct peaks in the distribution at approximately " +
-                                             f"{', '.join([f'{v:.2f}' for v in peak_values])}. " +
-                                             f"This suggests distinct groups or patterns in your {col} data."
-                            })
-                    except Exception as e:
-                        print(f"Error in multi-modal analysis: {str(e)}")
-
-            # Categorical Column Analysis
-            if len(categorical_cols) > 0:
-                for col in categorical_cols:
-                    value_counts = df[col].value_counts()
-                    total_count = len(df)
-                    
-                    # Most frequent categories
-                    top_categories = value_counts.head(3)
-                    top_categories_desc = ", ".join([
-                        f"'{cat}' ({(count/total_count*100):.1f}%)"
-                        for cat, count in top_categories.items()
-                    ])
-                    
-                    insights.append({
-                        "title": f"Category Distribution in {col}",
-                        "description": f"The most common categories are: {top_categories_desc}. "
-                    })
-                    
-                    # Rare categories analysis
-                    rare_threshold = 0.05  # 5%
-                    rare_categories = value_counts[value_counts/total_count < rare_threshold]
-                    if len(rare_categories) > 0:
-                        rare_total_percentage = (rare_categories.sum()/total_count*100)
-                        insights.append({
-                            "title": f"Rare Categories in {col}",
-                            "description": f"Found {len(rare_categories)} rare categories (each <5% of data) in {col}, " +
-                                         f"collectively representing {rare_total_percentage:.1f}% of all data. " +
-                                         f"Consider if these rare categories need special attention or could be grouped."
-                        })
-
-            # Correlation Analysis
-            if len(numeric_cols) >= 2:
-                corr_matrix = df[numeric_cols].corr()
-                strong_correlations = []
-                multicollinearity_groups = []
-                
-                for i in range(len(numeric_cols)):
-                    for j in range(i+1, len(numeric_cols)):
-                        correlation = corr_matrix.iloc[i, j]
-                        if abs(correlation) > 0.7:
-                            strong_correlations.append({
-                                'col1': numeric_cols[i],
-                                'col2': numeric_cols[j],
-                                'correlation': correlation
-                            })
-                
-                if strong_correlations:
-                    for corr in strong_correlations:
-                        insights.append({
-                            "title": f"Strong Correlation: {corr['col1']} & {corr['col2']}",
-                            "description": f"Found a {abs(corr['correlation']):.2f} " +
-                                         f"{'positive' if corr['correlation'] > 0 else 'negative'} correlation. " +
-                                         f"This means changes in {corr['col1']} are strongly " +
-                                         f"{'associated' if corr['correlation'] > 0 else 'inversely associated'} " +
-                                         f"with changes in {corr['col2']}."
-                        })
-
-            # Overall Summary
-            key_findings = []
-            if numeric_cols:
-                key_findings.append(f"Analyzed {len(numeric_cols)} numerical features")
-            if categorical_cols:
-                key_findings.append(f"Analyzed {len(categorical_cols)} categorical features")
-            if strong_correlations:
-                key_findings.append(f"Found {len(strong_correlations)} strong correlations")
-
-            insights.append({
-                "title": "Overall Data Summary",
-                "description": f"{', '.join(key_findings)}. " +
-                              f"Dataset contains {total_rows} rows with {missing_percentage:.1f}% missing values overall."
-            })
-
-            # Add recommendations based on analysis
-            if missing_values > 0:
-                recommendations.append(
-                    f"Consider handling {missing_values} missing values ({missing_percentage:.1f}% of total data)"
-                )
-
-            if duplicate_rows > 0:
-                recommendations.append(
-                    f"Review {duplicate_rows} duplicate rows ({(duplicate_rows/total_rows*100):.1f}% of data)"
-                )
-
-            # Add recommendations for next steps
-            recommendations.append(
-                "Consider feature engineering or transformations for highly skewed numerical variables"
-            )
-            if strong_correlations:
-                recommendations.append(
-                "Review highly correlated features to avoid multicollinearity in modeling"
-            )
+        with trace.span("db_write"):
+            await record_analysis(owner, filename, result)
+        observe_spans(trace.spans)
+        logger.info("Analysis complete", extra={"upload": filename, "timing": trace.server_timing()})
+        return result
+    finally:
+        os.remove(upload_path)
+
+@app.post("/upload-file/")
+async def upload_file(file: UploadFile = File(...), stream: bool = False, approximate: bool = False,
+                      sheet: Optional[str] = None, columns: Optional[str] = None, skip_rows: int = 0,
+                      max_rows: Optional[int] = None, append_to: Optional[str] = None,
+                      raw_format: Optional[str] = None, accept: Optional[str] = Header(None),
+                      if_none_match: Optional[str] = Header(None), x_session_id: Optional[str] = Header(None)):
+    """Analyse an uploaded CSV/Excel file.
+
+    The analysis is stored under the caller's ``X-Session-Id`` header (or
+    ``DEFAULT_OWNER`` without one) and listed by /analyses/ for that caller only.
+
+    CSV files are analysed chunk by chunk when ``stream`` is set or when the
+    upload is larger than ``STREAMING_THRESHOLD_BYTES``; ``raw_data`` then holds
+    a uniform row sample instead of every row, and the quartiles come from that
+    sample (``error_bounds`` gives their accuracy when it is not the whole file).
+    ``dataset_info.raw_data_sampled`` is true then; totals over the whole file
+    come from ``describe`` and ``categorical_distributions``, not ``raw_data``.
+
+    ``approximate`` streams a CSV file with fixed-size sketches instead of
+    exact distinct-value counts and row hashes, so memory no longer grows with
+    the number of distinct values or rows (see ``sketches.py``). Distinct
+    counts, top categories, quartiles, outlier and duplicate counts are then
+    estimates; ``error_bounds`` in the response gives their accuracy. It has
+    no effect on Excel files.
+
+    For Excel files ``sheet`` selects a worksheet by name (default: the
+    first; POST /sheets/ lists them), ``columns`` a comma-separated list of
+    header names, and ``skip_rows``/``max_rows`` a range of data rows below
+    the header. Only the selected cells are read (see ``excel.py``).
 
-            # Calculate categorical distributions
-            categorical_distributions = {}
-            for col in categorical_cols:
-                value_counts = df[col].value_counts(dropna=True)
-                categorical_distributions[col] = value_counts.to_dict()
-
-            response_data = {
-                "dataset_info": {
-                    "total_rows": total_rows,
-                    "total_columns": total_cols,
-                    "missing_values": int(missing_values),
-                    "missing_percentage": f"{missing_percentage:.2f}%",
-                    "duplicate_rows": int(duplicate_rows),
-                    "numeric_columns": len(numeric_cols),
-                    "categorical_columns": len(categorical_cols),
-                    "date_columns": len(date_cols)
-                },
-                "describe": describe_data,
-                "null_counts": null_counts,
-                "insights": insights,
-                "recommendations": recommendations,
-                "categorical_distributions": categorical_distributions,
-                "raw_data": serialize_dataframe_dict(df.to_dict(orient='list'))
-            }
-            
-            print("Analysis complete")
-            return JSONResponse(content=response_data)
-            
-        except Exception as e:
-            print(f"Error saving to database: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": f"Error saving analysis: {str(e)}"}
+    ``append_to`` takes the ``dataset_id`` of an earlier streamed (or
+    approximate) analysis of a CSV file when this upload is that file with
+    more rows appended, e.g. a daily extract. Only the appended rows are
+    parsed; the stored state of the earlier analysis is updated with them and
+    the response is that of a streamed analysis of the whole upload, keeping
+    the earlier file's column types. The upload is refused with a 409 if it
+    does not start with the earlier file's bytes.
+
+    The ``Server-Timing`` response header gives the time of every stage:
+    spooling, the result cache lookup, queueing for a worker, the analysis
+    stages and the database write (see ``instrumentation.py``).
+
+    ``raw_format`` (or the ``Accept`` header) selects how ``raw_data`` is sent:
+    ``json`` (default), ``arrow`` or ``columns``; see ``columnar.py``.
+
+    Every upload is stored in the columnar dataset cache under the SHA-256 of
+    its bytes, which is returned as ``dataset_id`` for the /datasets/ query
+    endpoints. Re-uploading identical bytes returns the cached analysis
+    without parsing the file again; with the same options too, the encoded
+    response is returned from the result cache without running an analysis
+    (see ``results.py``). Responses carry an ``ETag``; send it back as
+    ``If-None-Match`` to get an empty 304 when the analysis is unchanged.
+
+    The analysis itself runs in the worker pool (see ``workers.py``); when the
+    pool's queue is full the upload is refused with a 503. For large files
+    prefer POST /jobs/, which returns immediately.
+    """
+    try:
+        owner = owner_id(x_session_id)
+        selection = excel_selection(sheet, columns, skip_rows, max_rows)
+        trace = Trace()
+        with trace.span("spool"):
+            file_extension, raw_format, upload_path, file_size, content_hash = await read_upload(
+                file, raw_format, accept
             )
-            
+        result = await analyze_upload(owner, file.filename, upload_path, file_extension, file_size,
+                                      content_hash, stream, approximate, raw_format, selection, append_to,
+                                      trace=trace)
+        headers = {"ETag": result["etag"], "Server-Timing": trace.server_timing()}
+        if etag_matches(if_none_match, result["etag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=result["body"], media_type=result["media_type"], headers=headers)
+    except AnalysisError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail}
+        )
+    except PoolBusy as e:
+        return busy_response(e)
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error: %s", e)
         return JSONResponse(
             status_code=500,
             content={"detail": f"Unexpected error: {str(e)}"}
         )
-        
+
+@app.post("/sheets/")
+async def list_workbook_sheets(file: UploadFile = File(...)):
+    """List the worksheet names of an uploaded Excel workbook, for the ``sheet`` parameter."""
+    file_extension = file.filename[file.filename.rfind('.'):].lower()
+    if file_extension not in ['.xlsx', '.xls']:
+        raise HTTPException(status_code=400, detail="File must be an Excel file (.xlsx, .xls)")
+    upload_path, _, _ = await spool_upload(file, suffix=file_extension)
+    try:
+        sheets = await run_in_threadpool(list_sheets, upload_path, file_extension)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
+    finally:
+        os.remove(upload_path)
+    return {"sheets": sheets}
+
+# Background tasks of running jobs; referenced here so they are not garbage collected
+job_tasks = set()
+
+async def run_job(job_id, *args):
+    """Run a job's analysis in the pool slot ``create_job`` reserved for it."""
+    try:
+        result = await analyze_upload(*args, progress=job_store.progress(job_id), reserved=True)
+        await run_in_threadpool(job_store.finish, job_id, result)
+    except AnalysisError as e:
+        job_store.fail(job_id, e.status_code, e.detail)
+    except PoolBusy as e:
+        job_store.fail(job_id, 503, f"Server busy: {str(e)}")
+    except Exception as e:
+        logger.exception("Unexpected error in job %s: %s", job_id, e)
+        job_store.fail(job_id, 500, f"Unexpected error: {str(e)}")
     finally:
-        if db:
-            db.close()
+        analysis_pool.release()
+
+@app.post("/jobs/", status_code=202)
+async def create_job(file: UploadFile = File(...), stream: bool = False, approximate: bool = False,
+                     sheet: Optional[str] = None, columns: Optional[str] = None, skip_rows: int = 0,
+                     max_rows: Optional[int] = None, append_to: Optional[str] = None,
+                     raw_format: Optional[str] = None, accept: Optional[str] = Header(None),
+                     x_session_id: Optional[str] = Header(None)):
+    """Start a background analysis of an uploaded file and return its job id at once.
+
+    Takes the same parameters as /upload-file/. Follow the job with
+    GET /jobs/{job_id} (or /jobs/{job_id}/events for Server-Sent Events), fetch
+    sections with /jobs/{job_id}/result/{section} as they become ready, and the
+    complete response with /jobs/{job_id}/result.
+    """
+    # The job's slot is taken now, so a burst of uploads beyond the pool's
+    # capacity is refused here instead of failing later on the job stream
+    try:
+        analysis_pool.reserve()
+    except PoolBusy as e:
+        return busy_response(e)
+    try:
+        owner = owner_id(x_session_id)
+        selection = excel_selection(sheet, columns, skip_rows, max_rows)
+        file_extension, raw_format, upload_path, file_size, content_hash = await read_upload(
+            file, raw_format, accept
+        )
+        job_id = job_store.create(file.filename)
+    except AnalysisError as e:
+        analysis_pool.release()
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail}
+        )
+    except BaseException:
+        analysis_pool.release()
+        raise
+    task = asyncio.create_task(run_job(
+        job_id, owner, file.filename, upload_path, file_extension, file_size, content_hash,
+        stream, approximate, raw_format, selection, append_to
+    ))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    return {
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "result_url": f"/jobs/{job_id}/result"
+    }
+
+def get_job_or_404(job_id):
+    status = job_store.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return status
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """State (queued, running, done, failed), current stage, percent done and ready sections."""
+    return get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events stream of job status updates, closed once the job ends."""
+    get_job_or_404(job_id)
+
+    async def events():
+        last = None
+        while True:
+            status = job_store.status(job_id)
+            if status is None:
+                break
+            if status["updated"] != last:
+                last = status["updated"]
+                yield f"data: {json.dumps(status)}\n\n"
+            if status["state"] in ("done", "failed"):
+                break
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+def job_error_response(status):
+    if status["state"] == "failed":
+        return JSONResponse(
+            status_code=status["error"]["status_code"],
+            content={"detail": status["error"]["detail"]}
+        )
+    return JSONResponse(
+        status_code=409,
+        content={"detail": f"Job {status['job_id']} is {status['state']}"}
+    )
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """The complete analysis of a finished job, exactly as /upload-file/ returns it."""
+    status = get_job_or_404(job_id)
+    if status["state"] != "done":
+        return job_error_response(status)
+    return FileResponse(job_store.result_path(job_id), media_type=status["media_type"])
+
+@app.get("/jobs/{job_id}/result/{section}")
+async def get_job_section(job_id: str, section: str):
+    """One section of the analysis, available as soon as it has been computed."""
+    if section not in SECTIONS:
+        raise HTTPException(status_code=404,
+                            detail=f"Unknown section '{section}', expected one of: {', '.join(SECTIONS)}")
+    status = get_job_or_404(job_id)
+    if section not in status["sections"]:
+        if status["state"] == "failed":
+            return job_error_response(status)
+        return JSONResponse(
+            status_code=409,
+            content={"detail": f"Section '{section}' of job {job_id} is not ready yet"}
+        )
+    return FileResponse(job_store.section_path(job_id, section), media_type="application/json")
+
+def owner_or_400(x_session_id):
+    try:
+        return owner_id(x_session_id)
+    except AnalysisError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 @app.get("/analyses/")
-async def get_analyses():
+def get_analyses(limit: int = ANALYSES_PAGE_SIZE, cursor: Optional[str] = None,
+                 filename: Optional[str] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, x_session_id: Optional[str] = Header(None)):
+    """List the caller's analyses, newest first, without their sections.
+
+    ``filename`` filters on a filename prefix, ``since``/``until`` on the
+    upload time (UTC). Pass the returned ``next_cursor`` as ``cursor`` to get
+    the next page; it is null on the last page.
+    """
+    owner = owner_or_400(x_session_id)
+    if not 1 <= limit <= MAX_ANALYSES_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_ANALYSES_PAGE_SIZE}")
+    db = SessionLocal()
+    try:
+        items, next_cursor = list_analyses(db, owner, limit, cursor=cursor, filename=filename,
+                                           since=since, until=until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    finally:
+        db.close()
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/analyses/{analysis_id}")
+def get_analysis_detail(analysis_id: int, sections: Optional[str] = None,
+                        x_session_id: Optional[str] = Header(None)):
+    """Return one of the caller's analyses.
+
+    ``sections`` is a comma-separated subset of ``head_data``,
+    ``describe_data``, ``dtypes_data`` and ``null_counts``; only those are
+    decompressed and returned. All of them are returned by default.
+    """
+    owner = owner_or_400(x_session_id)
+    names = ANALYSIS_SECTIONS
+    if sections is not None:
+        names = tuple(dict.fromkeys(name.strip() for name in sections.split(",") if name.strip()))
+        unknown = [name for name in names if name not in ANALYSIS_SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
     db = SessionLocal()
     try:
-        analyses = db.query(FileAnalysis).all()
-        return analyses
+        analysis = get_analysis(db, owner, analysis_id, names)
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+    if analysis is None:
+        raise HTTPException(status_code=404, detail=f"Analysis {analysis_id} not found")
+    return analysis
+
+@app.get("/metrics")
+def get_metrics():
+    """Request latency and upload stage histograms in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+def get_dataset_or_404(dataset_id):
+    frame = dataset_cache.open(dataset_id)
+    if frame is None:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+    return frame
+
+def run_dataset_query(query, *args, **kwargs):
+    try:
+        return JSONResponse(content=query(*args, **kwargs))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": str(e)}
+        )
+
+@app.get("/datasets/{dataset_id}/histogram2d")
+def dataset_histogram2d(dataset_id: str, x: str, y: str, bins: int = 64):
+    """2D histogram of two numeric/date columns, for dense scatter plots."""
+    frame = get_dataset_or_404(dataset_id)
+    bins = max(1, min(bins, MAX_HISTOGRAM_BINS))
+    return run_dataset_query(histogram2d, frame, x, y, bins)
+
+@app.get("/datasets/{dataset_id}/downsample")
+def dataset_downsample(dataset_id: str, x: str, y: str, points: int = 1000):
+    """LTTB-downsampled (x, y) series sorted by x, for line charts."""
+    frame = get_dataset_or_404(dataset_id)
+    points = max(3, min(points, MAX_DOWNSAMPLE_POINTS))
+    return run_dataset_query(downsample_series, frame, x, y, points)
+
+@app.get("/datasets/{dataset_id}/aggregate")
+def dataset_aggregate(dataset_id: str, group_by: str, value: Optional[str] = None,
+                      agg: str = "count", limit: int = 50):
+    """Group-by aggregate for KPI widgets, largest groups first."""
+    frame = get_dataset_or_404(dataset_id)
+    limit = max(1, min(limit, MAX_AGGREGATE_GROUPS))
+    return run_dataset_query(group_aggregate, frame, group_by, value, agg, limit)
+
+@app.get("/datasets/{dataset_id}/correlation")
+def dataset_correlation(dataset_id: str, method: str = "pearson", columns: Optional[str] = None,
+                        threshold: float = STRONG_CORRELATION):
+    """Pearson or Spearman correlation of numeric columns (comma-separated ``columns``, default all).
+
+    Returns the pairs above ``threshold``, the multicollinearity groups they
+    form and, for up to ``MAX_CORRELATION_MATRIX_COLUMNS`` columns, the matrix.
+    At most ``MAX_CORRELATION_COLUMNS`` columns are accepted.
+    """
+    frame = get_dataset_or_404(dataset_id)
+    if columns is not None:
+        columns = list(dict.fromkeys(col.strip() for col in columns.split(",") if col.strip()))
+    return run_dataset_query(correlation_summary, frame, columns, method, threshold,
+                             MAX_CORRELATION_MATRIX_COLUMNS, MAX_CORRELATION_COLUMNS)
+
+@app.get("/datasets/{dataset_id}/sample")
+def dataset_sample(dataset_id: str, rows: int = 1000, stratify_by: Optional[str] = None,
+                   seed: int = 0, raw_format: Optional[str] = None,
+                   accept: Optional[str] = Header(None)):
+    """Capped uniform or stratified row sample, returned like upload raw_data."""
+    frame = get_dataset_or_404(dataset_id)
+    rows = max(1, min(rows, MAX_SAMPLE_ROWS))
+    try:
+        raw_format = negotiate_raw_format(raw_format, accept)
+        indices = sample_indices(frame, rows, stratify_by, seed)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": str(e)}
+        )
+    summary = {
+        "dataset_id": dataset_id,
+        "total_rows": len(frame),
+        "sampled_rows": int(len(indices)),
+        "stratify_by": stratify_by
+    }
+    return render_analysis(summary, frame.take(indices), raw_format)
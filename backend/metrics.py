@@ -0,0 +1,131 @@
+"""Prometheus metrics served by /metrics in the text exposition format.
+
+Metrics live in the API process; the analysis workers return their stage
+spans with the result and the API records them here. Only counters,
+histograms and callback gauges are needed, so no client library is used.
+"""
+import bisect
+import threading
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        if not self.labels and not values:
+            values = [((), 0)]
+        lines.extend(f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                labels = _label_text(self.labels, key, [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from ``func()`` at scrape time."""
+
+    def __init__(self, name, documentation, func):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.func()}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to answer an HTTP request.", ("method", "route", "status"),
+))
+upload_stage_seconds = registry.register(Histogram(
+    "upload_stage_duration_seconds", "Time spent in each stage of an upload analysis.", ("stage",),
+))
+result_cache_hits = registry.register(Counter(
+    "result_cache_hits_total", "Uploads answered from the result cache, by tier.", ("tier",),
+))
+result_cache_misses = registry.register(Counter(
+    "result_cache_misses_total", "Uploads not found in the result cache.",
+))
+result_cache_evictions = registry.register(Counter(
+    "result_cache_evictions_total", "Responses removed from the result cache, by tier and reason.",
+    ("tier", "reason"),
+))
+
+
+def observe_spans(spans):
+    """Record the spans of a ``Trace`` in ``upload_stage_seconds``."""
+    for span in spans:
+        upload_stage_seconds.observe(span["ms"] / 1000, stage=span["name"])
@@ -1,45 +1,202 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, create_engine
+from sqlalchemy import (Column, Index, Integer, LargeBinary, MetaData, String, Table, DateTime, create_engine,
+                        event, inspect, insert, make_url, tuple_)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from datetime import datetime
 import json
+import zlib
+
+from config import DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE, DEFAULT_OWNER, SQLITE_BUSY_TIMEOUT
+from serialization import dumps, loads
 
 Base = declarative_base()
 
+# Stored analysis sections; each is a zlib-compressed JSON document in its own
+# column so a detail request only reads and parses the sections it asks for.
+ANALYSIS_SECTIONS = ("head_data", "describe_data", "dtypes_data", "null_counts")
+
+
+def pack_section(encoded):
+    """Compress a section given as encoded JSON bytes (see ``serialization.dumps``)."""
+    return zlib.compress(encoded)
+
+
+def unpack_section(blob):
+    return loads(zlib.decompress(blob)) if blob is not None else None
+
+
 class FileAnalysis(Base):
-    __tablename__ = "file_analyses"
+    """One analysed upload, owned by the session that uploaded it.
+
+    The sections are passed in as the JSON bytes already encoded for the
+    upload's response and only compressed here.
 
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String(255), index=True)
-    upload_date = Column(DateTime, default=datetime.utcnow)
-    head_data = Column(Text)  # Store as JSON string
-    describe_data = Column(Text)  # Store as JSON string
-    dtypes_data = Column(Text)  # Store as JSON string
-    null_counts = Column(Text)  # Store as JSON string
+    Listings are keyset-paginated on ``(upload_date, id)``, newest first; the
+    composite indexes serve both the unfiltered and the filename-filtered
+    listing of one owner without scanning other rows.
+    """
+    __tablename__ = "analyses"
+    __table_args__ = (
+        Index("ix_analyses_owner_date", "owner", "upload_date", "id"),
+        Index("ix_analyses_owner_filename", "owner", "filename", "upload_date", "id"),
+    )
 
-    def __init__(self, filename, upload_date, head_data, describe_data, dtypes_data, null_counts):
+    id = Column(Integer, primary_key=True)
+    owner = Column(String(64), nullable=False)
+    filename = Column(String(255))
+    upload_date = Column(DateTime, default=datetime.utcnow, nullable=False)
+    dataset_id = Column(String(64))
+    head_data = Column(LargeBinary)
+    describe_data = Column(LargeBinary)
+    dtypes_data = Column(LargeBinary)
+    null_counts = Column(LargeBinary)
+
+    def __init__(self, owner, filename, upload_date, dataset_id, head_data, describe_data,
+                 dtypes_data, null_counts):
+        self.owner = owner
         self.filename = filename
         self.upload_date = upload_date
-        self.head_data = json.dumps(head_data)
-        self.describe_data = json.dumps(describe_data)
-        self.dtypes_data = json.dumps(dtypes_data)
-        self.null_counts = json.dumps(null_counts)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'filename': self.filename,
-            'upload_date': self.upload_date.isoformat(),
-            'head_data': json.loads(self.head_data),
-            'describe_data': json.loads(self.describe_data),
-            'dtypes_data': json.loads(self.dtypes_data),
-            'null_counts': json.loads(self.null_counts)
+        self.dataset_id = dataset_id
+        self.head_data = pack_section(head_data)
+        self.describe_data = pack_section(describe_data)
+        self.dtypes_data = pack_section(dtypes_data)
+        self.null_counts = pack_section(null_counts)
+
+
+# Columns returned by listings; the compressed sections are never read there.
+SUMMARY_COLUMNS = (FileAnalysis.id, FileAnalysis.filename, FileAnalysis.upload_date, FileAnalysis.dataset_id)
+
+
+def summary_dict(row):
+    return {
+        'id': row.id,
+        'filename': row.filename,
+        'upload_date': row.upload_date.isoformat(),
+        'dataset_id': row.dataset_id
+    }
+
+
+def encode_cursor(row):
+    return f"{row.upload_date.isoformat()},{row.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a listing cursor into ``(upload_date, id)``; raises ValueError if malformed."""
+    upload_date, _, analysis_id = cursor.rpartition(",")
+    return datetime.fromisoformat(upload_date), int(analysis_id)
+
+
+def list_analyses(db, owner, limit, cursor=None, filename=None, since=None, until=None):
+    """One page of an owner's analyses, newest first.
+
+    ``filename`` matches a filename prefix. Returns ``(items, next_cursor)``;
+    ``next_cursor`` is None on the last page.
+    """
+    query = db.query(*SUMMARY_COLUMNS).filter(FileAnalysis.owner == owner)
+    if filename:
+        # A range instead of LIKE so SQLite can use the filename index
+        query = query.filter(FileAnalysis.filename >= filename,
+                             FileAnalysis.filename < filename + "\U0010ffff")
+    if since is not None:
+        query = query.filter(FileAnalysis.upload_date >= since)
+    if until is not None:
+        query = query.filter(FileAnalysis.upload_date < until)
+    if cursor is not None:
+        query = query.filter(tuple_(FileAnalysis.upload_date, FileAnalysis.id) < decode_cursor(cursor))
+    rows = query.order_by(FileAnalysis.upload_date.desc(), FileAnalysis.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [summary_dict(row) for row in rows[:limit]], next_cursor
+
+
+def get_analysis(db, owner, analysis_id, sections=ANALYSIS_SECTIONS):
+    """An owner's analysis with only ``sections`` decompressed, or None."""
+    columns = SUMMARY_COLUMNS + tuple(getattr(FileAnalysis, name) for name in sections)
+    row = db.query(*columns).filter(FileAnalysis.id == analysis_id, FileAnalysis.owner == owner).first()
+    if row is None:
+        return None
+    return {**summary_dict(row), **{name: unpack_section(getattr(row, name)) for name in sections}}
+
+
+# Table analyses were stored in before they had owners and compressed sections
+LEGACY_TABLE = "file_analyses"
+
+# Rows copied per INSERT when migrating the legacy table
+MIGRATION_BATCH_ROWS = 500
+
+
+def _migrate_legacy_table(connection):
+    """Move the rows of the legacy table into ``analyses`` and drop it.
+
+    Legacy rows have JSON text sections and no owner or dataset; they are
+    stored under ``DEFAULT_OWNER``.
+    """
+    legacy = Table(LEGACY_TABLE, MetaData(), autoload_with=connection)
+    rows = connection.execute(legacy.select().order_by(legacy.c.id)).mappings().all()
+    batch = []
+    for row in rows:
+        record = {
+            "owner": DEFAULT_OWNER,
+            "filename": row["filename"],
+            "upload_date": row["upload_date"] or datetime.utcnow(),
+            "dataset_id": None,
         }
+        for name in ANALYSIS_SECTIONS:
+            text = row[name]
+            # Re-encoded, as the legacy JSON may hold NaN literals
+            record[name] = pack_section(dumps(json.loads(text))) if text is not None else None
+        batch.append(record)
+        if len(batch) >= MIGRATION_BATCH_ROWS:
+            connection.execute(insert(FileAnalysis.__table__), batch)
+            batch = []
+    if batch:
+        connection.execute(insert(FileAnalysis.__table__), batch)
+    legacy.drop(connection)
+
+
+def init_database(bind):
+    """Create missing tables and migrate the legacy table, in one transaction."""
+    with bind.begin() as connection:
+        Base.metadata.create_all(bind=connection)
+        if inspect(connection).has_table(LEGACY_TABLE):
+            _migrate_legacy_table(connection)
+
+
+def _is_sqlite_file(url):
+    database = url.database
+    return bool(database) and database != ":memory:" and url.query.get("mode") != "memory"
+
+
+def create_database_engine(url):
+    """A pooled engine; SQLite connections use WAL so readers never block the writer.
+
+    In-memory SQLite shares one connection between threads instead, as every
+    connection would open its own empty database.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True)
+
+    if _is_sqlite_file(make_url(url)):
+        pool_args = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    else:
+        pool_args = {"poolclass": StaticPool}
+    engine = create_engine(
+        url, **pool_args,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+    )
+
+    @event.listens_for(engine, "connect")
+    def configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Still corruption-safe in WAL mode; a power loss may drop the last
+        # commits, but a commit no longer waits for an fsync
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
 
-# Create SQLite database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./csv_analysis.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+# Create database
+engine = create_database_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
@@ -0,0 +1,45 @@
+"""Column-parallel execution of the per-column analysis.
+
+Columns are analysed independently, so their work is spread over a pool of
+``COLUMN_WORKERS`` threads per process. The heavy kernels (NumPy sorts and
+reductions, ``pd.to_numeric``/``pd.to_datetime``, hash-based counting) run
+in C and release the GIL for most of their time, so the threads share one
+copy of the data and still overlap on several cores. A process pool over
+shared memory is not used: analyses already run in ``ANALYSIS_WORKERS``
+processes, and text columns, the slowest to analyse, cannot be shared
+without pickling them.
+
+``map_columns`` returns results in input order, so the output is the same
+as a serial run.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import COLUMN_BLOCK_COLS, COLUMN_WORKERS
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=COLUMN_WORKERS, thread_name_prefix="columns")
+        return _executor
+
+
+def map_columns(func, items):
+    """``[func(item) for item in items]``, spread over the column threads.
+
+    ``func`` must not call ``map_columns`` itself.
+    """
+    items = list(items)
+    if COLUMN_WORKERS <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    return list(_pool().map(func, items))
+
+
+def column_blocks(count, block_cols=COLUMN_BLOCK_COLS):
+    """Slices that split ``count`` columns into blocks of ``block_cols``; one empty block for none."""
+    return [slice(start, min(start + block_cols, count)) for start in range(0, max(count, 1), block_cols)]
@@ -0,0 +1,426 @@
+"""The /upload-file/ analysis, runnable in a worker process.
+
+``run_analysis`` takes the path of a spooled upload and returns the encoded
+response body together with the small record stored in the database, so the
+parsed DataFrame never crosses the process boundary. The record's sections
+are the JSON bytes encoded for the response, not encoded a second time.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from analysis import (
+    STRONG_CORRELATION,
+    build_dataset_info,
+    build_recommendations,
+    categorical_insights,
+    category_counts,
+    category_distribution,
+    correlation_groups,
+    correlation_insights,
+    numeric_insights,
+    pair_records,
+    summary_insight,
+)
+from columnar import encode_analysis
+from correlation import strong_pairs
+from datasets import dataset_cache
+from excel import ExcelSelection, read_excel_frame
+from instrumentation import Trace
+from kde import distribution_peaks
+from parallel import column_blocks, map_columns
+from serialization import dumps, encode_sections, frame_records, serialize_dataframe_dict
+from stats import NumericSummary, numeric_summary
+from streaming import analyze_csv_stream, extends_file
+from type_inference import infer_schema
+
+logger = logging.getLogger(__name__)
+
+# Stages reported to ``progress(stage, percent, **sections)`` callbacks, in order.
+STAGES = ("parse", "type_inference", "describe", "insights", "correlation", "serialization")
+
+# Sections of the analysis response that can be fetched on their own.
+SECTIONS = ("dataset_info", "describe", "null_counts", "insights", "recommendations",
+            "categorical_distributions", "categorical_other_counts", "multicollinearity_groups")
+
+
+class AnalysisError(Exception):
+    """An analysis failure that maps onto an HTTP error response."""
+
+    def __init__(self, status_code, detail):
+        # Pass both values to Exception so the error survives pickling
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def read_file_to_dataframe(path: str, file_extension: str,
+                           selection: ExcelSelection = ExcelSelection()) -> pd.DataFrame:
+    """Read a file on disk into a pandas DataFrame based on file type.
+
+    ``selection`` picks the sheet, columns and rows of an Excel file.
+    """
+    try:
+        if file_extension == '.csv':
+            df = pd.read_csv(path)
+        elif file_extension in ['.xlsx', '.xls']:
+            # Empty and whitespace-only cells come back as NaN
+            df = read_excel_frame(path, file_extension, selection)
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+
+        # Clean column names
+        df.columns = df.columns.str.strip()
+
+        return df
+    except Exception as e:
+        raise ValueError(f"Error reading file: {str(e)}")
+
+
+def publish_dataset(writer, content_hash):
+    """Finish the dataset cache entry and return its id, or None if it could not be stored."""
+    try:
+        if writer is not None:
+            writer.finish()
+    except Exception as e:
+        logger.warning("Error caching dataset: %s", e)
+    return content_hash if dataset_cache.has(content_hash) else None
+
+
+def cache_analysis(content_hash, analysis_mode, response_data, head_data, dtypes_data, raw_rows=None):
+    try:
+        dataset_cache.save_analysis(content_hash, analysis_mode, response_data, head_data,
+                                    dtypes_data, raw_rows)
+    except Exception as e:
+        logger.warning("Error caching analysis: %s", e)
+
+
+def cache_state(content_hash, analysis_mode, analysis):
+    try:
+        dataset_cache.save_state(content_hash, analysis_mode, analysis)
+    except Exception as e:
+        logger.warning("Error caching analysis state: %s", e)
+
+
+def _no_progress(stage, percent, **sections):
+    pass
+
+
+def _by_column_block(func, values):
+    """``func`` of each block of columns of a 2D array (see ``parallel.column_blocks``), in order."""
+    return map_columns(lambda block: func(values[:, block]), column_blocks(values.shape[1]))
+
+
+def _categorical_column(series, total_rows, null_count):
+    """``(describe, insights, distribution, other_rows)`` of one categorical column, from one ``category_counts``."""
+    value_counts = category_counts(series)
+    describe = {
+        'count': int(total_rows - null_count),
+        'unique': len(value_counts),
+        'top': str(value_counts.index[0]) if not value_counts.empty else None,
+        'freq': int(value_counts.iloc[0]) if not value_counts.empty else 0,
+        'null_count': null_count
+    }
+    distribution, other_rows = category_distribution(value_counts, total_rows - null_count)
+    return describe, categorical_insights(series.name, value_counts, total_rows), distribution, other_rows
+
+
+def _date_column(series, null_count):
+    minimum, maximum = series.min(), series.max()
+    return {
+        'min': minimum.isoformat() if pd.notnull(minimum) else None,
+        'max': maximum.isoformat() if pd.notnull(maximum) else None,
+        'unique': int(series.nunique()),
+        'null_count': null_count
+    }
+
+
+def analyze_dataframe(df, schema, progress=_no_progress):
+    """Run the full in-memory analysis of ``df``.
+
+    Returns ``(response_data, head_data, dtypes_data)``; ``response_data`` has
+    no ``dataset_id`` or ``raw_data`` yet. Each section of the response is
+    passed to ``progress`` as soon as it is final. Per-column work runs on the
+    column threads of ``parallel.py``.
+    """
+    # Calculate dataset info
+    total_rows, total_cols = df.shape
+
+    numeric_cols = schema.numeric_cols
+    date_cols = schema.date_cols
+    categorical_cols = schema.categorical_cols
+
+    # One fused pass per block of columns computes every numeric statistic
+    # (see stats.py). The array is sorted in place; the KDE below does not
+    # depend on row order.
+    numeric_values = df[numeric_cols].to_numpy(dtype=float, na_value=np.nan, copy=True)
+    numeric_stats = NumericSummary.concat(
+        _by_column_block(lambda values: numeric_summary(values, overwrite=True), numeric_values)
+    )
+
+    # Calculate missing values accurately; numeric columns were counted above
+    column_nulls = dict(zip(numeric_cols, numeric_stats.null_count.tolist()))
+    other_cols = [col for col in df.columns if col not in column_nulls]
+    column_nulls.update(df[other_cols].isnull().sum().to_dict())
+    null_counts = {col: int(column_nulls[col]) for col in df.columns}
+    missing_values = sum(null_counts.values())
+    missing_percentage = (missing_values / (total_rows * total_cols)) * 100
+
+    # Calculate duplicate rows
+    duplicate_mask = df.duplicated()
+    duplicate_rows = duplicate_mask.sum()
+
+    logger.info("Analysis summary", extra={
+        "rows": total_rows, "cols": total_cols, "missing": int(missing_values),
+        "duplicates": int(duplicate_rows), "numeric": len(numeric_cols),
+        "categorical": len(categorical_cols), "dates": len(date_cols),
+    })
+    logger.debug("Column kinds: numeric=%s categorical=%s dates=%s", numeric_cols, categorical_cols, date_cols)
+
+    dataset_info = build_dataset_info(
+        total_rows, total_cols, missing_values, missing_percentage, duplicate_rows,
+        len(numeric_cols), len(categorical_cols), len(date_cols)
+    )
+    dataset_info["raw_data_rows"] = total_rows
+    dataset_info["raw_data_sampled"] = False
+    progress("describe", 45, dataset_info=dataset_info)
+
+    # Perform EDA calculations
+    # Convert head data to serializable format
+    head_data = frame_records(df.head())
+
+    # Handle numeric columns
+    numeric_describe = numeric_stats.describe(numeric_cols)
+
+    # Handle categorical columns: describe entry, insights and top-K
+    # distribution of each column from one count of its codes
+    categorical = map_columns(lambda col: _categorical_column(df[col], total_rows, null_counts[col]),
+                              categorical_cols)
+    categorical_describe = {col: describe for col, (describe, *_) in zip(categorical_cols, categorical)}
+
+    # Handle date columns
+    date_describe = dict(zip(date_cols, map_columns(lambda col: _date_column(df[col], null_counts[col]),
+                                                    date_cols)))
+
+    # Combine descriptions and convert to serializable format
+    describe_data = serialize_dataframe_dict({**numeric_describe, **categorical_describe})
+    describe_data.update(date_describe)
+
+    dtypes_data = df.dtypes.astype(str).to_dict()
+
+    progress("insights", 55, describe=describe_data, null_counts=null_counts)
+
+    # Generate insights
+    insights = []
+
+    # Multi-modal Check using one batched KDE per block of numeric columns
+    peaks = [None] * len(numeric_cols)
+    if numeric_cols:
+        try:
+            peaks = [peak for block in _by_column_block(distribution_peaks, numeric_values) for peak in block]
+        except Exception as e:
+            logger.warning("Error in multi-modal analysis: %s", e)
+
+    # Numerical Column Analysis: range, outliers and distribution shape
+    for i, col in enumerate(numeric_cols):
+        insights.extend(numeric_insights(
+            col, total_rows, numeric_stats.q1[i], numeric_stats.q3[i], numeric_stats.median[i],
+            numeric_stats.skew[i], numeric_stats.kurtosis[i], int(numeric_stats.outliers[i]), peaks[i]
+        ))
+
+    # Categorical Column Analysis
+    for _, column_insights, _, _ in categorical:
+        insights.extend(column_insights)
+
+    # Calculate categorical distributions; rows outside the top categories
+    # are counted separately for the columns that have any
+    categorical_distributions = {
+        col: distribution for col, (_, _, distribution, _) in zip(categorical_cols, categorical)
+    }
+    categorical_other_counts = {
+        col: other_rows for col, (_, _, _, other_rows) in zip(categorical_cols, categorical) if other_rows
+    }
+    progress("correlation", 80, categorical_distributions=categorical_distributions,
+             categorical_other_counts=categorical_other_counts)
+
+    # Correlation Analysis; numeric_values was sorted above, so the columns
+    # are read again in row order
+    strong_correlations = []
+    multicollinear = []
+    if len(numeric_cols) >= 2:
+        pairs = strong_pairs(df[numeric_cols].to_numpy(dtype=float, na_value=np.nan), STRONG_CORRELATION)
+        strong_correlations = pair_records(numeric_cols, *pairs)
+        multicollinear = correlation_groups(numeric_cols, strong_correlations)
+        insights.extend(correlation_insights(strong_correlations, multicollinear))
+
+    # Overall Summary
+    insights.append(summary_insight(
+        len(numeric_cols), len(categorical_cols), len(strong_correlations),
+        total_rows, missing_percentage
+    ))
+
+    # Add recommendations based on analysis
+    recommendations = build_recommendations(
+        total_rows, missing_values, missing_percentage, duplicate_rows, bool(strong_correlations)
+    )
+
+    progress("correlation", 90, insights=insights, recommendations=recommendations,
+             multicollinearity_groups=multicollinear)
+
+    response_data = {
+        "dataset_info": dataset_info,
+        "describe": describe_data,
+        "null_counts": null_counts,
+        "insights": insights,
+        "recommendations": recommendations,
+        "categorical_distributions": categorical_distributions,
+        "categorical_other_counts": categorical_other_counts,
+        "multicollinearity_groups": multicollinear
+    }
+    return response_data, head_data, dtypes_data
+
+
+def _report_sections(progress, stage, percent, response_data):
+    progress(stage, percent, **{name: response_data[name] for name in SECTIONS if name in response_data})
+
+
+def load_base_analysis(upload_path, base_id, analysis_mode):
+    """Return the streaming analysis of dataset ``base_id`` and the dataset itself.
+
+    Raises ``AnalysisError`` unless the dataset's file is a prefix of the upload.
+    """
+    base = dataset_cache.load_state(base_id, analysis_mode)
+    dataset = dataset_cache.open(base_id)
+    if base is None or dataset is None:
+        mode = "approximate=true" if analysis_mode == 'approx' else "stream=true"
+        raise AnalysisError(404, f"Dataset {base_id} has no appendable analysis; upload it with {mode} first")
+    if not extends_file(upload_path, base.source_bytes, base_id):
+        raise AnalysisError(409, f"The upload does not extend dataset {base_id} with new rows")
+    return base, dataset
+
+
+def _analyze_upload(upload_path, file_extension, content_hash, streaming, analysis_mode, selection,
+                    append_to, progress):
+    """Parse and analyse an upload that is not in the analysis cache yet."""
+    base = base_dataset = None
+    if append_to:
+        base, base_dataset = load_base_analysis(upload_path, append_to, analysis_mode)
+    # Columns are written to the dataset cache while the file is parsed; an
+    # append starts from a copy of the base dataset's columns
+    writer = None if dataset_cache.has(content_hash) else dataset_cache.writer(content_hash, base_dataset)
+    try:
+        if streaming:
+            try:
+                logger.debug("Analysing CSV file in streaming mode")
+                analysis = analyze_csv_stream(
+                    upload_path, writer, approximate=analysis_mode == 'approx', base=base,
+                    on_chunk=lambda done: progress("parse", int(80 * done))
+                )
+                response_data, head_data, dtypes_data, sample = analysis.report()
+            except Exception as e:
+                logger.warning("Error reading file: %s", e)
+                raise AnalysisError(400, f"Error reading file: {str(e)}")
+            response_data = {"dataset_id": publish_dataset(writer, content_hash), **response_data}
+            cache_analysis(content_hash, analysis_mode, response_data, head_data, dtypes_data,
+                           sample.index.to_numpy())
+            cache_state(content_hash, analysis_mode, analysis)
+            _report_sections(progress, "serialization", 90, response_data)
+            return response_data, head_data, dtypes_data, sample
+
+        # Read file into DataFrame
+        try:
+            logger.debug("Parsing %s file with pandas", file_extension)
+            df = read_file_to_dataframe(upload_path, file_extension, selection)
+            progress("type_inference", 30)
+
+            # Classify every column once and convert numeric/date columns in place
+            schema = infer_schema(df)
+            if writer is not None:
+                writer.append(df)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                # The column list is only built when it is logged
+                logger.debug("File read: shape=%s columns=%s", df.shape, list(df.columns))
+        except Exception as e:
+            logger.warning("Error reading file: %s", e)
+            raise AnalysisError(400, f"Error reading file: {str(e)}")
+
+        try:
+            progress("describe", 40)
+            response_data, head_data, dtypes_data = analyze_dataframe(df, schema, progress)
+        except Exception as e:
+            logger.exception("Error in EDA calculations: %s", e)
+            raise AnalysisError(500, f"Error in data analysis: {str(e)}")
+
+        response_data = {"dataset_id": publish_dataset(writer, content_hash), **response_data}
+        cache_analysis(content_hash, analysis_mode, response_data, head_data, dtypes_data)
+        return response_data, head_data, dtypes_data, df
+    finally:
+        if writer is not None:
+            writer.abort()
+
+
+def run_analysis(upload_path, file_extension, content_hash, streaming, approximate, raw_format,
+                 selection=ExcelSelection(), append_to=None, progress=_no_progress):
+    """Analyse a spooled upload and encode the response.
+
+    Returns ``{"body", "media_type", "dataset_id", "record", "trace"}`` where
+    ``record`` holds the fields saved to the database, sections as encoded
+    JSON, and ``trace`` the spans of the stages (see ``instrumentation.py``). Raises ``AnalysisError`` on failure.
+    ``progress(stage, percent, **sections)`` is called as the analysis moves
+    through ``STAGES``; it must be picklable when the analysis runs in a
+    worker process. An Excel ``selection`` other than the whole first sheet
+    is cached as its own dataset.
+
+    ``append_to`` is the dataset id of an earlier streamed analysis of a CSV
+    file that this upload extends with more rows; its stored state is updated
+    with the new rows only, giving the response of a streamed analysis of the
+    whole upload.
+    """
+    content_hash = selection.dataset_key(content_hash)
+    analysis_mode = 'approx' if approximate else 'stream' if streaming else 'full'
+    # Every progress stage is also a span of the trace returned with the result
+    trace = Trace()
+    progress = trace.progress(progress)
+    progress("parse", 0)
+
+    # Identical bytes were analysed before: answer from the dataset cache
+    cached = dataset_cache.load_analysis(content_hash, analysis_mode)
+    if cached is not None:
+        logger.info("Returning cached analysis for %s", content_hash)
+        response_data, head_data, dtypes_data, raw_frame = cached
+        _report_sections(progress, "serialization", 90, response_data)
+    else:
+        response_data, head_data, dtypes_data, raw_frame = _analyze_upload(
+            upload_path, file_extension, content_hash, streaming, analysis_mode, selection, append_to,
+            progress
+        )
+        progress("serialization", 90)
+
+    trace.annotate(rows=len(raw_frame), cols=len(raw_frame.columns))
+    try:
+        sections = encode_sections(response_data)
+        body, media_type = encode_analysis(sections, raw_frame, raw_format)
+        record = {
+            "head_data": dumps(head_data),
+            "describe_data": sections["describe"],
+            "dtypes_data": dumps(dtypes_data),
+            "null_counts": sections["null_counts"],
+        }
+    except Exception as e:
+        logger.exception("Error encoding response: %s", e)
+        raise AnalysisError(500, f"Error encoding analysis: {str(e)}")
+    trace.end()
+    dataset_info = response_data["dataset_info"]
+    for span in trace.spans:
+        span.setdefault("rows", dataset_info["total_rows"])
+        span.setdefault("cols", dataset_info["total_columns"])
+
+    return {
+        "body": body,
+        "media_type": media_type,
+        "dataset_id": response_data.get("dataset_id"),
+        "record": record,
+        "trace": trace.spans,
+    }
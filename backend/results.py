@@ -0,0 +1,202 @@
+"""Cache of encoded /upload-file/ responses.
+
+Re-uploading the same bytes with the same options (analysis mode,
+``raw_format``, Excel selection, ``append_to``) returns the stored response
+without queueing an analysis or reading the dataset cache. Entries are named
+by ``result_key`` and kept in two tiers:
+
+* memory: a per-process LRU of up to ``RESULT_CACHE_MEMORY_BYTES`` of bodies;
+* disk: one pickle per entry in ``RESULT_CACHE_DIR``, shared by the API
+  processes. Least recently read entries (file atime, set on every hit) are
+  removed beyond ``RESULT_CACHE_DISK_BYTES``.
+
+Entries older than ``RESULT_CACHE_TTL_SECONDS`` expire in both tiers. An
+entry whose dataset has been evicted from the dataset cache is a miss too,
+as its ``dataset_id`` no longer works with the /datasets/ endpoints. Every
+entry carries an ETag, a digest of its body, so a client that sends it back
+in ``If-None-Match`` gets a 304 instead of the body.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import RESULT_CACHE_DIR, RESULT_CACHE_DISK_BYTES, RESULT_CACHE_MEMORY_BYTES, RESULT_CACHE_TTL_SECONDS
+from datasets import CACHE_SCHEMA_VERSION, dataset_cache
+from metrics import result_cache_evictions, result_cache_hits, result_cache_misses
+
+logger = logging.getLogger(__name__)
+
+_ENTRY_FILE = re.compile(r"[0-9a-f]{64}\.pkl")
+
+
+def result_key(content_hash, streaming, approximate, raw_format, selection, append_to):
+    """Cache key of an upload's response, from the ``run_analysis`` arguments after the file extension.
+
+    The key includes ``CACHE_SCHEMA_VERSION``, so responses of older code are misses.
+    """
+    mode = 'approx' if approximate else 'stream' if streaming else 'full'
+    key = f"v{CACHE_SCHEMA_VERSION}:{selection.dataset_key(content_hash)}:{mode}:{raw_format}:{append_to or ''}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an ``If-None-Match`` header value matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+class ResultCache:
+    def __init__(self, root=RESULT_CACHE_DIR, memory_bytes=RESULT_CACHE_MEMORY_BYTES,
+                 disk_bytes=RESULT_CACHE_DISK_BYTES, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.root = root
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self.memory_size = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def get(self, key):
+        """The entry stored under ``key``, or None.
+
+        An entry is a ``run_analysis`` result (``body``, ``media_type``,
+        ``dataset_id``, ``record``) plus its ``etag`` and ``created`` time.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        tier = "memory"
+        if entry is None:
+            entry, tier = self._read(key), "disk"
+        if entry is not None:
+            stale = self._stale_reason(entry)
+            if stale is not None:
+                self.discard(key)
+                result_cache_evictions.inc(tier=tier, reason=stale)
+                entry = None
+        if entry is None:
+            result_cache_misses.inc()
+            return None
+        result_cache_hits.inc(tier=tier)
+        if tier == "disk":
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, result):
+        """Store a ``run_analysis`` result under ``key`` and return its entry."""
+        entry = {
+            "body": result["body"],
+            "media_type": result["media_type"],
+            "dataset_id": result["dataset_id"],
+            "record": result["record"],
+            "etag": '"' + hashlib.sha256(result["body"]).hexdigest()[:32] + '"',
+            "created": time.time(),
+        }
+        self._remember(key, entry)
+        if len(entry["body"]) <= self.disk_bytes:
+            try:
+                self._write(key, entry)
+                self.evict()
+            except OSError as e:
+                logger.warning("Error caching result: %s", e)
+        return entry
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                self.memory_size -= len(entry["body"])
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_size = 0
+        for item in os.scandir(self.root):
+            if _ENTRY_FILE.fullmatch(item.name):
+                try:
+                    os.remove(item.path)
+                except FileNotFoundError:
+                    pass
+
+    def _stale_reason(self, entry):
+        if time.time() - entry["created"] > self.ttl:
+            return "expired"
+        if entry["dataset_id"] is not None and not dataset_cache.has(entry["dataset_id"]):
+            return "dataset_evicted"
+        return None
+
+    def _remember(self, key, entry):
+        size = len(entry["body"])
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self.memory_size -= len(previous["body"])
+            self._memory[key] = entry
+            self.memory_size += size
+            while self.memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self.memory_size -= len(evicted["body"])
+                result_cache_evictions.inc(tier="memory", reason="size")
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            # atime marks the last read for eviction; mtime stays the write time
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            return None
+        return entry
+
+    def _write(self, key, entry):
+        tmp = os.path.join(self.root, f".{key}-{uuid.uuid4().hex}")
+        with open(tmp, "wb") as out:
+            pickle.dump(entry, out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+
+    def evict(self):
+        """Remove expired entries from disk, then least recently read ones beyond the size limit."""
+        entries = []
+        for item in os.scandir(self.root):
+            if not _ENTRY_FILE.fullmatch(item.name):
+                continue
+            try:
+                stat = item.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_mtime, stat.st_size, item.path))
+        expired_before = time.time() - self.ttl
+        total = sum(size for _, _, size, _ in entries)
+        for _, written, size, path in sorted(entries):
+            if written >= expired_before and total <= self.disk_bytes:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            result_cache_evictions.inc(tier="disk", reason="expired" if written < expired_before else "size")
+
+
+result_cache = ResultCache()
@@ -0,0 +1,132 @@
+"""JSON encoding of analysis results.
+
+``dumps`` encodes with orjson, which writes NumPy arrays and scalars natively
+and NaN/inf as null, and falls back to the standard library without it.
+DataFrame columns are converted as a whole by ``column_values``: numeric
+columns stay NumPy arrays for the encoder, datetime columns become ISO
+strings in one ``np.datetime_as_string`` call and missing values are
+replaced through one ``pd.isna`` mask per column instead of a check per
+cell. Sections encoded once with ``dumps`` are spliced into a response body
+with ``join_encoded``, so the same bytes serve the response, the database
+row and the caches.
+"""
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Array dtypes orjson encodes natively
+NATIVE_KINDS = "biuf"
+
+
+def convert_to_serializable(obj):
+    if isinstance(obj, (pd.Timestamp, datetime)):
+        return obj.isoformat()
+    elif isinstance(obj, (np.int64, np.int32)):
+        return int(obj)
+    elif isinstance(obj, (np.float64, np.float32)):
+        return float(obj) if not np.isnan(obj) else None
+    elif pd.isna(obj):
+        return None
+    return obj
+
+def serialize_dataframe_dict(d):
+    if isinstance(d, dict):
+        return {k: serialize_dataframe_dict(v) for k, v in d.items()}
+    elif isinstance(d, list):
+        return [serialize_dataframe_dict(v) for v in d]
+    return convert_to_serializable(d)
+
+
+def _datetime_strings(values):
+    """ISO strings of a datetime64 array, formatted like ``Timestamp.isoformat``; NaT becomes None."""
+    strings = np.datetime_as_string(values, unit="s").astype(object)
+    # Microseconds and nanoseconds only where they are non-zero, as isoformat does
+    for coarse, fine in (("s", "us"), ("us", "ns")):
+        finer = values != values.astype(f"datetime64[{coarse}]")
+        if finer.any():
+            strings[finer] = np.datetime_as_string(values[finer], unit=fine)
+    strings[np.isnat(values)] = None
+    return strings.tolist()
+
+
+def column_values(series):
+    """JSON-ready values of one column, converted as a whole.
+
+    Returns a NumPy array where the encoder takes it as it is (NaN in float
+    columns encodes as null) and a list otherwise.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is not None:
+            return [convert_to_serializable(value) for value in series]
+        return _datetime_strings(series.to_numpy())
+    values = series.to_numpy()
+    if values.dtype.kind in NATIVE_KINDS:
+        if values.dtype == np.float16:
+            values = values.astype(np.float32)
+        return np.ascontiguousarray(values)
+    values = values.astype(object)
+    values[pd.isna(values)] = None
+    # NumPy scalars and timestamps left in the list are handled by the encoder
+    return values.tolist()
+
+
+def frame_columns(frame):
+    """``{column: values}`` of a DataFrame, like ``to_dict(orient='list')``, column by column."""
+    return {name: column_values(frame.iloc[:, i]) for i, name in enumerate(frame.columns)}
+
+
+def frame_records(frame):
+    """JSON-ready ``to_dict(orient='records')`` of a (small) DataFrame."""
+    columns = [_to_list(values) for values in frame_columns(frame).values()]
+    return [dict(zip(frame.columns, row)) for row in zip(*columns)]
+
+
+def _to_list(values):
+    if not isinstance(values, np.ndarray):
+        return values
+    if values.dtype.kind == "f":
+        # NaN and inf are not valid JSON numbers
+        return np.where(np.isfinite(values), values, None).tolist()
+    return values.tolist()
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return _to_list(obj)
+    if isinstance(obj, np.generic):
+        return _to_list(np.asarray(obj))
+    if isinstance(obj, (pd.Timestamp, datetime)):
+        return obj.isoformat()
+    if pd.api.types.is_scalar(obj) and pd.isna(obj):
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Encode ``obj`` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def join_encoded(fields):
+    """The JSON object with the given ``{key: encoded value}`` pairs, as bytes."""
+    return b"{" + b",".join(dumps(str(key)) + b":" + value for key, value in fields.items()) + b"}"
+
+
+def encode_sections(analysis):
+    """``{section: encoded value}`` of an analysis dict."""
+    return {name: dumps(value) for name, value in analysis.items()}
@@ -0,0 +1,206 @@
+"""Fixed-memory sketches behind the approximate analysis mode.
+
+Every sketch takes NumPy/pandas batches (one CSV chunk at a time), uses
+memory independent of the number of rows, and reports its own error bound:
+
+* ``HyperLogLog``: distinct counts, relative standard error 1.04 / sqrt(2**p).
+* ``MisraGries``: top-k frequent values. Each count is low by at most
+  ``error`` (<= n / (k + 1)), and every value more frequent than that is kept.
+* ``KLLSketch``: quantiles and ranks. The rank of a returned quantile is
+  within ``rank_error * n`` of the requested one with 99% confidence.
+* ``DuplicateSketch``: duplicate rows from an adaptive hash sample of rows
+  (distinct sampling). All copies of a row share a hash, so a row is either
+  fully in the sample or not; the estimate is scaled by the sampling rate.
+"""
+import numpy as np
+import pandas as pd
+
+from config import (
+    SKETCH_DUPLICATE_HASHES,
+    SKETCH_HLL_PRECISION,
+    SKETCH_QUANTILE_K,
+    SKETCH_TOP_K,
+)
+
+# z-score of the two-sided 99% intervals reported by the sketches.
+Z_99 = 2.576
+
+
+def value_hashes(values):
+    """64-bit hashes of a Series (or DataFrame rows), missing values dropped."""
+    if isinstance(values, pd.Series):
+        values = values.dropna()
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def _bit_length(values):
+    """Number of significant bits of each uint64 in ``values``."""
+    values = values.copy()
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = values >= np.uint64(1 << shift)
+        length[wide] += shift
+        values[wide] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+class HyperLogLog:
+    def __init__(self, precision=SKETCH_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        """Relative standard error of ``estimate()``."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        rank = (width + 1 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+
+class MisraGries:
+    def __init__(self, capacity=SKETCH_TOP_K):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64")
+        self.error = 0
+
+    def update(self, counts):
+        """Fold the exact value counts of one chunk into the summary."""
+        merged = self.counts.add(counts, fill_value=0)
+        if len(merged) > self.capacity:
+            values = merged.to_numpy()
+            # Subtract the (k+1)-th largest count so at most k counters stay positive
+            cut = np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1]
+            merged = merged[merged > cut] - cut
+            self.error += int(cut)
+        self.counts = merged.astype("int64")
+
+    def top(self):
+        """Estimated counts, largest first; each is at most ``error`` below the true count."""
+        return self.counts.sort_values(ascending=False, kind="stable")
+
+
+class KLLSketch:
+    def __init__(self, k=SKETCH_QUANTILE_K, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        """Normalized rank error at 99% confidence (the DataSketches KLL bound)."""
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                self._compact(level)
+                level = 0
+            else:
+                level += 1
+
+    def _compact(self, level):
+        # Keep every other item of the sorted level (at a random offset) at
+        # twice the weight; an odd item out stays behind.
+        items = np.sort(self.levels[level])
+        leftover = items[:len(items) % 2]
+        items = items[len(items) % 2:]
+        promoted = items[self._rng.integers(2)::2]
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        self.levels[level] = leftover
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 1 << level, dtype=np.int64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Approximate quantiles; NaN when the sketch is empty."""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        items, cumulative = self._weighted()
+        total = cumulative[-1]
+        positions = np.searchsorted(cumulative, np.maximum(qs * total, 1), side="left")
+        return items[np.minimum(positions, len(items) - 1)]
+
+    def rank(self, value, inclusive=False):
+        """Approximate number of values below ``value`` (or at most ``value`` if ``inclusive``)."""
+        if not self.count:
+            return 0
+        items, cumulative = self._weighted()
+        position = np.searchsorted(items, value, side="right" if inclusive else "left")
+        if position == 0:
+            return 0
+        # Scale the sketch's total weight back to the exact count
+        return int(round(cumulative[position - 1] * self.count / cumulative[-1]))
+
+
+class DuplicateSketch:
+    def __init__(self, capacity=SKETCH_DUPLICATE_HASHES):
+        self.capacity = capacity
+        self.level = 0
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    @property
+    def rate(self):
+        """Fraction of distinct rows kept in the sample."""
+        return 2.0 ** -self.level
+
+    def _sampled(self, hashes):
+        if self.level == 0:
+            return np.ones(len(hashes), dtype=bool)
+        return (hashes >> np.uint64(64 - self.level)) == 0
+
+    def update(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        hashes = hashes[self._sampled(hashes)]
+        combined = np.concatenate([self.hashes, hashes])
+        weights = np.concatenate([self.counts, np.ones(len(hashes), dtype=np.int64)])
+        self.hashes, inverse = np.unique(combined, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=weights).astype(np.int64)
+        while len(self.hashes) > self.capacity:
+            self.level += 1
+            keep = self._sampled(self.hashes)
+            self.hashes, self.counts = self.hashes[keep], self.counts[keep]
+
+    def estimate(self):
+        """Return ``(duplicate_rows, plus_minus)``; the interval is 99%."""
+        extra = self.counts - 1
+        estimate = extra.sum() / self.rate
+        variance = np.sum(extra.astype(np.float64) ** 2) * (1 - self.rate) / self.rate ** 2
+        return int(round(estimate)), int(np.ceil(Z_99 * np.sqrt(variance)))
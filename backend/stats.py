@@ -0,0 +1,190 @@
+"""Numeric column statistics computed for all columns of a 2D array at once.
+
+``numeric_summary`` replaces the per-column ``describe()``, ``quantile``,
+``median``, ``skew``, ``kurtosis`` and outlier-mask calls of the in-memory
+path. It sorts the numeric columns once (NaN sorts last) and reads every
+statistic from the sorted array: counts and quantiles by position,
+moments by blocked sums, and IQR outliers with two binary searches per column.
+
+The moment helpers are shared with the streaming path, which merges them
+chunk by chunk.
+"""
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from analysis import iqr_bounds
+
+# Rows per block when accumulating moments in ``numeric_summary``.
+MOMENT_BLOCK_ROWS = 65536
+
+
+def moments(values):
+    """Per-column count, mean and central moment sums of a 2D float array."""
+    mask = ~np.isnan(values)
+    count = mask.sum(axis=0).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(mask, values, 0.0).sum(axis=0) / count
+    mean = np.where(count > 0, mean, 0.0)
+    dev = np.where(mask, values - mean, 0.0)
+    dev2 = dev * dev
+    m2 = dev2.sum(axis=0)
+    m3 = (dev2 * dev).sum(axis=0)
+    m4 = (dev2 * dev2).sum(axis=0)
+    minimum = np.where(mask, values, np.inf).min(axis=0)
+    maximum = np.where(mask, values, -np.inf).max(axis=0)
+    return count, mean, m2, m3, m4, minimum, maximum
+
+
+def merge_moments(a, b):
+    """Combine two moment sets (Chan et al. / Pebay pairwise update)."""
+    na, mean_a, m2a, m3a, m4a, min_a, max_a = a
+    nb, mean_b, m2b, m3b, m4b, min_b, max_b = b
+    n = na + nb
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = mean_b - mean_a
+        mean = np.where(n > 0, mean_a + delta * nb / n, 0.0)
+        m2 = m2a + m2b + delta ** 2 * na * nb / n
+        m3 = (m3a + m3b + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * m2b - nb * m2a) / n)
+        m4 = (m4a + m4b + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n ** 3
+              + 6 * delta ** 2 * (na ** 2 * m2b + nb ** 2 * m2a) / n ** 2
+              + 4 * delta * (na * m3b - nb * m3a) / n)
+    empty = n == 0
+    m2, m3, m4 = (np.where(empty, 0.0, m) for m in (m2, m3, m4))
+    return n, mean, m2, m3, m4, np.minimum(min_a, min_b), np.maximum(max_a, max_b)
+
+
+def skewness(count, m2, m3):
+    """Bias-corrected sample skewness per column, matching ``Series.skew``."""
+    count, m2, m3 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (count, m2, m3)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = (count * (count - 1) ** 0.5 / (count - 2)) * (m3 / m2 ** 1.5)
+    result = np.where(m2 == 0, 0.0, result)
+    return np.where(count < 3, np.nan, result)
+
+
+def kurtosis(count, m2, m4):
+    """Bias-corrected excess kurtosis per column, matching ``Series.kurtosis``."""
+    count, m2, m4 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (count, m2, m4)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominator = (count - 2) * (count - 3) * m2 ** 2
+        adj = (3 * (count - 1) ** 2) / ((count - 2) * (count - 3))
+        result = count * (count + 1) * (count - 1) * m4 / denominator - adj
+    result = np.where(denominator == 0, 0.0, result)
+    return np.where(count < 4, np.nan, result)
+
+
+def _sorted_quantile(ordered, count, q):
+    """Linear-interpolation quantile (pandas' default) of sorted columns with NaN last."""
+    if not ordered.shape[0]:
+        return np.full(ordered.shape[1], np.nan)
+    position = np.maximum(count - 1, 0) * q
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, np.maximum(count - 1, 0).astype(np.int64))
+    columns = np.arange(ordered.shape[1])
+    low, high = ordered[below, columns], ordered[above, columns]
+    result = low + (high - low) * (position - below)
+    return np.where(count > 0, result, np.nan)
+
+
+@dataclass
+class NumericSummary:
+    """Per-column statistics of a 2D float array; every field is a 1D array."""
+    count: np.ndarray
+    null_count: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    min: np.ndarray
+    q1: np.ndarray
+    median: np.ndarray
+    q3: np.ndarray
+    max: np.ndarray
+    skew: np.ndarray
+    kurtosis: np.ndarray
+    outliers: np.ndarray
+
+    @classmethod
+    def concat(cls, parts):
+        """Join the summaries of consecutive column blocks into one."""
+        return cls(**{f.name: np.concatenate([getattr(part, f.name) for part in parts]) for f in fields(cls)})
+
+    def describe(self, columns):
+        """The ``DataFrame.describe()`` layout: ``{column: {statistic: value}}``."""
+        fields = [('count', self.count), ('mean', self.mean), ('std', self.std), ('min', self.min),
+                  ('25%', self.q1), ('50%', self.median), ('75%', self.q3), ('max', self.max)]
+        return {
+            col: {name: values[i] for name, values in fields}
+            for i, col in enumerate(columns)
+        }
+
+
+def numeric_summary(values, overwrite=False):
+    """Compute a ``NumericSummary`` of every column of ``values`` (rows x columns, NaN = missing).
+
+    With ``overwrite`` a float64 ``values`` array is sorted in place instead of
+    copied; its rows are then no longer in their original order.
+    """
+    if overwrite and isinstance(values, np.ndarray) and values.dtype == np.float64:
+        ordered = values
+        ordered.sort(axis=0)
+    else:
+        ordered = np.sort(np.asarray(values, dtype=np.float64), axis=0)
+    rows = ordered.shape[0]
+    # NaN sorts last, so each column's count is the position of its first NaN
+    count = np.array([np.searchsorted(ordered[:, j], np.nan) for j in range(ordered.shape[1])],
+                     dtype=np.int64)
+    float_count = count.astype(float)
+
+    # Central moments over the valid prefix of each sorted column, in row
+    # blocks so the deviation temporaries stay small
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.zeros(ordered.shape[1])
+        for start in range(0, rows, MOMENT_BLOCK_ROWS):
+            block = ordered[start:start + MOMENT_BLOCK_ROWS]
+            mean += np.nansum(block, axis=0)
+        mean /= float_count
+        m2, m3, m4 = (np.zeros(ordered.shape[1]) for _ in range(3))
+        for start in range(0, rows, MOMENT_BLOCK_ROWS):
+            dev = ordered[start:start + MOMENT_BLOCK_ROWS] - mean
+            np.copyto(dev, 0.0, where=np.isnan(dev))
+            dev2 = dev * dev
+            m2 += dev2.sum(axis=0)
+            m3 += np.einsum("ij,ij->j", dev2, dev)
+            m4 += np.einsum("ij,ij->j", dev2, dev2)
+        std = np.where(count > 1, np.sqrt(m2 / (float_count - 1)), np.nan)
+    mean = np.where(count > 0, mean, np.nan)
+
+    columns = np.arange(ordered.shape[1])
+    has_values = count > 0
+    last = np.maximum(count - 1, 0)
+    minimum = np.where(has_values, ordered[0, columns] if rows else np.nan, np.nan)
+    maximum = np.where(has_values, ordered[last, columns] if rows else np.nan, np.nan)
+
+    q1 = _sorted_quantile(ordered, float_count, 0.25)
+    median = _sorted_quantile(ordered, float_count, 0.5)
+    q3 = _sorted_quantile(ordered, float_count, 0.75)
+
+    # Values outside the Tukey fences: everything before the lower fence plus
+    # everything after the upper fence in each sorted column
+    lower, upper = iqr_bounds(q1, q3)
+    outliers = np.zeros(len(columns), dtype=np.int64)
+    for j in np.flatnonzero(has_values):
+        column = ordered[:count[j], j]
+        outliers[j] = (np.searchsorted(column, lower[j], side="left")
+                       + count[j] - np.searchsorted(column, upper[j], side="right"))
+
+    return NumericSummary(
+        count=float_count,
+        null_count=rows - count,
+        mean=mean,
+        std=std,
+        min=minimum,
+        q1=q1,
+        median=median,
+        q3=q3,
+        max=maximum,
+        skew=skewness(float_count, m2, m3),
+        kurtosis=kurtosis(float_count, m2, m4),
+        outliers=outliers,
+    )
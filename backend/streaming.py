@@ -0,0 +1,665 @@
+"""Chunked CSV ingestion for /upload-file/.
+
+The upload is spooled to a temporary file and parsed with
+``pd.read_csv(chunksize=...)``. Every statistic the endpoint reports is
+accumulated chunk by chunk, so peak memory is governed by the chunk size, the
+row sample, the number of distinct values tracked per column and the number
+of distinct row hashes kept for duplicates (``STREAM_MAX_ROW_HASHES``) instead
+of by the size of the file.
+
+``SketchAnalysis`` (``approximate=True``) replaces the per-column value
+counts, the row hashes and the sample quantiles with the fixed-size sketches
+of ``sketches.py``, so memory stays bounded however many rows or distinct
+values the file has.
+
+A finished analysis is picklable. ``analyze_csv_stream(base=...)`` resumes
+one on a file that extends the analysed file with more rows, reading only the
+new rows.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from analysis import (
+    build_dataset_info,
+    build_recommendations,
+    categorical_insights,
+    category_distribution,
+    correlation_groups,
+    correlation_insights,
+    iqr_bounds,
+    numeric_insights,
+    strong_correlation_pairs,
+    summary_insight,
+)
+from config import (
+    CSV_CHUNK_ROWS,
+    STREAM_MAX_DISTINCT,
+    STREAM_MAX_ROW_HASHES,
+    STREAM_SAMPLE_ROWS,
+    UPLOAD_CHUNK_BYTES,
+)
+from kde import distribution_peaks
+from parallel import map_columns
+from serialization import frame_records, serialize_dataframe_dict
+from sketches import Z_99, DuplicateSketch, HyperLogLog, KLLSketch, MisraGries, value_hashes
+from stats import kurtosis, merge_moments, moments, skewness
+from type_inference import infer_column_kinds, is_categorical
+
+logger = logging.getLogger(__name__)
+
+
+async def spool_upload(file, suffix="", chunk_size=UPLOAD_CHUNK_BYTES):
+    """Copy an ``UploadFile`` to a named temporary file in fixed-size reads.
+
+    Returns ``(path, size, sha256_hex)``. The caller owns the file and must
+    remove it.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, size, digest.hexdigest()
+
+
+def extends_file(path, prefix_size, prefix_sha256, chunk_size=UPLOAD_CHUNK_BYTES):
+    """Whether the file at ``path`` is the file with SHA-256 ``prefix_sha256`` plus more rows.
+
+    The first ``prefix_size`` bytes must match the hash and end on a line
+    break, or be followed by one, so no row of the earlier file was extended.
+    """
+    digest = hashlib.sha256()
+    remaining = prefix_size
+    last = b"\n"
+    with open(path, "rb") as f:
+        while remaining:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return False
+            digest.update(chunk)
+            remaining -= len(chunk)
+            last = chunk[-1:]
+        following = f.read(1)
+    if digest.hexdigest() != prefix_sha256:
+        return False
+    return last in (b"\n", b"\r") or following in (b"", b"\n", b"\r")
+
+
+class StreamingAnalysis:
+    """Accumulates the /upload-file/ statistics over a sequence of DataFrame chunks.
+
+    Numeric moments and pairwise correlation sums are merged exactly. Value
+    counts are exact until a column exceeds ``max_distinct`` values; its
+    distinct values are then estimated with a ``HyperLogLog``. Duplicate
+    detection keeps one 64-bit hash per distinct row up to ``max_row_hashes``
+    rows, then estimates further duplicates from a ``DuplicateSketch``.
+    Quantiles, the KDE and ``raw_data`` come from a uniform bottom-k row sample
+    of ``sample_rows`` rows, so the quartiles (and the outlier fences drawn
+    from them) are estimates once the file has more rows. ``error_bounds()``
+    reports the accuracy of every estimate.
+    """
+
+    # Whether outliers need a second pass over the file with ``count_outliers``
+    needs_outlier_pass = True
+
+    def __init__(self, schema, sample_rows=STREAM_SAMPLE_ROWS,
+                 max_distinct=STREAM_MAX_DISTINCT, max_row_hashes=STREAM_MAX_ROW_HASHES, seed=0):
+        self.schema = schema
+        self.columns = list(schema.columns)
+        self.numeric_cols = list(schema.numeric_cols)
+        self.date_cols = list(schema.date_cols)
+        self.other_cols = list(schema.other_cols)
+        self.sample_rows = sample_rows
+        self.max_distinct = max_distinct
+        self.max_row_hashes = max_row_hashes
+
+        self.total_rows = 0
+        self.head = None
+        self.dtypes = None
+        self.null_counts = np.zeros(len(self.columns), dtype=np.int64)
+
+        p = len(self.numeric_cols)
+        self.moments = (np.zeros(p), np.zeros(p), np.zeros(p), np.zeros(p), np.zeros(p),
+                        np.full(p, np.inf), np.full(p, -np.inf))
+        # Pairwise-complete sums for Pearson correlation, on values shifted by
+        # the first chunk's means to avoid cancellation.
+        self.shift = None
+        self.pair_n = np.zeros((p, p))
+        self.pair_sx = np.zeros((p, p))
+        self.pair_sxx = np.zeros((p, p))
+        self.pair_sxy = np.zeros((p, p))
+        self.outlier_counts = np.zeros(p, dtype=np.int64)
+
+        self.value_counts = {col: pd.Series(dtype="int64") for col in self.date_cols + self.other_cols}
+        # Distinct-value sketches of the columns whose counts were dropped
+        self.distinct = {}
+        self.date_min = {col: pd.NaT for col in self.date_cols}
+        self.date_max = {col: pd.NaT for col in self.date_cols}
+
+        self._hashes = []
+        self._pending_hashes = 0
+        # Set once there are too many distinct rows to hash them all
+        self.rows = None
+        self.counted_duplicates = 0
+        self._rng = np.random.default_rng(seed)
+        self._sample = None
+        self._sample_keys = None
+
+    def coerce(self, chunk):
+        """Apply the schema inferred on the first chunk to a later chunk."""
+        chunk.columns = chunk.columns.str.strip()
+        return self.schema.apply(chunk)
+
+    def update(self, chunk):
+        """Fold one coerced chunk into the running statistics."""
+        n = len(chunk)
+        if n == 0:
+            return
+        start = self.total_rows
+        chunk.index = pd.RangeIndex(start, start + n)
+        if self.head is None:
+            self.head = chunk.head()
+            self.dtypes = chunk.dtypes.astype(str).to_dict()
+        self.total_rows += n
+        self.null_counts += chunk.isnull().sum().to_numpy(dtype=np.int64)
+
+        if self.numeric_cols:
+            values = chunk[self.numeric_cols].to_numpy(dtype=float)
+            self.moments = merge_moments(self.moments, moments(values))
+            self._update_correlation(values)
+
+        self._update_values(chunk)
+        for col in self.date_cols:
+            self.date_min[col] = _combine(min, self.date_min[col], chunk[col].min())
+            self.date_max[col] = _combine(max, self.date_max[col], chunk[col].max())
+        self._update_rows(chunk)
+        self._update_sample(chunk)
+
+    def _update_values(self, chunk):
+        def merge(col):
+            if col in self.distinct:
+                self.distinct[col].add(value_hashes(chunk[col]))
+                return None, None
+            merged = self.value_counts[col].add(chunk[col].value_counts(dropna=True), fill_value=0)
+            if len(merged) <= self.max_distinct:
+                return merged, None
+            # Too many values to count; the sketch starts from every value seen
+            sketch = HyperLogLog()
+            sketch.add(value_hashes(pd.Series(merged.index)))
+            return None, sketch
+
+        cols = list(self.value_counts)
+        for col, (merged, sketch) in zip(cols, map_columns(merge, cols)):
+            self.value_counts[col] = merged
+            if sketch is not None:
+                self.distinct[col] = sketch
+
+    def _update_rows(self, chunk):
+        hashes = value_hashes(chunk)
+        if self.rows is not None:
+            self.rows.update(hashes)
+            return
+        self._hashes.append(hashes)
+        self._pending_hashes += len(chunk)
+        if self._pending_hashes >= 10 * CSV_CHUNK_ROWS:
+            self._hashes = [np.unique(np.concatenate(self._hashes))]
+            self._pending_hashes = 0
+            if len(self._hashes[0]) > self.max_row_hashes:
+                # The duplicates so far are known exactly; later rows go into a
+                # hash sample seeded with every distinct row seen, so their
+                # duplicates of earlier rows are found as well
+                self.counted_duplicates = self.total_rows - len(self._hashes[0])
+                self.rows = DuplicateSketch()
+                self.rows.update(self._hashes[0])
+                self._hashes = []
+
+    def _update_correlation(self, values):
+        mask = ~np.isnan(values)
+        if self.shift is None:
+            self.shift = np.nan_to_num(self.moments[1])
+        centered = np.where(mask, values - self.shift, 0.0)
+        present = mask.astype(float)
+        self.pair_n += present.T @ present
+        self.pair_sx += centered.T @ present
+        self.pair_sxx += (centered * centered).T @ present
+        self.pair_sxy += centered.T @ centered
+
+    def _update_sample(self, chunk):
+        # Bottom-k sampling: every row draws a uniform key and the rows with the
+        # smallest keys seen so far form the sample.
+        keys = self._rng.random(len(chunk))
+        if self._sample is not None:
+            if len(self._sample) >= self.sample_rows:
+                keep = keys < self._sample_keys.max()
+                chunk, keys = chunk[keep], keys[keep]
+            candidates = pd.concat([self._sample, chunk])
+            keys = np.concatenate([self._sample_keys, keys])
+        else:
+            candidates = chunk
+        if len(candidates) > self.sample_rows:
+            keep = np.argpartition(keys, self.sample_rows - 1)[:self.sample_rows]
+            candidates, keys = candidates.iloc[keep], keys[keep]
+        self._sample, self._sample_keys = candidates, keys
+
+    @property
+    def sample(self):
+        return self._sample.sort_index() if self._sample is not None else None
+
+    def quantiles(self):
+        """Sample estimates of the 25th, 50th and 75th percentiles per numeric column."""
+        return self.sample[self.numeric_cols].quantile([0.25, 0.5, 0.75])
+
+    def outliers(self):
+        """Number of values outside the IQR fences per numeric column."""
+        return self.outlier_counts
+
+    def count_outliers(self, chunk, lower, upper):
+        """Second pass: count values outside the IQR fences in one chunk."""
+        chunk.columns = chunk.columns.str.strip()
+        values = chunk[self.numeric_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        self.outlier_counts += ((values < lower) | (values > upper)).sum(axis=0)
+
+    def correlation_matrix(self):
+        n, sx, sxx, sxy = self.pair_n, self.pair_sx, self.pair_sxx, self.pair_sxy
+        sy, syy = sx.T, sxx.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sxy - sx * sy / n
+            var_x = sxx - sx * sx / n
+            var_y = syy - sy * sy / n
+            corr = cov / np.sqrt(var_x * var_y)
+        return np.clip(corr, -1.0, 1.0)
+
+    def duplicate_rows(self):
+        if self.rows is not None:
+            return self.counted_duplicates + self.rows.estimate()[0]
+        if not self._hashes:
+            return 0
+        return self.total_rows - len(np.unique(np.concatenate(self._hashes)))
+
+    def distinct_count(self, col):
+        """Distinct non-null values of a text or date column, or None if not tracked."""
+        counts = self.value_counts[col]
+        return len(counts) if counts is not None else None
+
+    def estimated_distinct(self, col):
+        """HyperLogLog estimate of the distinct non-null values of a text or date column."""
+        # The estimate can never exceed the number of non-null values
+        return min(int(round(self.distinct[col].estimate())), self.non_null(col))
+
+    def non_null(self, col):
+        return int(self.total_rows - self.null_counts[self.columns.index(col)])
+
+    def top_counts(self, col):
+        """Counts of a column's values, largest first."""
+        return self.value_counts[col].astype("int64").sort_values(ascending=False, kind="stable")
+
+    def rare_categories(self, col):
+        """``rare`` argument of ``categorical_insights``; None when ``top_counts`` is complete."""
+        return None
+
+    def error_bounds(self):
+        """Accuracy of the estimated statistics, or None when they are exact.
+
+        Laid out like ``SketchAnalysis.error_bounds`` but lists only what was
+        estimated: ``quartile_rank`` of the numeric columns when the row sample
+        is smaller than the file, a 99% (Dvoretzky-Kiefer-Wolfowitz) bound in
+        rows, ``unique`` of the date columns with more than ``max_distinct``
+        values, and ``duplicate_rows`` once duplicates are estimated past
+        ``max_row_hashes``. Outliers are counted exactly against the reported
+        fences.
+        """
+        bounds = {}
+        if self.rows is not None:
+            bounds["duplicate_rows"] = self.rows.estimate()[1]
+        columns = {}
+        if self.numeric_cols and self._sample is not None and len(self._sample) < self.total_rows:
+            sampled = self._sample[self.numeric_cols].notna().sum().to_numpy()
+            count = self.moments[0]
+            for i, col in enumerate(self.numeric_cols):
+                if sampled[i]:
+                    rank_error = np.sqrt(np.log(2 / 0.01) / (2 * sampled[i])) * count[i]
+                    columns[col] = {"quartile_rank": int(np.ceil(rank_error))}
+        for col in self.date_cols:
+            if col in self.distinct:
+                columns[col] = {"unique": int(np.ceil(
+                    Z_99 * self.distinct[col].relative_error * self.estimated_distinct(col)
+                ))}
+        if not columns and not bounds:
+            return None
+        return {"method": "sample", "confidence": 0.99, **bounds, "columns": columns}
+
+    def report(self):
+        """Return ``(response_data, head_data, dtypes_data, sample)``.
+
+        ``response_data`` is the /upload-file/ payload without ``raw_data``;
+        ``sample`` is the row sample that stands in for it.
+        """
+        total_rows, total_cols = self.total_rows, len(self.columns)
+        null_counts = dict(zip(self.columns, self.null_counts.tolist()))
+        missing_values = int(self.null_counts.sum())
+        missing_percentage = (missing_values / (total_rows * total_cols)) * 100
+        duplicate_rows = self.duplicate_rows()
+
+        categorical_cols = []
+        for col in self.other_cols:
+            distinct = self.distinct_count(col)
+            if distinct is not None and is_categorical(distinct, total_rows):
+                categorical_cols.append(col)
+        self.schema.categorical_cols = categorical_cols
+
+        count, mean, m2, m3, m4, minimum, maximum = self.moments
+        quantiles = self.quantiles() if self.numeric_cols else None
+        numeric_describe = {}
+        for i, col in enumerate(self.numeric_cols):
+            numeric_describe[col] = {
+                'count': count[i],
+                'mean': mean[i] if count[i] else np.nan,
+                'std': np.sqrt(m2[i] / (count[i] - 1)) if count[i] > 1 else np.nan,
+                'min': minimum[i] if count[i] else np.nan,
+                '25%': quantiles[col].iloc[0],
+                '50%': quantiles[col].iloc[1],
+                '75%': quantiles[col].iloc[2],
+                'max': maximum[i] if count[i] else np.nan,
+            }
+
+        categorical_describe = {}
+        sorted_counts = {}
+        categorical_distributions = {}
+        categorical_other_counts = {}
+        for col in categorical_cols:
+            counts = self.top_counts(col)
+            sorted_counts[col] = counts
+            distribution, other_rows = category_distribution(counts, total_rows - null_counts[col])
+            categorical_distributions[col] = serialize_dataframe_dict(distribution)
+            if other_rows:
+                categorical_other_counts[col] = other_rows
+            categorical_describe[col] = {
+                'count': int(total_rows - null_counts[col]),
+                'unique': int(self.distinct_count(col)),
+                'top': str(counts.index[0]) if not counts.empty else None,
+                'freq': int(counts.iloc[0]) if not counts.empty else 0,
+                'null_count': int(null_counts[col])
+            }
+
+        date_describe = {}
+        for col in self.date_cols:
+            distinct = self.distinct_count(col)
+            if distinct is None:
+                distinct = self.estimated_distinct(col)
+            date_describe[col] = {
+                'min': self.date_min[col].isoformat() if pd.notnull(self.date_min[col]) else None,
+                'max': self.date_max[col].isoformat() if pd.notnull(self.date_max[col]) else None,
+                'unique': int(distinct),
+                'null_count': int(null_counts[col])
+            }
+
+        describe_data = serialize_dataframe_dict({**numeric_describe, **categorical_describe})
+        describe_data.update(date_describe)
+
+        peaks = [None] * len(self.numeric_cols)
+        if self.numeric_cols:
+            try:
+                peaks = distribution_peaks(
+                    self.sample[self.numeric_cols].to_numpy(dtype=float, na_value=np.nan)
+                )
+            except Exception as e:
+                logger.warning("Error in multi-modal analysis: %s", e)
+
+        skew, kurt = skewness(count, m2, m3), kurtosis(count, m2, m4)
+        outliers = self.outliers() if self.numeric_cols else None
+        insights = []
+        for i, col in enumerate(self.numeric_cols):
+            if not count[i]:
+                continue
+            q1, median, q3 = quantiles[col].tolist()
+            insights.extend(numeric_insights(
+                col, total_rows, q1, q3, median, skew[i], kurt[i],
+                int(outliers[i]), peaks[i],
+            ))
+
+        for col in categorical_cols:
+            insights.extend(categorical_insights(col, sorted_counts[col], total_rows,
+                                                 self.rare_categories(col)))
+
+        strong_correlations = []
+        multicollinear = []
+        if len(self.numeric_cols) >= 2:
+            strong_correlations = strong_correlation_pairs(self.correlation_matrix(), self.numeric_cols)
+            multicollinear = correlation_groups(self.numeric_cols, strong_correlations)
+            insights.extend(correlation_insights(strong_correlations, multicollinear))
+
+        insights.append(summary_insight(
+            len(self.numeric_cols), len(categorical_cols), len(strong_correlations),
+            total_rows, missing_percentage,
+        ))
+        recommendations = build_recommendations(
+            total_rows, missing_values, missing_percentage, duplicate_rows, bool(strong_correlations),
+        )
+
+        sample = self.sample
+        dataset_info = build_dataset_info(
+            total_rows, total_cols, missing_values, missing_percentage, duplicate_rows,
+            len(self.numeric_cols), len(categorical_cols), len(self.date_cols),
+        )
+        dataset_info["raw_data_rows"] = len(sample)
+        # raw_data is a row sample; totals must come from the aggregates, not from it
+        dataset_info["raw_data_sampled"] = len(sample) < total_rows
+
+        response_data = {
+            "dataset_info": dataset_info,
+            "describe": describe_data,
+            "null_counts": null_counts,
+            "insights": insights,
+            "recommendations": recommendations,
+            "categorical_distributions": categorical_distributions,
+            "categorical_other_counts": categorical_other_counts,
+            "multicollinearity_groups": multicollinear,
+        }
+        error_bounds = self.error_bounds()
+        if error_bounds is not None:
+            response_data["error_bounds"] = error_bounds
+        head_data = frame_records(self.head)
+        return response_data, head_data, self.dtypes, sample
+
+
+class SketchAnalysis(StreamingAnalysis):
+    """``StreamingAnalysis`` with fixed-memory sketches for the unbounded statistics.
+
+    Text and date columns keep a HyperLogLog (distinct count) and a
+    Misra-Gries summary (top values) instead of exact value counts; numeric
+    columns keep a KLL sketch for quartiles and outlier counts, so no second
+    pass over the file is needed; duplicate rows come from a hash sample of
+    rows. Counts, means, standard deviations, skewness, kurtosis, extremes,
+    null counts and correlations stay exact. ``error_bounds()`` reports the
+    accuracy of every estimate.
+    """
+
+    needs_outlier_pass = False
+
+    def __init__(self, schema, sample_rows=STREAM_SAMPLE_ROWS, seed=0):
+        super().__init__(schema, sample_rows=sample_rows, seed=seed)
+        text_cols = self.date_cols + self.other_cols
+        self.value_counts = {}
+        self.distinct = {col: HyperLogLog() for col in text_cols}
+        self.frequent = {col: MisraGries() for col in text_cols}
+        self.quantile_sketches = [KLLSketch(seed=seed + i) for i in range(len(self.numeric_cols))]
+        self.rows = DuplicateSketch()
+
+    def _update_values(self, chunk):
+        # Every column has its own sketches, so columns update in parallel
+        def update_text(col):
+            self.distinct[col].add(value_hashes(chunk[col]))
+            self.frequent[col].update(chunk[col].value_counts(dropna=True))
+
+        def update_numeric(i):
+            self.quantile_sketches[i].update(chunk[self.numeric_cols[i]].to_numpy(dtype=float, na_value=np.nan))
+
+        map_columns(update_text, self.distinct)
+        map_columns(update_numeric, range(len(self.numeric_cols)))
+
+    def _update_rows(self, chunk):
+        self.rows.update(value_hashes(chunk))
+
+    def quantiles(self):
+        return pd.DataFrame(
+            {col: sketch.quantiles([0.25, 0.5, 0.75])
+             for col, sketch in zip(self.numeric_cols, self.quantile_sketches)},
+            index=[0.25, 0.5, 0.75],
+        )
+
+    def outliers(self):
+        q = self.quantiles()
+        lower, upper = iqr_bounds(q.iloc[0].to_numpy(), q.iloc[2].to_numpy())
+        return np.array([
+            sketch.rank(lower[i]) + sketch.count - sketch.rank(upper[i], inclusive=True)
+            for i, sketch in enumerate(self.quantile_sketches)
+        ], dtype=np.int64)
+
+    def duplicate_rows(self):
+        return self.rows.estimate()[0]
+
+    def distinct_count(self, col):
+        return self.estimated_distinct(col)
+
+    def top_counts(self, col):
+        return self.frequent[col].top()
+
+    def rare_categories(self, col):
+        # Every value above the Misra-Gries error is in the summary, so with a
+        # small enough error the frequent categories are all known and the
+        # rest of the distinct values are rare.
+        counts = self.frequent[col].top()
+        frequent = counts[counts / self.total_rows >= 0.05]
+        return (max(self.distinct_count(col) - len(frequent), 0),
+                self.non_null(col) - int(frequent.sum()))
+
+    def error_bounds(self):
+        """Accuracy of each estimate, as row counts unless stated otherwise.
+
+        ``unique`` and ``duplicate_rows`` are 99% intervals, ``quartile_rank``
+        bounds how far (in rows) the rank of each reported quartile may be from
+        the true one with 99% confidence, ``outliers`` bounds the count of
+        values outside the reported fences (the fences themselves move with
+        the quartiles), and
+        ``freq`` is the deterministic Misra-Gries bound: a reported count is at
+        most that much below the true count.
+        """
+        _, duplicate_error = self.rows.estimate()
+        columns = {}
+        for col, sketch in zip(self.numeric_cols, self.quantile_sketches):
+            rank_error = int(np.ceil(sketch.rank_error * sketch.count))
+            columns[col] = {"quartile_rank": rank_error, "outliers": 2 * rank_error}
+        for col, sketch in self.distinct.items():
+            columns[col] = {
+                "unique": int(np.ceil(Z_99 * sketch.relative_error * self.distinct_count(col))),
+                "freq": int(self.frequent[col].error),
+            }
+        return {
+            "method": "sketch",
+            "confidence": 0.99,
+            "duplicate_rows": duplicate_error,
+            "columns": columns,
+        }
+
+
+def _combine(func, current, value):
+    """Apply ``min``/``max`` to two timestamps, ignoring NaT."""
+    if pd.isnull(current):
+        return value
+    if pd.isnull(value):
+        return current
+    return func(current, value)
+
+
+def _start_analysis(path, chunk_rows, approximate):
+    """Infer the schema from the first chunk and return an empty analysis for it."""
+    first = pd.read_csv(path, nrows=chunk_rows)
+    raw_columns = list(first.columns)
+    first.columns = first.columns.str.strip()
+    if first.empty:
+        raise ValueError("File contains no data rows")
+    schema = infer_column_kinds(first)
+    del first
+
+    # Non-numeric columns are read as strings so a column keeps one dtype
+    # across chunks even when a later chunk happens to look numeric.
+    stripped = [str(col).strip() for col in raw_columns]
+    text_cols = set(schema.date_cols + schema.other_cols)
+    analysis = SketchAnalysis(schema) if approximate else StreamingAnalysis(schema)
+    analysis.raw_columns = raw_columns
+    analysis.read_dtype = {raw: str for raw, col in zip(raw_columns, stripped) if col in text_cols}
+    analysis.source_bytes = 0
+    return analysis
+
+
+def _csv_chunks(f, analysis, chunk_rows, resume):
+    if not resume:
+        return pd.read_csv(f, chunksize=chunk_rows, dtype=analysis.read_dtype)
+    try:
+        return pd.read_csv(f, chunksize=chunk_rows, dtype=analysis.read_dtype,
+                           header=None, names=analysis.raw_columns)
+    except pd.errors.EmptyDataError:  # nothing but line breaks was appended
+        return []
+
+
+def analyze_csv_stream(path, writer=None, chunk_rows=CSV_CHUNK_ROWS, on_chunk=None, approximate=False,
+                       base=None):
+    """Analyse a CSV file on disk in chunks and return the finished ``StreamingAnalysis``.
+
+    Call ``report()`` on the result for the response. ``approximate`` uses
+    ``SketchAnalysis`` instead.
+
+    When ``writer`` (a ``datasets.DatasetWriter``) is given, every coerced chunk
+    is also appended to the columnar dataset cache. ``on_chunk`` is called after
+    each chunk with the fraction of the file read so far.
+
+    ``base`` is the finished analysis of an earlier file that this one extends
+    (see ``extends_file``); it is updated in place with the rows after its
+    ``source_bytes`` only, and ``writer`` should start from the base's dataset.
+    """
+    analysis = base if base is not None else _start_analysis(path, chunk_rows, approximate)
+    start = analysis.source_bytes
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(start)
+        for chunk in _csv_chunks(f, analysis, chunk_rows, resume=base is not None):
+            chunk = analysis.coerce(chunk)
+            analysis.update(chunk)
+            if writer is not None:
+                writer.append(chunk)
+            if on_chunk is not None:
+                on_chunk(min((f.tell() - start) / max(size - start, 1), 1.0))
+    analysis.source_bytes = size
+
+    numeric_cols = analysis.numeric_cols
+    if numeric_cols and analysis.needs_outlier_pass:
+        q = analysis.quantiles()
+        lower, upper = iqr_bounds(q.iloc[0].to_numpy(), q.iloc[2].to_numpy())
+        analysis.outlier_counts = np.zeros(len(numeric_cols), dtype=np.int64)
+        if base is not None and writer is not None:
+            # The fences moved with the new rows, so every value is counted
+            # again, from the column store instead of by parsing the file
+            for i, col in enumerate(numeric_cols):
+                values = writer.numeric_values(col)
+                analysis.outlier_counts[i] = np.count_nonzero((values < lower[i]) | (values > upper[i]))
+        else:
+            raw_numeric = [raw for raw in analysis.raw_columns if str(raw).strip() in set(numeric_cols)]
+            for chunk in pd.read_csv(path, chunksize=chunk_rows, usecols=raw_numeric):
+                analysis.count_outliers(chunk, lower, upper)
+
+    return analysis
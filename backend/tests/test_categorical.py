@@ -0,0 +1,32 @@
+import pandas as pd
+
+from analysis import category_counts, category_distribution
+from pipeline import analyze_dataframe
+from type_inference import infer_schema
+
+
+def test_category_counts_orders_ties_by_first_appearance():
+    counts = category_counts(pd.Series(["b", "a", "a", "b", "c", None]))
+    assert counts.to_dict() == {"b": 2, "a": 2, "c": 1}
+    assert list(counts.index) == ["b", "a", "c"]
+
+
+def test_category_distribution_keeps_other_rows_apart_from_categories():
+    # A real category named like a remainder bucket must keep its own count
+    series = pd.Series(["x"] * 30 + ["(other)"] * 20 + ["y"] * 10 + ["z"] * 10)
+    distribution, other_rows = category_distribution(category_counts(series), len(series), top_k=2)
+    assert distribution == {"x": 30, "(other)": 20}
+    assert other_rows == 20
+
+
+def test_analysis_reports_truncated_categories_separately():
+    # 60 categories of 3 rows each plus one common value and "(other)": the
+    # top 50 are kept, and the remaining 12 categories are counted apart
+    values = ["common"] * 300 + ["(other)"] * 200 + [f"c{i}" for i in range(60) for _ in range(3)]
+    df = pd.DataFrame({"kind": values})
+    response, _, _ = analyze_dataframe(df, infer_schema(df))
+    distribution = response["categorical_distributions"]["kind"]
+    assert len(distribution) == 50
+    assert distribution["(other)"] == 200
+    assert response["categorical_other_counts"] == {"kind": 12 * 3}
+    assert sum(distribution.values()) + response["categorical_other_counts"]["kind"] == len(values)
@@ -0,0 +1,36 @@
+import numpy as np
+from scipy.signal import find_peaks
+
+from kde import binned_kde, distribution_peaks, peak_positions
+
+
+def test_peak_positions_match_find_peaks():
+    rng = np.random.default_rng(0)
+    y = np.round(rng.random((20, 50)), 1)
+    rows, indices = peak_positions(y)
+    for j in range(len(y)):
+        assert indices[rows == j].tolist() == find_peaks(y[j])[0].tolist()
+
+
+def test_peak_positions_count_a_flat_top_once_and_skip_nan_rows():
+    rows, indices = peak_positions([[0, 1, 1, 1, 0, 2, 0], [np.nan] * 7])
+    assert rows.tolist() == [0, 0]
+    assert indices.tolist() == [2, 5]
+
+
+def test_distribution_peaks_finds_each_mode():
+    rng = np.random.default_rng(1)
+    bimodal = np.concatenate([rng.normal(0, 1, 5_000), rng.normal(10, 1, 5_000)])
+    unimodal = rng.normal(3, 1, 10_000)
+    peaks = distribution_peaks(np.column_stack([bimodal, unimodal]))
+    assert len(peaks[0]) == 2
+    assert np.abs(peaks[0] - [0, 10]).max() < 0.5
+    assert len(peaks[1]) == 1
+    assert abs(peaks[1][0] - 3) < 0.2
+
+
+def test_columns_without_a_density_have_no_peaks():
+    values = np.column_stack([np.full(100, 4.0), np.full(100, np.nan), np.r_[1.0, np.full(99, np.nan)]])
+    lo, hi, density = binned_kde(values)
+    assert np.isnan(density).all()
+    assert distribution_peaks(values) == [None, None, None]
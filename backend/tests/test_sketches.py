@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from sketches import DuplicateSketch, HyperLogLog, KLLSketch, MisraGries, value_hashes
+
+
+def test_hyperloglog_estimate_is_within_its_error_bound():
+    true_count = 200_000
+    sketch = HyperLogLog(precision=12)
+    values = pd.Series(np.arange(true_count))
+    # Added in chunks, with every value repeated, as the streaming path does
+    for chunk in np.array_split(np.concatenate([values, values[:50_000]]), 7):
+        sketch.add(value_hashes(pd.Series(chunk)))
+    assert abs(sketch.estimate() - true_count) <= 3 * sketch.relative_error * true_count
+
+
+def test_hyperloglog_counts_small_cardinalities_almost_exactly():
+    sketch = HyperLogLog(precision=12)
+    sketch.add(value_hashes(pd.Series([f"v{i}" for i in range(100)] * 3)))
+    assert abs(sketch.estimate() - 100) <= 2
+
+
+def test_misra_gries_undercounts_by_at_most_its_error():
+    rng = np.random.default_rng(1)
+    values = pd.Series(rng.zipf(1.5, 100_000) % 5_000)
+    sketch = MisraGries(capacity=50)
+    for start in range(0, len(values), 10_000):
+        sketch.update(values.iloc[start:start + 10_000].value_counts())
+    exact = values.value_counts()
+    top = sketch.top()
+
+    assert sketch.error <= len(values) / (sketch.capacity + 1)
+    assert len(top) <= sketch.capacity
+    assert (top <= exact[top.index]).all()
+    assert (exact[top.index] - top <= sketch.error).all()
+    # Every value more frequent than the error is kept
+    assert set(exact[exact > sketch.error].index) <= set(top.index)
+
+
+def test_kll_quantile_ranks_are_within_the_rank_error():
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(size=100_000)
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(values, 13):
+        sketch.update(chunk)
+    ordered = np.sort(values)
+    allowed = sketch.rank_error * len(values)
+
+    qs = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    for q, estimate in zip(qs, sketch.quantiles(qs)):
+        assert abs(np.searchsorted(ordered, estimate) - q * len(values)) <= allowed
+    assert abs(sketch.rank(ordered[30_000]) - 30_000) <= allowed
+    assert sketch.count == len(values)
+
+
+def test_kll_ignores_missing_values_and_reports_nan_when_empty():
+    sketch = KLLSketch()
+    assert np.isnan(sketch.quantiles([0.5])).all()
+    sketch.update([np.nan, 1.0, 2.0, 3.0])
+    assert sketch.count == 3
+    assert sketch.quantiles([0.5])[0] == 2.0
+
+
+def test_duplicate_sketch_is_exact_below_its_capacity():
+    frame = pd.DataFrame({"a": [1, 2, 1, 3, 1], "b": ["x", "y", "x", "z", "x"]})
+    sketch = DuplicateSketch(capacity=100)
+    sketch.update(value_hashes(frame))
+    assert sketch.estimate() == (2, 0)
+
+
+def test_duplicate_sketch_estimate_is_within_its_interval():
+    rng = np.random.default_rng(3)
+    frame = pd.DataFrame({"a": rng.integers(0, 60_000, 200_000), "b": rng.integers(0, 2, 200_000)})
+    exact = int(frame.duplicated().sum())
+    sketch = DuplicateSketch(capacity=4_096)
+    for start in range(0, len(frame), 25_000):
+        sketch.update(value_hashes(frame.iloc[start:start + 25_000]))
+    estimate, plus_minus = sketch.estimate()
+    assert sketch.rate < 1
+    assert plus_minus > 0
+    assert abs(estimate - exact) <= plus_minus
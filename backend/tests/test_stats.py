@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats import kurtosis, merge_moments, moments, skewness
+
+
+def _values():
+    rng = np.random.default_rng(0)
+    values = np.column_stack([rng.normal(5, 2, 1_000), rng.exponential(3, 1_000), np.full(1_000, np.nan)])
+    values[rng.choice(1_000, 100, replace=False), 0] = np.nan
+    return values
+
+
+def test_merge_moments_of_chunks_equals_moments_of_the_whole():
+    values = _values()
+    # The empty state the streaming analysis starts from
+    p = values.shape[1]
+    merged = (np.zeros(p), np.zeros(p), np.zeros(p), np.zeros(p), np.zeros(p), np.full(p, np.inf), np.full(p, -np.inf))
+    for chunk in np.split(values, [1, 300, 750]):
+        merged = merge_moments(merged, moments(chunk))
+    for got, expected in zip(merged, moments(values)):
+        np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_merged_moments_give_the_pandas_statistics():
+    values = _values()
+    count, mean, m2, m3, m4, minimum, maximum = merge_moments(moments(values[:400]), moments(values[400:]))
+    frame = pd.DataFrame(values[:, :2])
+    assert count[:2].tolist() == frame.count().tolist()
+    assert mean[:2] == pytest.approx(frame.mean().to_numpy())
+    assert np.sqrt(m2[:2] / (count[:2] - 1)) == pytest.approx(frame.std().to_numpy())
+    assert skewness(count, m2, m3)[:2] == pytest.approx(frame.skew().to_numpy())
+    assert kurtosis(count, m2, m4)[:2] == pytest.approx(frame.kurtosis().to_numpy())
+    assert minimum[:2].tolist() == frame.min().tolist()
+    assert maximum[:2].tolist() == frame.max().tolist()
+
+
+def test_merge_moments_keeps_an_all_missing_column_empty():
+    count, mean, m2, m3, m4, minimum, maximum = merge_moments(moments(_values()[:10]), moments(_values()[10:]))
+    assert count[2] == 0
+    assert (mean[2], m2[2], m3[2], m4[2]) == (0.0, 0.0, 0.0, 0.0)
+    assert (minimum[2], maximum[2]) == (np.inf, -np.inf)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import analyze_dataframe
+from streaming import analyze_csv_stream
+from type_inference import infer_schema
+
+
+def _write_csv(path, rows=3_000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "amount": rng.normal(10, 2, rows),
+        "items": rng.integers(0, 5, rows),
+        "region": rng.choice(["north", "south", "east"], rows),
+        "when": pd.Series(pd.date_range("2021-01-01", periods=rows, freq="h")).dt.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    df.loc[rng.choice(rows, 100, replace=False), "amount"] = np.nan
+    df.loc[rng.choice(rows, 50, replace=False), "region"] = np.nan
+    # Some repeated rows, so duplicates are counted across chunks
+    df = pd.concat([df, df.iloc[:40]], ignore_index=True)
+    df.to_csv(path, index=False)
+
+
+def assert_same_analysis(actual, expected):
+    """Equal responses, up to float round-off in the ``describe`` statistics."""
+    assert actual.keys() == expected.keys()
+    for section, value in expected.items():
+        if section == "describe":
+            assert actual[section].keys() == value.keys()
+            for col, stats in value.items():
+                assert actual[section][col] == pytest.approx(stats)
+        else:
+            assert actual[section] == value, section
+
+
+def test_streaming_analysis_matches_the_in_memory_analysis(tmp_path):
+    path = tmp_path / "data.csv"
+    _write_csv(path)
+    df = pd.read_csv(path)
+    expected, _, _ = analyze_dataframe(df, infer_schema(df))
+
+    # Chunks smaller than the file; the row sample still holds every row
+    streamed = analyze_csv_stream(str(path), chunk_rows=500).report()[0]
+    assert streamed["dataset_info"]["duplicate_rows"] == 40
+    assert streamed["dataset_info"]["raw_data_sampled"] is False
+    assert_same_analysis(streamed, expected)
+
+
+@pytest.mark.parametrize("approximate", [False, True])
+def test_appended_rows_update_the_analysis_of_the_earlier_file(tmp_path, approximate):
+    source = tmp_path / "data.csv"
+    _write_csv(source)
+    lines = source.read_bytes().splitlines(keepends=True)
+    path = tmp_path / "growing.csv"
+    path.write_bytes(b"".join(lines[:1201]))
+    base = analyze_csv_stream(str(path), chunk_rows=500, approximate=approximate)
+    with open(path, "ab") as out:
+        out.write(b"".join(lines[1201:]))
+
+    appended = analyze_csv_stream(str(path), chunk_rows=500, approximate=approximate, base=base).report()[0]
+    fresh = analyze_csv_stream(str(source), chunk_rows=500, approximate=approximate).report()[0]
+    if approximate:
+        # The quantile sketch depends on the order it was fed in; the counts do not
+        for section in ("dataset_info", "null_counts", "categorical_distributions", "categorical_other_counts"):
+            assert appended[section] == fresh[section], section
+    else:
+        assert_same_analysis(appended, fresh)
+    assert appended["dataset_info"]["total_rows"] == len(lines) - 1
@@ -0,0 +1,145 @@
+"""Single-pass column type inference for uploaded datasets.
+
+Each column is classified once: a bounded sample of its non-null values
+proposes a kind (numeric, date or other) and one vectorized ``errors='coerce'``
+conversion of the full column confirms it. The confirmed conversion is kept,
+so no column is parsed twice and no exception drives the control flow.
+"""
+import warnings
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from config import INFERENCE_SAMPLE_ROWS
+from parallel import map_columns
+
+# Values that must parse as dates without a format before the whole sample is
+# tried; formatless parsing goes through dateutil one value at a time.
+DATE_PROBE_ROWS = 10
+
+
+@dataclass
+class Schema:
+    """Column kinds of a dataset.
+
+    ``other_cols`` holds every column that is neither numeric nor a date;
+    ``categorical_cols`` is the subset of those with fewer than 50% unique values.
+    """
+    columns: list
+    numeric_cols: list = field(default_factory=list)
+    date_cols: list = field(default_factory=list)
+    other_cols: list = field(default_factory=list)
+    categorical_cols: list = field(default_factory=list)
+    date_formats: dict = field(default_factory=dict)
+
+    def apply(self, frame):
+        """Convert the columns of ``frame`` (e.g. a later CSV chunk) to this schema in place."""
+        for col in self.numeric_cols:
+            if not pd.api.types.is_numeric_dtype(frame[col]):
+                frame[col] = pd.to_numeric(frame[col], errors='coerce')
+        for col in self.date_cols:
+            if not pd.api.types.is_datetime64_any_dtype(frame[col]):
+                frame[col] = _to_datetime(frame[col], self.date_formats.get(col))
+        return frame
+
+
+def is_categorical(unique_count, total_rows):
+    """A text column is categorical when fewer than 50% of its rows are unique."""
+    return total_rows > 0 and unique_count / total_rows < 0.5
+
+
+def _to_datetime(series, date_format=None):
+    if date_format is not None:
+        return pd.to_datetime(series, errors='coerce', format=date_format)
+    with warnings.catch_warnings():
+        # Without a format pandas warns that it falls back to dateutil; that
+        # is expected here and would otherwise be logged for every upload
+        warnings.simplefilter("ignore", UserWarning)
+        return pd.to_datetime(series, errors='coerce')
+
+
+def _guess_date_format(values):
+    if not len(values) or not isinstance(values.iloc[0], str):
+        return None
+    return guess_datetime_format(values.iloc[0])
+
+
+def _sample(series, sample_rows):
+    """The first ``sample_rows`` non-null values, usually without scanning the whole column."""
+    head = series.iloc[:2 * sample_rows].dropna()
+    if len(head) < sample_rows and len(series) > 2 * sample_rows:
+        head = series.dropna()
+    return head.iloc[:sample_rows]
+
+
+def _classify(series, sample_rows):
+    """Return ``(kind, converted, date_format)`` for one column."""
+    if pd.api.types.is_bool_dtype(series):
+        return 'other', None, None
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric', None, None
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'date', None, None
+
+    sample = _sample(series, sample_rows)
+    if sample.empty:
+        return 'other', None, None
+
+    if pd.to_numeric(sample, errors='coerce').notna().all():
+        converted = pd.to_numeric(series, errors='coerce')
+        if converted.count() == series.count():
+            return 'numeric', converted, None
+
+    date_format = _guess_date_format(sample)
+    parsed_sample = _to_datetime(sample, date_format) if date_format is not None else None
+    if parsed_sample is None or not parsed_sample.notna().all():
+        date_format = None
+        parsed_sample = None
+        if _to_datetime(sample.iloc[:DATE_PROBE_ROWS]).notna().all():
+            parsed_sample = _to_datetime(sample)
+    if parsed_sample is not None and parsed_sample.notna().all():
+        converted = _to_datetime(series, date_format)
+        if converted.count() == series.count():
+            return 'date', converted, date_format
+
+    return 'other', None, None
+
+
+def infer_column_kinds(df, sample_rows=INFERENCE_SAMPLE_ROWS):
+    """Classify every column of ``df`` as numeric, date or other.
+
+    Columns confirmed as numeric or date are converted in place. The categorical
+    split is left to the caller, which may only know unique counts later (e.g.
+    after the last chunk of a streamed upload). Columns are classified in
+    parallel (see ``parallel.py``) and converted in column order.
+    """
+    schema = Schema(columns=list(df.columns))
+    kinds = map_columns(lambda col: _classify(df[col], sample_rows), df.columns)
+    for col, (kind, converted, date_format) in zip(df.columns, kinds):
+        if converted is not None:
+            df[col] = converted
+        if kind == 'numeric':
+            schema.numeric_cols.append(col)
+        elif kind == 'date':
+            schema.date_cols.append(col)
+            if date_format is not None:
+                schema.date_formats[col] = date_format
+        else:
+            schema.other_cols.append(col)
+    return schema
+
+
+def infer_schema(df, sample_rows=INFERENCE_SAMPLE_ROWS):
+    """Infer the full schema of an in-memory DataFrame, converting columns in place."""
+    schema = infer_column_kinds(df, sample_rows)
+    total_rows = len(df)
+    unique_counts = map_columns(lambda col: df[col].nunique(), schema.other_cols)
+    schema.categorical_cols = [
+        col for col, unique in zip(schema.other_cols, unique_counts) if is_categorical(unique, total_rows)
+    ]
+    return schema
@@ -0,0 +1,94 @@
+"""Process pool that runs upload analyses off the event loop.
+
+pandas and NumPy hold the GIL for much of an analysis, so running it on the
+event loop (or on its thread pool) stalls every other request. ``AnalysisPool``
+sends the work to ``ANALYSIS_WORKERS`` spawned processes instead and refuses
+new uploads with ``PoolBusy`` once ``ANALYSIS_QUEUE_LIMIT`` are waiting.
+Callers that answer before the analysis runs, such as background jobs, take
+their slot with ``reserve()`` up front so the refusal can still be returned
+with the request.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import ANALYSIS_QUEUE_LIMIT, ANALYSIS_WORKERS
+from instrumentation import configure_logging
+
+
+class PoolBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class AnalysisPool:
+    def __init__(self, workers=ANALYSIS_WORKERS, queue_limit=ANALYSIS_QUEUE_LIMIT):
+        self.workers = max(0, workers)
+        self.queue_limit = max(0, queue_limit)
+        # Only touched from the event loop thread, so no lock is needed
+        self.in_flight = 0
+        self._executor = None
+
+    @property
+    def capacity(self):
+        return max(self.workers, 1) + self.queue_limit
+
+    @property
+    def full(self):
+        return self.in_flight >= self.capacity
+
+    @property
+    def queued(self):
+        return max(0, self.in_flight - max(self.workers, 1))
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_logging,
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def reserve(self):
+        """Take a slot for a later ``run(..., reserved=True)``; raises ``PoolBusy`` when full."""
+        if self.full:
+            raise PoolBusy(f"{self.in_flight} analyses in progress, try again later")
+        self.in_flight += 1
+
+    def release(self):
+        """Give back a slot taken with ``reserve()``."""
+        self.in_flight -= 1
+
+    async def run(self, func, *args, reserved=False):
+        """Run ``func(*args)`` in a worker and return its result.
+
+        With ``reserved`` the caller already holds a slot from ``reserve()``
+        and releases it itself.
+        """
+        if not reserved:
+            self.reserve()
+        try:
+            if self.workers == 0:
+                return await run_in_threadpool(func, *args)
+            self.start()
+            executor = self._executor
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool next time
+                if self._executor is executor:
+                    self._executor = None
+                    executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        finally:
+            if not reserved:
+                self.release()
+
+
+analysis_pool = AnalysisPool()
@@ -74,6 +74,7 @@ ChartJS.register(
 );
 
 interface ColumnStats {
+  count?: number;
   mean?: number;
   std?: number;
   min?: number;
@@ -94,12 +95,15 @@ interface DatasetInfo {
   categorical_columns: number;
   date_columns: number;
   duplicate_rows: number;
+  raw_data_rows?: number;
+  raw_data_sampled?: boolean;
 }
 
 interface AnalyzedData {
   dataset_info: DatasetInfo;
   describe: Record<string, ColumnStats>;
   categorical_distributions: Record<string, Record<string, number>>;
+  categorical_other_counts?: Record<string, number>;
   time_series_labels?: string[];
   time_series_data?: Record<string, number[]>;
   null_counts: Record<string, number>;
@@ -325,6 +329,43 @@ const calculateKPIValue = (
   return { value: aggregatedValue, trend, items: filteredItems };
 };
 
+// Replace the KPI value computed from raw_data with the backend's aggregates
+// over the whole file, for when raw_data is only a row sample
+// (dataset_info.raw_data_sampled). Top counts come from the categorical
+// distributions; other top/bottom items still come from the sampled rows.
+const applyKPIAggregates = (
+  result: ReturnType<typeof calculateKPIValue>,
+  analyzedData: AnalyzedData,
+  metric: string,
+  aggregation: string,
+  filterType: string,
+  filterCount: number
+): ReturnType<typeof calculateKPIValue> => {
+  if (aggregation === 'count') {
+    const distribution = analyzedData.categorical_distributions?.[metric];
+    let items = result.items;
+    if (distribution && filterType === 'top' && filterCount > 0) {
+      items = Object.entries(distribution)
+        .map(([label, count]) => ({ label, value: count }))
+        .sort((a, b) => b.value - a.value)
+        .slice(0, filterCount);
+    }
+    return { ...result, value: analyzedData.dataset_info.total_rows, items };
+  }
+
+  const stats = analyzedData.describe?.[metric];
+  if (!stats || stats.mean === undefined || stats.count === undefined) return result;
+  const aggregates: Record<string, number | undefined> = {
+    sum: stats.mean * stats.count,
+    average: stats.mean,
+    max: stats.max,
+    min: stats.min
+  };
+  const value = aggregates[aggregation];
+  if (value === undefined) return result;
+  return { ...result, value, trend: ((value - stats.mean) / stats.mean) * 100 };
+};
+
 interface UserChartWidget extends BaseChartWidget {
   isDefault: false;
   dateAdded: Date;
@@ -1071,9 +1112,14 @@ const KPIBuilder: React.FC = () => {
       const sortedCategories = Object.entries(analyzedData.categorical_distributions[variable])
         .sort((a, b) => b[1] - a[1]);
 
-      // Use all categories
+      // Use all categories; rows outside the top categories form one more slice
       labels = sortedCategories.map(([category]) => category);
       values = sortedCategories.map(([_, frequency]) => frequency);
+      const otherCount = analyzedData.categorical_other_counts?.[variable];
+      if (otherCount) {
+        labels.push('Other categories');
+        values.push(otherCount);
+      }
 
       console.log('Categorical Distribution:', {
         totalCategories: labels.length,
@@ -1898,13 +1944,23 @@ const KPIBuilder: React.FC = () => {
     const config = widget.config as KPIConfig;
     console.log('Processing with config:', config);
 
-    const result = calculateKPIValue(
+    let result = calculateKPIValue(
       analyzedData.raw_data,
       widget.selectedFeatures[0],
       config?.aggregation || 'sum',
       config?.filterType || 'none',
       config?.filterCount || 5
     );
+    if (analyzedData.dataset_info?.raw_data_sampled) {
+      result = applyKPIAggregates(
+        result,
+        analyzedData,
+        widget.selectedFeatures[0],
+        config?.aggregation || 'sum',
+        config?.filterType || 'none',
+        config?.filterCount || 5
+      );
+    }
 
     console.log('Calculation result:', result);
 